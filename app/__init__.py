@@ -1,2 +1,14 @@
-from app.web import create_app
-app = create_app()
\ No newline at end of file
+"""Paquete de la aplicación. `gunicorn app:app` pide el atributo `app`, que recién ahí crea la app Flask
+(y lanza la carga del modelo); importar app.services / app.adapters desde las herramientas no arranca nada."""
+
+_app = None
+
+
+def __getattr__(name):
+    global _app
+    if name == "app":
+        if _app is None:
+            from app.web import create_app
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module 'app' has no attribute {name!r}")
@@ -0,0 +1,53 @@
+"""Adapter: sets de imágenes en disco (directorio o lista .txt) y etiquetas YOLO, compartido por las herramientas offline."""
+from pathlib import Path
+import numpy as np
+from app.adapters.frame_source import IMG_EXTS
+
+
+def list_images(source):
+    """Directorio (recursivo) o archivo .txt con una ruta por línea (como dataset.txt)."""
+    src = Path(source)
+    if src.is_dir():
+        return sorted(str(p) for p in src.rglob("*") if p.suffix.lower() in IMG_EXTS)
+    with open(src, "r", encoding="utf-8") as f:
+        return [ln.strip() for ln in f if ln.strip()]
+
+
+def label_path_for(img_path, labels_dir=None):
+    p = Path(img_path)
+    if labels_dir:
+        return Path(labels_dir) / (p.stem + ".txt")
+    parts = list(p.parts)
+    if "images" in parts:
+        parts[len(parts) - 1 - parts[::-1].index("images")] = "labels"
+    return Path(*parts).with_suffix(".txt")
+
+
+def load_labels(path, img_size):
+    """YOLO txt -> lista [cls, x1, y1, x2, y2] en coordenadas 0..img_size (igual que la salida del modelo)."""
+    gts = []
+    if not path.exists():
+        return gts
+    with open(path, "r", encoding="utf-8") as f:
+        for ln in f:
+            v = ln.split()
+            if len(v) < 5:
+                continue
+            c, cx, cy, w, h = int(v[0]), *map(float, v[1:5])
+            gts.append([c, (cx - w / 2) * img_size, (cy - h / 2) * img_size,
+                        (cx + w / 2) * img_size, (cy + h / 2) * img_size])
+    return gts
+
+
+def iou_matrix(a, b):
+    """IoU (len(a), len(b)) entre cajas xyxy."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), np.float32)
+    xx1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    yy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    xx2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    yy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+    area_a = np.clip(a[:, 2] - a[:, 0], 0, None) * np.clip(a[:, 3] - a[:, 1], 0, None)
+    area_b = np.clip(b[:, 2] - b[:, 0], 0, None) * np.clip(b[:, 3] - b[:, 1], 0, None)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
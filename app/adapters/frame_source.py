@@ -0,0 +1,277 @@
+"""Adapter: fuentes de frames (cámara V4L2, archivo de video, carpeta de imágenes, sintética).
+
+Todas exponen open() / read() -> (ok, frame_bgr) / release(), como cv2.VideoCapture,
+así el stream y las pruebas pueden cambiar de fuente sin tocar el pipeline.
+Spec de fuente (CAMERA_SOURCE):
+    "0" | "v4l2:0" | "v4l2:/dev/video2"  cámara
+    "file:ruta.mp4"                       video (en bucle, al ritmo de su FPS)
+    "folder:ruta/"                        imágenes de una carpeta (en bucle)
+    "synthetic" | "synthetic:1280x720"    patrón generado
+    "trace:ruta/"                         frames de una traza de inferencia (ver trace_store)
+"""
+from __future__ import annotations
+import os
+import time
+from pathlib import Path
+import cv2
+import numpy as np
+from app.config import settings
+
+IMG_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class FrameSource:
+    name = "base"
+
+    def open(self) -> None:
+        raise NotImplementedError
+
+    def read(self) -> tuple[bool, np.ndarray | None]:
+        raise NotImplementedError
+
+    def release(self) -> None:
+        pass
+
+    def describe(self) -> dict:
+        return {"source": self.name}
+
+
+class _Paced:
+    """Limita read() al FPS nominal (fuentes que no son tiempo real por sí mismas)."""
+    def __init__(self, fps: float) -> None:
+        self.period = 1.0 / fps if fps and fps > 0 else 0.0
+        self._next = 0.0
+
+    def wait(self) -> None:
+        if self.period <= 0:
+            return
+        now = time.perf_counter()
+        if self._next > now:
+            time.sleep(self._next - now)
+        self._next = max(now, self._next) + self.period
+
+
+class V4L2Source(FrameSource):
+    """Cámara/microscopio USB. MJPG evita el modo sin comprimir (poco FPS a alta resolución por USB 2)."""
+    name = "v4l2"
+
+    def __init__(self, device=0, fourcc: str | None = None, width: int | None = None, height: int | None = None,
+                 fps: float | None = None, buffer_size: int | None = None) -> None:
+        self.device = int(device) if str(device).isdigit() else device
+        self.fourcc = settings.CAMERA_FOURCC if fourcc is None else fourcc
+        self.width = int(width or settings.CAMERA_WIDTH)
+        self.height = int(height or settings.CAMERA_HEIGHT)
+        self.fps = float(fps or settings.CAMERA_FPS)
+        self.buffer_size = int(buffer_size if buffer_size is not None else settings.CAMERA_BUFFER)
+        self.cap = None
+
+    def open(self) -> None:
+        api = cv2.CAP_V4L2 if os.name == "posix" else cv2.CAP_ANY
+        cap = cv2.VideoCapture(self.device, api)
+        if not cap.isOpened():
+            cap = cv2.VideoCapture(self.device)
+        if not cap.isOpened():
+            raise RuntimeError(f"No se pudo abrir la cámara {self.device}")
+        # el FOURCC va antes que la resolución: algunos drivers solo ofrecen ciertas resoluciones en MJPG
+        if self.fourcc:
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.fourcc))
+        if self.width and self.height:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        if self.fps:
+            cap.set(cv2.CAP_PROP_FPS, self.fps)
+        if self.buffer_size:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, self.buffer_size)
+        self.cap = cap
+
+    def read(self):
+        return self.cap.read()
+
+    def release(self) -> None:
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def describe(self) -> dict:
+        d = {"source": self.name, "device": self.device}
+        if self.cap is not None:
+            code = int(self.cap.get(cv2.CAP_PROP_FOURCC))
+            d.update({
+                # lo que el driver aceptó realmente, no lo pedido
+                "fourcc": "".join(chr((code >> 8 * i) & 0xFF) for i in range(4)) if code else None,
+                "width": int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                "height": int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                "fps": self.cap.get(cv2.CAP_PROP_FPS),
+            })
+        return d
+
+
+class VideoFileSource(FrameSource):
+    name = "file"
+
+    def __init__(self, path, loop: bool = True, fps: float | None = None) -> None:
+        self.path = str(path)
+        self.loop = loop
+        self.fps = fps
+        self.cap = None
+        self._pace = None
+
+    def open(self) -> None:
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"No se pudo abrir el video {self.path}")
+        self._pace = _Paced(self.fps or self.cap.get(cv2.CAP_PROP_FPS) or settings.CAMERA_FPS)
+
+    def read(self):
+        self._pace.wait()
+        ok, frame = self.cap.read()
+        if not ok and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.cap.read()
+        return ok, frame
+
+    def release(self) -> None:
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def describe(self) -> dict:
+        return {"source": self.name, "path": self.path, "fps": 1.0 / self._pace.period if self._pace and self._pace.period else None}
+
+
+class ImageFolderSource(FrameSource):
+    name = "folder"
+
+    def __init__(self, path, fps: float | None = None, loop: bool = True) -> None:
+        self.path = Path(path)
+        self.fps = float(fps or settings.CAMERA_FPS)
+        self.loop = loop
+        self.files: list[Path] = []
+        self._i = 0
+        self._pace = _Paced(self.fps)
+
+    def open(self) -> None:
+        self.files = sorted(p for p in self.path.iterdir() if p.suffix.lower() in IMG_EXTS)
+        if not self.files:
+            raise RuntimeError(f"Sin imágenes en {self.path}")
+        self._i = 0
+
+    def read(self):
+        self._pace.wait()
+        if self._i >= len(self.files):
+            if not self.loop:
+                return False, None
+            self._i = 0
+        frame = cv2.imread(str(self.files[self._i]))
+        self._i += 1
+        return frame is not None, frame
+
+    def describe(self) -> dict:
+        return {"source": self.name, "path": str(self.path), "images": len(self.files), "fps": self.fps}
+
+
+class SyntheticSource(FrameSource):
+    """Patrón determinista (degradado + círculo en movimiento + contador): para pruebas y benchmarks."""
+    name = "synthetic"
+
+    def __init__(self, width: int | None = None, height: int | None = None, fps: float | None = None) -> None:
+        self.width = int(width or settings.CAMERA_WIDTH)
+        self.height = int(height or settings.CAMERA_HEIGHT)
+        self.fps = float(fps or settings.CAMERA_FPS)
+        self._pace = _Paced(self.fps)
+        self._n = 0
+        self._base = None
+
+    def open(self) -> None:
+        x = np.linspace(0, 255, self.width, dtype=np.float32)
+        y = np.linspace(0, 255, self.height, dtype=np.float32)
+        self._base = np.dstack([
+            np.tile(x, (self.height, 1)),
+            np.tile(y[:, None], (1, self.width)),
+            np.full((self.height, self.width), 96, np.float32),
+        ]).astype(np.uint8)
+        self._n = 0
+
+    def read(self):
+        self._pace.wait()
+        frame = self._base.copy()
+        r = max(8, min(self.width, self.height) // 10)
+        cx = int((self._n * 7) % max(1, self.width - 2 * r)) + r
+        cv2.circle(frame, (cx, self.height // 2), r, (40, 40, 160), -1)
+        cv2.putText(frame, str(self._n), (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+        self._n += 1
+        return True, frame
+
+    def describe(self) -> dict:
+        return {"source": self.name, "width": self.width, "height": self.height, "fps": self.fps}
+
+
+class TraceSource(FrameSource):
+    """
+    Frames grabados en una traza, en el mismo orden que se infirieron: junto al
+    backend "replay" reproduce la sesión completa sin cámara ni NPU. speed
+    "recorded" respeta los intervalos originales; "max" entrega sin esperas.
+    """
+    name = "trace"
+
+    def __init__(self, path, speed: str | None = None, loop: bool = True) -> None:
+        self.path = str(path or settings.REPLAY_TRACE)
+        self.speed = (speed or settings.REPLAY_SPEED).lower()
+        self.loop = loop
+        self.trace = None
+        self._i = 0
+        self._t0 = 0.0
+
+    def open(self) -> None:
+        from app.adapters.trace_store import TraceReader
+        self.trace = TraceReader(self.path)
+        if not len(self.trace):
+            raise RuntimeError(f"La traza {self.path} no tiene frames")
+        self._i = 0
+        self._t0 = time.perf_counter()
+
+    def read(self):
+        if self._i >= len(self.trace):
+            if not self.loop:
+                return False, None
+            self._i = 0
+            self._t0 = time.perf_counter()
+        if self.speed == "recorded":
+            due = self._t0 + self.trace.ts(self._i) - self.trace.ts(0)
+            now = time.perf_counter()
+            if due > now:
+                time.sleep(due - now)
+        frame = self.trace.frame(self._i).copy()  # el pipeline dibuja sobre el frame: no tocar el memmap
+        self._i += 1
+        return True, frame
+
+    def release(self) -> None:
+        self.trace = None
+
+    def describe(self) -> dict:
+        return {"source": self.name, "path": self.path, "speed": self.speed,
+                "frames": len(self.trace) if self.trace is not None else None, "position": self._i}
+
+
+def create_frame_source(spec: str | None = None, **kw) -> FrameSource:
+    """Fábrica a partir de un spec (ver docstring del módulo); por defecto settings.CAMERA_SOURCE."""
+    spec = str(spec if spec is not None else settings.CAMERA_SOURCE)
+    kind, sep, arg = spec.partition(":")
+    if not sep and kind.isdigit():
+        kind, arg = "v4l2", kind
+    kind = kind.lower()
+    if kind == "v4l2":
+        return V4L2Source(arg or 0, **kw)
+    if kind == "file":
+        return VideoFileSource(arg, fps=kw.get("fps"))
+    if kind == "folder":
+        return ImageFolderSource(arg, fps=kw.get("fps"))
+    if kind == "synthetic":
+        if arg:
+            w, h = arg.lower().split("x")
+            kw.setdefault("width", int(w))
+            kw.setdefault("height", int(h))
+        return SyntheticSource(kw.get("width"), kw.get("height"), kw.get("fps"))
+    if kind == "trace":
+        return TraceSource(arg)
+    raise ValueError(f"Fuente de frames desconocida: {spec}")
@@ -0,0 +1,73 @@
+"""Adapter: interfaz común de backends de inferencia (NPU RKNN, CPU ONNX, ...).
+
+Todos reciben la misma entrada que produce RknnModel.preprocess (NHWC uint8 RGB,
+batch=1) y devuelven la lista de salidas crudas del modelo, de modo que el
+postproceso de RknnModel corre sin cambios sobre cualquiera de ellos.
+"""
+from pathlib import Path
+import numpy as np
+from app.config import settings
+
+
+class InferenceBackend:
+    name = "base"
+
+    def __init__(self, model_path) -> None:
+        self.model_path = Path(model_path)
+        self._signature = None
+
+    @property
+    def loaded(self) -> bool:
+        raise NotImplementedError
+
+    def load(self) -> None:
+        """Carga el modelo e inicializa el runtime (idempotente)."""
+        raise NotImplementedError
+
+    def infer(self, img_input: np.ndarray) -> list:
+        """img_input: [1,H,W,3] uint8 RGB -> lista de salidas crudas."""
+        raise NotImplementedError
+
+    def release(self) -> None:
+        raise NotImplementedError
+
+    def output_signature(self, img_size: int) -> dict:
+        """Shapes/dtypes de entrada y salida (se obtienen con una inferencia en ceros y se cachean)."""
+        if self._signature is None:
+            x = np.zeros((1, img_size, img_size, 3), np.uint8)
+            outs = self.infer(x)
+            self._signature = {
+                "backend": self.name,
+                "input": {"shape": list(x.shape), "dtype": "uint8", "layout": "NHWC", "color": "RGB"},
+                "outputs": [{"shape": list(o.shape), "dtype": str(o.dtype)} for o in outs],
+            }
+        return self._signature
+
+
+def create_backend(name: str | None = None, model_path: str | None = None, core_mask=None) -> InferenceBackend:
+    """
+    Fábrica por nombre ('rknn' | 'onnx' | 'replay' | 'sim'). Si no se da nombre se deduce de la
+    extensión de model_path y, en último caso, de settings.INFERENCE_BACKEND. Con
+    INFERENCE_BACKEND=sim todo runtime sin nombre explícito (pools, cascada, cambio
+    de modelo) es simulado: ningún camino termina pidiendo la NPU real.
+    """
+    if name is None and settings.INFERENCE_BACKEND.lower() == "sim":
+        name = "sim"
+    if name is None and model_path is not None:
+        name = "onnx" if str(model_path).lower().endswith(".onnx") else "rknn"
+    name = (name or settings.INFERENCE_BACKEND).lower()
+
+    if name == "rknn":
+        from app.adapters.rknn_adapter import RknnBackend
+        return RknnBackend(model_path or settings.RKNN_MODEL_PATH, core_mask=core_mask)
+    if name in ("onnx", "cpu"):
+        from app.adapters.onnx_adapter import OnnxCpuBackend
+        return OnnxCpuBackend(model_path or settings.ONNX_MODEL_PATH, threads=settings.CPU_THREADS)
+    if name == "replay":
+        # model_path apunta al directorio de la traza grabada (TRACE_RECORD_DIR en el equipo)
+        from app.adapters.replay_adapter import ReplayBackend
+        return ReplayBackend(model_path or settings.REPLAY_TRACE)
+    if name == "sim":
+        from app.adapters.sim_adapter import SimBackend
+        return SimBackend(model_path or settings.RKNN_MODEL_PATH, core_mask=core_mask)
+    raise ValueError(f"Backend de inferencia desconocido: {name}")
@@ -0,0 +1,55 @@
+"""Adapter: backend CPU sobre el mismo export ONNX del modelo (ONNX Runtime o, si no está, cv2.dnn)."""
+import cv2
+import numpy as np
+from app.adapters.inference_backend import InferenceBackend
+
+try:
+    import onnxruntime as ort
+except ImportError:  # opcional: cv2.dnn viene con OpenCV
+    ort = None
+
+
+class OnnxCpuBackend(InferenceBackend):
+    name = "onnx"
+
+    def __init__(self, model_path, threads: int | None = None) -> None:
+        super().__init__(model_path)
+        self.threads = threads
+        self._sess = None
+        self._input_name = None
+        self._net = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._sess is not None or self._net is not None
+
+    def load(self) -> None:
+        if self.loaded:
+            return
+        if not self.model_path.exists():
+            raise RuntimeError(f"Modelo ONNX no encontrado: {self.model_path}")
+        print(f"[ONNX] Cargando modelo en CPU: {self.model_path}")
+        if ort is not None:
+            opts = ort.SessionOptions()
+            if self.threads:
+                opts.intra_op_num_threads = int(self.threads)
+            self._sess = ort.InferenceSession(str(self.model_path), opts, providers=["CPUExecutionProvider"])
+            self._input_name = self._sess.get_inputs()[0].name
+        else:
+            self._net = cv2.dnn.readNetFromONNX(str(self.model_path))
+            if self.threads:
+                cv2.setNumThreads(int(self.threads))
+        print("[ONNX] CPU listo.")
+
+    def infer(self, img_input: np.ndarray) -> list:
+        # NHWC uint8 -> NCHW float 0..1 (la normalización que el .rknn lleva embebida: std=255)
+        blob = np.ascontiguousarray(img_input.transpose(0, 3, 1, 2), dtype=np.float32)
+        blob *= 1.0 / 255.0
+        if self._sess is not None:
+            return self._sess.run(None, {self._input_name: blob})
+        self._net.setInput(blob)
+        return [self._net.forward()]
+
+    def release(self) -> None:
+        self._sess = None
+        self._net = None
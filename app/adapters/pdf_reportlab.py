@@ -1,9 +1,11 @@
 """Adapter: ReportLab para generar PDF simple del paciente + imágenes."""
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet
 
 def build_report(out_path: str, datos: dict, imagenes_paths: list[str]) -> None:
+    # ReportLab se importa en el primer informe, no al arrancar la app
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+
     doc = SimpleDocTemplate(out_path, pagesize=A4)
     styles = getSampleStyleSheet()
     elems = []
@@ -0,0 +1,82 @@
+"""Adapter: backend de reproducción — devuelve las salidas crudas grabadas en una traza (ver trace_store).
+
+Sirve para correr InferenceService, el postproceso y el stream sin NPU: cada
+infer() busca el registro cuya entrada preprocesada tiene el mismo CRC (a partir
+del cursor, para que frames repetidos se reproduzcan en orden) y, si ninguno
+coincide, entrega el siguiente en secuencia y lo cuenta como 'mismatch'. Con la
+fuente "trace:<dir>" los frames llegan en el mismo orden y todo coincide.
+"""
+import threading
+import numpy as np
+from app.adapters.inference_backend import InferenceBackend
+from app.adapters.trace_store import TraceReader, input_crc
+
+
+class ReplayBackend(InferenceBackend):
+    name = "replay"
+
+    def __init__(self, trace_path, loop: bool = True) -> None:
+        super().__init__(trace_path)
+        self.loop = loop
+        self.trace: TraceReader | None = None
+        self.cursor = 0
+        self.hits = 0
+        self.mismatches = 0
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.trace is not None
+
+    def load(self) -> None:
+        if self.loaded:
+            return
+        trace = TraceReader(self.model_path)
+        if not len(trace):
+            raise RuntimeError(f"La traza {self.model_path} no tiene registros")
+        self.trace = trace
+        print(f"[Replay] Traza {self.model_path}: {len(trace)} inferencias de '{trace.info.get('model')}'")
+
+    def _find(self, crc: int) -> int | None:
+        crcs = self.trace.index["input_crc"]
+        hit = np.flatnonzero(crcs[self.cursor:] == crc)
+        if hit.size:
+            return self.cursor + int(hit[0])
+        if self.loop:
+            hit = np.flatnonzero(crcs[:self.cursor] == crc)
+            if hit.size:
+                return int(hit[0])
+        return None
+
+    def infer(self, img_input: np.ndarray) -> list:
+        with self._lock:
+            n = len(self.trace)
+            if self.cursor >= n:
+                if not self.loop:
+                    raise RuntimeError("Traza agotada")
+                self.cursor = 0
+            i = self._find(input_crc(img_input))
+            if i is None:
+                i = self.cursor
+                self.mismatches += 1
+            else:
+                self.hits += 1
+            self.cursor = i + 1
+        return [np.array(o) for o in self.trace.outputs(i)]
+
+    def release(self) -> None:
+        self.trace = None
+
+    def output_signature(self, img_size: int) -> dict:
+        """De meta.json: una inferencia en ceros movería el cursor y contaría un mismatch."""
+        if self._signature is None:
+            self._signature = {
+                "backend": self.name,
+                "input": {"shape": [1, img_size, img_size, 3], "dtype": "uint8", "layout": "NHWC", "color": "RGB"},
+                "outputs": self.trace.info["outputs"],
+            }
+        return self._signature
+
+    def stats(self) -> dict:
+        return {"trace": str(self.model_path), "records": len(self.trace) if self.trace else 0,
+                "cursor": self.cursor, "hits": self.hits, "mismatches": self.mismatches}
@@ -1,13 +1,69 @@
 import cv2
 import numpy as np
 from pathlib import Path
-from rknnlite.api import RKNNLite
 import yaml
+from app.adapters.inference_backend import InferenceBackend, create_backend
+
+try:
+    from rknnlite.api import RKNNLite
+except ImportError:  # equipos sin NPU: solo se puede usar el postproceso (herramientas offline)
+    RKNNLite = None
+
+
+def core_mask_for(index):
+    """Máscara de núcleo NPU para el runtime 'index' (el RK3588 tiene 3 núcleos); None = automático."""
+    if index is None:
+        return None
+    lite = RKNNLite
+    if lite is None:  # sin NPU: las mismas máscaras sirven al backend simulado
+        from app.adapters.sim_adapter import SimRKNNLite as lite
+    return (lite.NPU_CORE_0, lite.NPU_CORE_1, lite.NPU_CORE_2)[index % 3]
+
+
+class RknnBackend(InferenceBackend):
+    """Backend NPU: RKNNLite sobre un .rknn, opcionalmente fijado a un núcleo (core_mask)."""
+    name = "rknn"
+
+    def __init__(self, model_path, core_mask=None) -> None:
+        super().__init__(model_path)
+        self.core_mask = core_mask
+        self.rknn = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.rknn is not None
+
+    def load(self) -> None:
+        if self.loaded:
+            return
+        if RKNNLite is None:
+            raise RuntimeError("rknnlite no está instalado (se requiere la NPU RK3588)")
+        rknn = RKNNLite(verbose=False)
+        print(f"[RKNN] Cargando modelo: {self.model_path}")
+        if rknn.load_rknn(str(self.model_path)) != 0:
+            raise RuntimeError("Error cargando modelo RKNN")
+
+        print("[RKNN] Inicializando runtime...")
+        ret = rknn.init_runtime() if self.core_mask is None else rknn.init_runtime(core_mask=self.core_mask)
+        if ret != 0:
+            rknn.release()
+            raise RuntimeError("Error inicializando runtime RKNN")
+        self.rknn = rknn
+        print("[RKNN] NPU listo.")
+
+    def infer(self, img_input: np.ndarray) -> list:
+        return self.rknn.inference(inputs=[img_input])
+
+    def release(self) -> None:
+        if self.rknn is not None:
+            self.rknn.release()
+            self.rknn = None
 
 
 class RknnModel:
     """
-    Wrapper ligero para inferencia RKNN + postproceso estilo YOLO.
+    Wrapper ligero para inferencia + postproceso estilo YOLO sobre un backend
+    intercambiable (NPU RKNN por defecto, CPU ONNX, ...).
     Incluye 'perillas' ajustables en runtime:
         - conf_th: umbral de confianza
         - iou_th:  umbral de NMS (class-agnostic)
@@ -21,7 +77,10 @@ class RknnModel:
         conf_th=0.60,
         iou_th=0.30,
         min_box_frac=0.003,
-        nms_topk=300
+        nms_topk=300,
+        init_runtime=True,
+        core_mask=None,
+        backend=None
     ):
         self.model_path = Path(model_path)
         self.yaml_path = Path(yaml_path)
@@ -37,16 +96,13 @@ class RknnModel:
         with open(self.yaml_path, "r") as f:
             self.class_names = yaml.safe_load(f)["names"]
 
-        # Iniciar RKNN
-        self.rknn = RKNNLite(verbose=False)
-        print(f"[RKNN] Cargando modelo: {self.model_path}")
-        if self.rknn.load_rknn(str(self.model_path)) != 0:
-            raise RuntimeError("Error cargando modelo RKNN")
-
-        print("[RKNN] Inicializando runtime...")
-        if self.rknn.init_runtime() != 0:
-            raise RuntimeError("Error inicializando runtime RKNN")
-        print("[RKNN] NPU listo.")
+        # Backend (init_runtime=False y sin backend -> instancia solo para pre/postproceso).
+        # Sin nombre: la fábrica respeta INFERENCE_BACKEND=sim antes de deducirlo por extensión.
+        self.backend = backend
+        if self.backend is None and init_runtime:
+            self.backend = create_backend(None, str(self.model_path), core_mask=core_mask)
+        if self.backend is not None:
+            self.backend.load()
 
     # -------- perillas (setters/getters) --------
     def set_thresholds(self, conf_th=None, iou_th=None, min_box_frac=None):
@@ -106,15 +162,12 @@ class RknnModel:
 
         return keep
 
-    def postprocess(self, outputs):
+    @staticmethod
+    def decode(outputs):
         """
-        Convierte la salida de la NPU en una lista de detecciones:
-        [{'class_id','class_name','confidence','bbox_xyxy'}] en coordenadas 0..img_size.
-        Aplica:
-          - sigmoid si hace falta
-          - filtro por confianza (self.conf_th)
-          - filtro de área mínima (self.min_box_frac)
-          - NMS (self.iou_th), class-agnostic
+        Decodifica la salida cruda de la NPU sin filtrar nada.
+        Devuelve (boxes_xyxy, areas, scores, cls_ids) en coordenadas 0..img_size;
+        las áreas son w*h antes del clip (lo que usa el filtro de min_box_frac).
         """
         pred = outputs[0]
         if pred.ndim == 3:
@@ -136,26 +189,39 @@ class RknnModel:
         cls_conf = cls[np.arange(cls.shape[0]), cls_ids]
         scores = obj * cls_conf
 
+        # xywh -> xyxy
+        x_c, y_c, w, h = xywh[:, 0], xywh[:, 1], xywh[:, 2], xywh[:, 3]
+        boxes = np.stack([x_c - w / 2.0, y_c - h / 2.0, x_c + w / 2.0, y_c + h / 2.0], axis=1)
+        return boxes, w * h, scores, cls_ids
+
+    def postprocess(self, outputs, conf_th=None, iou_th=None, min_box_frac=None):
+        """
+        Convierte la salida de la NPU en una lista de detecciones:
+        [{'class_id','class_name','confidence','bbox_xyxy'}] en coordenadas 0..img_size.
+        Aplica:
+          - sigmoid si hace falta
+          - filtro por confianza (conf_th o self.conf_th)
+          - filtro de área mínima (min_box_frac o self.min_box_frac)
+          - NMS (iou_th o self.iou_th), class-agnostic
+        Los umbrales pasados por argumento valen solo para esta llamada.
+        """
+        conf_th = self.conf_th if conf_th is None else float(conf_th)
+        iou_th = self.iou_th if iou_th is None else float(iou_th)
+        min_box_frac = self.min_box_frac if min_box_frac is None else float(min_box_frac)
+        boxes, areas, scores, cls_ids = self.decode(outputs)
+
         # Filtro confianza
-        keep = scores >= self.conf_th
+        keep = scores >= conf_th
         if not np.any(keep):
             return []
 
-        xywh = xywh[keep]
+        boxes = boxes[keep]
+        areas = areas[keep]
         scores = scores[keep]
         cls_ids = cls_ids[keep]
 
-        # xywh -> xyxy
-        x_c, y_c, w, h = xywh[:, 0], xywh[:, 1], xywh[:, 2], xywh[:, 3]
-        x1 = x_c - w / 2.0
-        y1 = y_c - h / 2.0
-        x2 = x_c + w / 2.0
-        y2 = y_c + h / 2.0
-        boxes = np.stack([x1, y1, x2, y2], axis=1)
-
         # filtro por área mínima
-        min_area = (self.img_size * self.img_size) * self.min_box_frac
-        areas = (w * h)
+        min_area = (self.img_size * self.img_size) * min_box_frac
         big = areas >= min_area
         if not np.any(big):
             return []
@@ -176,7 +242,7 @@ class RknnModel:
             cls_ids = cls_ids[top_idx]
 
         # NMS class-agnostic
-        keep_idx = self._nms_np(boxes, scores, iou_thresh=self.iou_th)
+        keep_idx = self._nms_np(boxes, scores, iou_thresh=iou_th)
         if not keep_idx:
             return []
 
@@ -195,10 +261,18 @@ class RknnModel:
             })
         return detections
 
+    def infer(self, img_input):
+        """Salidas crudas del backend para una entrada ya preprocesada."""
+        return self.backend.infer(img_input)
+
+    def release(self):
+        if self.backend is not None:
+            self.backend.release()
+
     def predict(self, img):
         """pre → inferencia → post"""
         img_input = self.preprocess(img)
-        outputs = self.rknn.inference(inputs=[img_input])
+        outputs = self.infer(img_input)
         return self.postprocess(outputs)
 
 
@@ -0,0 +1,177 @@
+"""Adapter: NPU simulada — runtime compatible con RKNNLite para probar y dimensionar sin el RK3588.
+
+SimRKNNLite expone la misma API que rknnlite.api.RKNNLite (load_rknn,
+init_runtime(core_mask), inference(inputs), release) y devuelve salidas YOLOv5
+crudas (1, anchors, 5+nc) —25200x20 a 640 con 15 clases—, sintéticas o tomadas
+en ciclo de una traza grabada (SIM_TRACE, ver trace_store).
+
+La latencia de cada inferencia sale de un modelo configurable:
+
+    base[núcleo] * (img/RKNN_IMG_SIZE)^2 * lognormal(0, SIM_JITTER) * (1 + SIM_CONTENTION * otros_núcleos_ocupados)
+
+Cada núcleo atiende una inferencia a la vez (como un runtime RKNN fijado a un
+núcleo), así que colas, pool de runtimes, scheduler y varios visores se pueden
+cargar y medir en cualquier Linux con el mismo comportamiento de saturación.
+"""
+from __future__ import annotations
+import threading
+import time
+import numpy as np
+import yaml
+from app.adapters.rknn_adapter import RknnBackend
+from app.config import settings
+
+NUM_CORES = 3
+
+
+def anchors_for(img_size: int) -> int:
+    """Anclas de YOLOv5 (strides 8/16/32, 3 por celda): 25200 a 640."""
+    return 3 * sum((img_size // s) ** 2 for s in (8, 16, 32))
+
+
+def synthetic_outputs(density, num_classes, img_size=640, num_anchors=None, seed=0):
+    """
+    Salida cruda (1, anchors, 5+nc) con 'density' cajas seguras repartidas en el
+    frame y el resto como fondo de baja confianza (como una salida real ya en 0..1).
+    """
+    num_anchors = num_anchors or anchors_for(img_size)
+    rng = np.random.default_rng(seed)
+    pred = np.zeros((num_anchors, 5 + num_classes), np.float32)
+    pred[:, 0:2] = rng.uniform(0, img_size, (num_anchors, 2))
+    pred[:, 2:4] = rng.uniform(4, 32, (num_anchors, 2))
+    pred[:, 4] = rng.uniform(0.0, 0.05, num_anchors)
+    pred[:, 5:] = rng.uniform(0.0, 0.2, (num_anchors, num_classes))
+    if density > 0:
+        idx = rng.choice(num_anchors, size=min(density, num_anchors), replace=False)
+        side = max(16.0, img_size / (2.0 * np.sqrt(density)))
+        pred[idx, 2:4] = side
+        pred[idx, 4] = rng.uniform(0.85, 0.99, idx.size)
+        pred[idx, 5 + rng.integers(0, num_classes, idx.size)] = 0.95
+    return [pred[None]]
+
+
+def _parse_latencies(spec) -> list[float]:
+    """"25" -> igual en los 3 núcleos; "24,25,31" -> por núcleo."""
+    vals = [float(v) for v in str(spec).split(",") if v.strip()] or [0.0]
+    return [vals[min(i, len(vals) - 1)] for i in range(NUM_CORES)]
+
+
+class _SimNpu:
+    """Estado compartido por todos los runtimes simulados del proceso: un lock por núcleo y cuántos están ocupados."""
+    def __init__(self) -> None:
+        self.cores = [threading.Lock() for _ in range(NUM_CORES)]
+        self._state = threading.Lock()
+        self._busy = 0
+        self._rr = 0
+
+    def acquire(self, core: int | None) -> int:
+        if core is None:
+            # modo automático: el primer núcleo libre, o esperar al siguiente por turno
+            for i, lock in enumerate(self.cores):
+                if lock.acquire(blocking=False):
+                    return i
+            with self._state:
+                core, self._rr = self._rr, (self._rr + 1) % NUM_CORES
+        self.cores[core].acquire()
+        return core
+
+    def release(self, core: int) -> None:
+        self.cores[core].release()
+
+    def run(self, core: int | None, latency_s) -> None:
+        """Ocupa el núcleo durante la latencia simulada (afectada por la contención de los demás)."""
+        core = self.acquire(core)
+        try:
+            with self._state:
+                others = self._busy
+                self._busy += 1
+            time.sleep(latency_s(core, others))
+        finally:
+            with self._state:
+                self._busy -= 1
+            self.release(core)
+
+
+SIM_NPU = _SimNpu()
+
+
+class SimRKNNLite:
+    NPU_CORE_AUTO = 0
+    NPU_CORE_0 = 1
+    NPU_CORE_1 = 2
+    NPU_CORE_2 = 4
+    NPU_CORE_0_1_2 = 7
+
+    def __init__(self, verbose: bool = False, latency_ms=None, jitter: float | None = None,
+                 contention: float | None = None, outputs: list | None = None, trace: str | None = None,
+                 detections: int | None = None, seed: int | None = None) -> None:
+        self.latency_ms = _parse_latencies(settings.SIM_LATENCY_MS if latency_ms is None else latency_ms)
+        self.jitter = float(settings.SIM_JITTER if jitter is None else jitter)
+        self.contention = float(settings.SIM_CONTENTION if contention is None else contention)
+        self.detections = int(settings.SIM_DETECTIONS if detections is None else detections)
+        self.trace_path = settings.SIM_TRACE if trace is None else trace
+        self.rng = np.random.default_rng(settings.SIM_SEED if seed is None else seed)
+        self._fixed = outputs
+        self._synthetic: dict[int, list] = {}
+        self._trace = None
+        self._cursor = 0
+        self.core = None
+        self.num_classes = None
+
+    # ------------------------------------------------------------ API RKNNLite
+    def load_rknn(self, path) -> int:
+        self.path = str(path)
+        with open(settings.CLASSES_YAML, "r") as f:
+            self.num_classes = len(yaml.safe_load(f)["names"])
+        if self.trace_path:
+            from app.adapters.trace_store import TraceReader
+            self._trace = TraceReader(self.trace_path)
+        return 0
+
+    def init_runtime(self, core_mask=NPU_CORE_AUTO) -> int:
+        masks = {self.NPU_CORE_0: 0, self.NPU_CORE_1: 1, self.NPU_CORE_2: 2}
+        self.core = masks.get(core_mask)  # AUTO o multinúcleo -> None (el primero libre)
+        return 0
+
+    def inference(self, inputs: list) -> list:
+        img_size = int(inputs[0].shape[1])
+        SIM_NPU.run(self.core, lambda core, others: self._latency_s(core, others, img_size))
+        return self._outputs(img_size)
+
+    def release(self) -> None:
+        self._trace = None
+        self._synthetic.clear()
+
+    # ------------------------------------------------------------ modelo
+    def _latency_s(self, core: int, others: int, img_size: int) -> float:
+        ms = self.latency_ms[core] * (img_size / settings.RKNN_IMG_SIZE) ** 2
+        if self.jitter > 0:
+            ms *= float(self.rng.lognormal(0.0, self.jitter))
+        return ms * (1.0 + self.contention * others) / 1000.0
+
+    def _outputs(self, img_size: int) -> list:
+        if self._fixed is not None:
+            return self._fixed
+        if self._trace is not None and len(self._trace) and self._trace.info["img_size"] == img_size:
+            i, self._cursor = self._cursor, (self._cursor + 1) % len(self._trace)
+            return [np.array(o) for o in self._trace.outputs(i)]
+        if img_size not in self._synthetic:
+            self._synthetic[img_size] = synthetic_outputs(self.detections, self.num_classes, img_size)
+        return self._synthetic[img_size]
+
+
+class SimBackend(RknnBackend):
+    """Mismo backend que el de la NPU pero sobre SimRKNNLite (model_path no necesita existir)."""
+    name = "sim"
+
+    def __init__(self, model_path="sim", core_mask=None, **sim_kw) -> None:
+        super().__init__(model_path, core_mask=core_mask)
+        self.sim_kw = sim_kw
+
+    def load(self) -> None:
+        if self.loaded:
+            return
+        rknn = SimRKNNLite(**self.sim_kw)
+        rknn.load_rknn(self.model_path)
+        rknn.init_runtime() if self.core_mask is None else rknn.init_runtime(core_mask=self.core_mask)
+        self.rknn = rknn
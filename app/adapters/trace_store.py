@@ -0,0 +1,148 @@
+"""Adapter: traza de inferencia en disco (frames + salidas crudas del runtime), solo-anexar y mapeada en memoria.
+
+Un directorio por traza:
+
+    meta.json     versión, modelo, backend, img_size y shapes/dtypes de las salidas
+    index.bin     un registro fijo por inferencia (INDEX_DTYPE)
+    frames.bin    frames BGR uint8 concatenados (resolución por registro)
+    outputs.bin   salidas crudas concatenadas (mismo tamaño en todos los registros)
+
+Se escribe primero el dato y al final la entrada del índice: si el proceso muere a
+mitad de un registro, el lector simplemente no lo ve. La lectura usa np.memmap:
+frame(i) y outputs(i) son vistas sin copia, así una traza de GB se recorre sin
+cargarla en RAM. input_crc es el CRC32 de la entrada preprocesada; al reproducir
+permite verificar que el preprocesado actual produce exactamente la misma entrada.
+"""
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+import zlib
+from pathlib import Path
+import numpy as np
+
+VERSION = 1
+INDEX_DTYPE = np.dtype([("ts", "<f8"), ("frame_off", "<u8"), ("out_off", "<u8"),
+                        ("h", "<u4"), ("w", "<u4"), ("input_crc", "<u4"), ("_pad", "<u4")])
+
+
+def input_crc(img_input: np.ndarray) -> int:
+    return zlib.crc32(np.ascontiguousarray(img_input).data) & 0xFFFFFFFF
+
+
+class TraceWriter:
+    def __init__(self, path, model: str = "", backend: str = "", img_size: int = 0) -> None:
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.info = {"version": VERSION, "model": str(model), "backend": backend, "img_size": int(img_size),
+                     "outputs": None, "created": time.time()}
+        meta = self.path / "meta.json"
+        if meta.exists():
+            with open(meta, "r", encoding="utf-8") as f:
+                self.info = json.load(f)
+            if self.info.get("version") != VERSION:
+                raise ValueError(f"Traza {self.path} es de otra versión ({self.info.get('version')})")
+        self._lock = threading.Lock()
+        self._frames = open(self.path / "frames.bin", "ab")
+        self._outputs = open(self.path / "outputs.bin", "ab")
+        self._index = open(self.path / "index.bin", "ab")
+        self.records = os.path.getsize(self.path / "index.bin") // INDEX_DTYPE.itemsize
+
+    def _check_signature(self, outputs: list) -> None:
+        sig = [{"shape": list(o.shape), "dtype": str(o.dtype)} for o in outputs]
+        if self.info["outputs"] is None:
+            self.info["outputs"] = sig
+            with open(self.path / "meta.json", "w", encoding="utf-8") as f:
+                json.dump(self.info, f, indent=2)
+        elif self.info["outputs"] != sig:
+            raise ValueError(f"Las salidas {sig} no coinciden con las de la traza {self.info['outputs']}")
+
+    def append(self, frame_bgr: np.ndarray, img_input: np.ndarray, outputs: list, ts: float | None = None) -> int:
+        """Anexa un registro y devuelve su índice."""
+        outputs = [np.asarray(o) for o in outputs]
+        frame = np.ascontiguousarray(frame_bgr, dtype=np.uint8)
+        rec = np.zeros(1, INDEX_DTYPE)
+        rec["ts"] = time.time() if ts is None else ts
+        rec["h"], rec["w"] = frame.shape[:2]
+        rec["input_crc"] = input_crc(img_input)
+        with self._lock:
+            self._check_signature(outputs)
+            rec["frame_off"] = self._frames.tell()
+            rec["out_off"] = self._outputs.tell()
+            self._frames.write(frame.data)
+            for o in outputs:
+                self._outputs.write(np.ascontiguousarray(o).data)
+            self._frames.flush()
+            self._outputs.flush()
+            self._index.write(rec.tobytes())
+            self._index.flush()
+            i = self.records
+            self.records += 1
+        return i
+
+    def close(self) -> None:
+        with self._lock:
+            for f in (self._frames, self._outputs, self._index):
+                f.close()
+
+
+_WRITERS: dict[str, TraceWriter] = {}
+_WRITERS_LOCK = threading.Lock()
+
+
+def shared_writer(path, **info) -> TraceWriter:
+    """
+    Un solo TraceWriter por directorio y proceso: dos handles "ab" sobre los mismos
+    archivos no ven lo que escribe el otro (tell() desfasado) y los offsets se pisan.
+    """
+    key = str(Path(path).resolve())
+    with _WRITERS_LOCK:
+        w = _WRITERS.get(key)
+        if w is None:
+            w = _WRITERS[key] = TraceWriter(path, **info)
+        return w
+
+
+class TraceReader:
+    def __init__(self, path) -> None:
+        self.path = Path(path)
+        meta = self.path / "meta.json"
+        if not meta.exists():
+            raise FileNotFoundError(f"No es una traza (falta meta.json): {self.path}")
+        with open(meta, "r", encoding="utf-8") as f:
+            self.info = json.load(f)
+        self.index = np.fromfile(self.path / "index.bin", dtype=INDEX_DTYPE)
+        self._out_specs = [(tuple(o["shape"]), np.dtype(o["dtype"])) for o in (self.info["outputs"] or [])]
+        self._frames = self._map("frames.bin")
+        self._outputs = self._map("outputs.bin")
+
+    def _map(self, name: str):
+        p = self.path / name
+        return np.memmap(p, dtype=np.uint8, mode="r") if p.exists() and p.stat().st_size else None
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def ts(self, i: int) -> float:
+        return float(self.index[i]["ts"])
+
+    def input_crc(self, i: int) -> int:
+        return int(self.index[i]["input_crc"])
+
+    def frame(self, i: int) -> np.ndarray:
+        r = self.index[i]
+        h, w, off = int(r["h"]), int(r["w"]), int(r["frame_off"])
+        return self._frames[off:off + h * w * 3].reshape(h, w, 3)
+
+    def outputs(self, i: int) -> list:
+        off = int(self.index[i]["out_off"])
+        outs = []
+        for shape, dtype in self._out_specs:
+            n = int(np.prod(shape)) * dtype.itemsize
+            outs.append(self._outputs[off:off + n].view(dtype).reshape(shape))
+            off += n
+        return outs
+
+    def duration_s(self) -> float:
+        return self.ts(len(self) - 1) - self.ts(0) if len(self) > 1 else 0.0
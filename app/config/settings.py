@@ -11,4 +11,107 @@ DATA_DIR   = os.environ.get("DATA_DIR", "app/config")
 RKNN_MODEL_PATH = os.path.join(MODELS_DIR, "model1.rknn")
 CLASSES_YAML    = os.path.join(DATA_DIR, "data.yaml")
 
-RKNN_IMG_SIZE = int(os.environ.get("RKNN_IMG_SIZE", 640))
\ No newline at end of file
+RKNN_IMG_SIZE = int(os.environ.get("RKNN_IMG_SIZE", 640))
+
+# Núcleos de la NPU usados por los pools de runtimes (RK3588: 3)
+NPU_CORES = int(os.environ.get("NPU_CORES", 3))
+
+# Backend de inferencia: "rknn" (NPU) | "onnx" (CPU) | "replay" (traza grabada) | "sim" (NPU simulada). El fallback se usa si el principal no carga ("" = sin fallback)
+INFERENCE_BACKEND  = os.environ.get("INFERENCE_BACKEND", "rknn")
+INFERENCE_FALLBACK = os.environ.get("INFERENCE_FALLBACK", "onnx")
+ONNX_MODEL_PATH    = os.environ.get("ONNX_MODEL_PATH", os.path.join(MODELS_DIR, "model1.onnx"))
+CPU_THREADS        = int(os.environ.get("CPU_THREADS", 4))
+
+# Scheduling híbrido NPU + CPU: los frames se desvían a CPU si la espera estimada en la NPU supera el presupuesto
+HYBRID_SCHEDULING     = os.environ.get("HYBRID_SCHEDULING", "0") == "1"
+NPU_LATENCY_BUDGET_MS = float(os.environ.get("NPU_LATENCY_BUDGET_MS", 80))
+CPU_MAX_INFLIGHT      = int(os.environ.get("CPU_MAX_INFLIGHT", 1))
+
+# Arranque: el modelo se carga en segundo plano y se calienta con N inferencias antes de servir predicciones
+WARMUP_INFERENCES = int(os.environ.get("WARMUP_INFERENCES", 3))
+
+# /predict: runtimes NPU propios, ventana de micro-batching, tamaño máximo de lote y cache de resultados (entradas)
+PREDICT_RUNTIMES         = int(os.environ.get("PREDICT_RUNTIMES", NPU_CORES))
+PREDICT_BATCH_WINDOW_MS  = float(os.environ.get("PREDICT_BATCH_WINDOW_MS", 8))
+PREDICT_MAX_BATCH        = int(os.environ.get("PREDICT_MAX_BATCH", 8))
+PREDICT_CACHE_SIZE       = int(os.environ.get("PREDICT_CACHE_SIZE", 512))
+PREDICT_MAX_IMAGES       = int(os.environ.get("PREDICT_MAX_IMAGES", 16))
+
+# Cola de prioridad NPU: SLO (ms, espera + inferencia) por clase; el de "live" es además la espera máxima de un frame
+NPU_SLO_MS = os.environ.get("NPU_SLO_MS", "live:100,interactive:1000,batch:0")
+
+# Fuente de frames del stream: "0" / "v4l2:/dev/video0" | "file:video.mp4" | "folder:dir" | "synthetic[:WxH]"
+CAMERA_SOURCE = os.environ.get("CAMERA_SOURCE", "0")
+CAMERA_FOURCC = os.environ.get("CAMERA_FOURCC", "MJPG")  # "" = modo por defecto del driver
+CAMERA_WIDTH  = int(os.environ.get("CAMERA_WIDTH", 1280))
+CAMERA_HEIGHT = int(os.environ.get("CAMERA_HEIGHT", 720))
+CAMERA_FPS    = float(os.environ.get("CAMERA_FPS", 30))
+CAMERA_BUFFER = int(os.environ.get("CAMERA_BUFFER", 1))
+
+# Cámaras con nombre: "nombre=fuente,..." (fuente como CAMERA_SOURCE); la primera es la de /video_feed
+CAMERAS = os.environ.get("CAMERAS", f"main={CAMERA_SOURCE}")
+
+# Segundos que una cámara sigue abierta tras irse su último cliente (reanudación instantánea dentro del margen)
+CAMERA_IDLE_TIMEOUT_S = float(os.environ.get("CAMERA_IDLE_TIMEOUT_S", 15))
+
+# Hilos nativos para llamadas bloqueantes bajo gevent (lectores de cámara + inferencias + encode/IO)
+BLOCKING_POOL_SIZE = int(os.environ.get("BLOCKING_POOL_SIZE", 16))
+
+# Pipeline de visión: "inprocess" (cámara + NPU en el worker web) | "bus" (proceso vision.py + memoria compartida)
+VISION_MODE          = os.environ.get("VISION_MODE", "inprocess")
+FRAME_BUS_SLOTS      = int(os.environ.get("FRAME_BUS_SLOTS", 4))
+FRAME_BUS_SLOT_BYTES = int(os.environ.get("FRAME_BUS_SLOT_BYTES", 2 * 1024 * 1024))
+JPEG_QUALITY         = int(os.environ.get("JPEG_QUALITY", 95))
+
+# Transporte del stream en la UI: "auto" (WebSocket si flask-sock está instalado) | "ws" | "mjpeg"
+STREAM_TRANSPORT = os.environ.get("STREAM_TRANSPORT", "auto")
+# Segundos entre sondeos mientras se espera el ack de un frame enviado por WebSocket
+WS_ACK_TIMEOUT_S = float(os.environ.get("WS_ACK_TIMEOUT_S", 1.0))
+
+# Nitidez (varianza del Laplaciano sobre el frame reducido a SHARPNESS_WIDTH px): bajo SHARPNESS_MIN no se infiere (0 = sin compuerta)
+SHARPNESS_MIN   = float(os.environ.get("SHARPNESS_MIN", 0))
+SHARPNESS_WIDTH = int(os.environ.get("SHARPNESS_WIDTH", 320))
+# Segundos que la auto-captura observa el stream antes de guardar el mejor frame
+AUTOCAPTURE_WINDOW_S = float(os.environ.get("AUTOCAPTURE_WINDOW_S", 3.0))
+
+# Cascada: modelo chico de presencia antes del detector completo en el stream ("" = deshabilitada)
+CASCADE_MODEL_PATH  = os.environ.get("CASCADE_MODEL_PATH", "")
+CASCADE_IMG_SIZE    = int(os.environ.get("CASCADE_IMG_SIZE", 320))
+# Score mínimo (obj * clase) en el modelo chico para correr el completo; bajo a propósito (prioriza sensibilidad)
+CASCADE_CONF        = float(os.environ.get("CASCADE_CONF", 0.25))
+# Frames que el detector completo corre sin compuerta después de un disparo
+CASCADE_HOLD_FRAMES = int(os.environ.get("CASCADE_HOLD_FRAMES", 15))
+
+# Inferencia por teselas a resolución nativa en el stream: "off" | "on" (solo frames más grandes que TILE_SIZE)
+TILE_MODE      = os.environ.get("TILE_MODE", "off")
+TILE_SIZE      = int(os.environ.get("TILE_SIZE", 640))
+TILE_OVERLAP   = float(os.environ.get("TILE_OVERLAP", 0.2))
+# Teselas de un frame inferidas en paralelo (sobre los runtimes de /predict, PREDICT_RUNTIMES), y umbral de intersección/caja menor del NMS entre teselas
+TILE_RUNTIMES  = int(os.environ.get("TILE_RUNTIMES", NPU_CORES))
+TILE_MERGE_IOS = float(os.environ.get("TILE_MERGE_IOS", 0.6))
+
+# ROI desde la UI: lado mínimo (fracción del frame) y cuánto se acerca por frame al centro de la lesión (0 = fija)
+ROI_MIN_FRAC    = float(os.environ.get("ROI_MIN_FRAC", 0.05))
+ROI_FOLLOW_GAIN = float(os.environ.get("ROI_FOLLOW_GAIN", 0.5))
+
+# Grabación de sesión: FPS nominal del video, duración de cada segmento y calidad MJPG (0-100)
+RECORD_FPS       = float(os.environ.get("RECORD_FPS", CAMERA_FPS))
+RECORD_SEGMENT_S = float(os.environ.get("RECORD_SEGMENT_S", 60))
+RECORD_QUALITY   = int(os.environ.get("RECORD_QUALITY", 80))
+
+# Traza de inferencia: si se define, cada inferencia guarda frame + salidas crudas en este directorio
+TRACE_RECORD_DIR = os.environ.get("TRACE_RECORD_DIR", "")
+# Traza que reproduce el backend "replay" (INFERENCE_BACKEND=replay) y la fuente "trace:<dir>"
+REPLAY_TRACE     = os.environ.get("REPLAY_TRACE", "traces/latest")
+# Ritmo de la fuente "trace:": "recorded" (timestamps originales) o "max" (sin esperas)
+REPLAY_SPEED     = os.environ.get("REPLAY_SPEED", "recorded")
+
+# NPU simulada (INFERENCE_BACKEND=sim): latencia base en ms a RKNN_IMG_SIZE ("25" o por núcleo "24,25,31"),
+# dispersión lognormal, recargo por cada otro núcleo ocupado y detecciones de la salida sintética
+SIM_LATENCY_MS = os.environ.get("SIM_LATENCY_MS", "25")
+SIM_JITTER     = float(os.environ.get("SIM_JITTER", 0.15))
+SIM_CONTENTION = float(os.environ.get("SIM_CONTENTION", 0.10))
+SIM_DETECTIONS = int(os.environ.get("SIM_DETECTIONS", 3))
+SIM_SEED       = int(os.environ.get("SIM_SEED", 0))
+# Traza cuyas salidas crudas devuelve en ciclo la NPU simulada ("" = salida sintética)
+SIM_TRACE      = os.environ.get("SIM_TRACE", "")
@@ -0,0 +1,382 @@
+"""Service: cámaras con nombre, cada una con un hilo lector que conserva solo el frame más reciente.
+
+El hilo vacía el buffer del driver tan rápido como llega, así que los lectores
+(stream, captura) siempre reciben el último frame y nunca uno viejo encolado.
+Un frame que se sobrescribe sin que nadie lo haya leído cuenta como descartado.
+Las cámaras se declaran en settings.CAMERAS ("main=0,overview=v4l2:2").
+
+Ciclo de vida por conteo de referencias: el lector arranca con el primer cliente
+(subscribe) y sigue mientras queden clientes; cuando se va el último, se detiene
+tras CAMERA_IDLE_TIMEOUT_S (sensor y ancho de banda USB liberados). Un cliente que
+vuelve dentro de ese margen reutiliza el lector sin reabrir el dispositivo.
+"""
+from __future__ import annotations
+import threading
+import time
+import numpy as np
+from app.adapters.frame_source import FrameSource, create_frame_source
+from app.config import settings
+from app.services.executor import spawn_background, run_blocking
+from app.services.engine_service import ENGINE
+from app.services.npu_queue import NPU_QUEUE, NpuBusy
+from app.services.settings_service import THRESHOLDS_CACHE
+from app.services.overlay import draw_detections, draw_roi
+from app.services.quality_service import AutoCapture, sharpness, is_sharp
+from app.services.tiling_service import TILED
+from app.services.runtime_pool import PoolUnavailable
+from app.services.metrics_service import (
+    CAMERA_FRAMES, CAMERA_DROPPED, CAMERA_ACTIVE, CAMERA_SUBSCRIBERS, DROPPED_FRAMES, STAGE_SECONDS,
+    SHARPNESS, INFERENCES_SKIPPED,
+)
+
+HOLD_MS = 250  # cajas retenidas cuando un frame sale sin detecciones (evita parpadeo)
+
+
+class FrameGrabber:
+    def __init__(self, source: FrameSource | None = None) -> None:
+        self.source = source or create_frame_source()
+        self.running = False
+        self._alive = False
+        self.error: str | None = None
+        # (seq, timestamp, frame); se reemplaza la tupla entera: lectura atómica bajo el GIL
+        self._latest: tuple[int, float, np.ndarray | None] = (0, 0.0, None)
+        self._consumed = True
+        self.grabbed = 0
+        self.dropped = 0
+
+    def start(self) -> None:
+        if self.running:
+            return
+        # un hilo anterior todavía puede estar dentro de read(); esperar a que suelte la fuente
+        deadline = time.monotonic() + 2.0
+        while self._alive and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.source.open()
+        self.running = True
+        self._alive = True
+        self.error = None
+        # hilo nativo también bajo gevent: read() del driver bloquea
+        spawn_background(self._loop, "frame-grabber")
+
+    def stop(self) -> None:
+        self.running = False
+
+    def _loop(self) -> None:
+        fails = 0
+        try:
+            while self.running:
+                ok, frame = self.source.read()
+                if not ok or frame is None:
+                    CAMERA_DROPPED.inc(reason="read_fail")
+                    fails += 1
+                    time.sleep(min(0.5, 0.01 * fails))
+                    continue
+                fails = 0
+                if not self._consumed:
+                    self.dropped += 1
+                    CAMERA_DROPPED.inc(reason="overwritten")
+                seq = self._latest[0] + 1
+                self._latest = (seq, time.time(), frame)
+                self._consumed = False
+                self.grabbed += 1
+                CAMERA_FRAMES.inc()
+        except Exception as e:
+            self.error = str(e)
+            print(f"[Camera] Lector detenido: {e}")
+        finally:
+            self.running = False
+            self.source.release()
+            self._alive = False
+
+    def latest(self) -> tuple[int, float, np.ndarray | None]:
+        """Último frame sin esperar: (seq, ts, frame) con seq=0 si aún no hay."""
+        self._consumed = True
+        return self._latest
+
+    def read(self, after_seq: int = 0, timeout: float = 1.0) -> tuple[int, float, np.ndarray | None]:
+        """
+        Espera un frame más nuevo que 'after_seq' (cada lector lleva su propio seq).
+        El frame es compartido entre lectores: copiarlo antes de dibujar encima.
+        (seq, ts, None) si no llega a tiempo.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            seq, ts, frame = self._latest
+            if seq > after_seq and frame is not None:
+                self._consumed = True
+                return seq, ts, frame
+            if time.monotonic() >= deadline or (not self.running and self.error):
+                return seq, ts, None
+            # espera por sondeo: el productor puede ser un hilo nativo y los lectores greenlets
+            time.sleep(0.002)
+
+    def stats(self) -> dict:
+        return {"running": self.running, "error": self.error, "grabbed": self.grabbed,
+                "dropped": self.dropped, **self.source.describe()}
+
+
+class CameraSession:
+    """Cámara con nombre: su lector más el estado del stream compartido por todos sus clientes."""
+    def __init__(self, name: str, grabber: FrameGrabber, idle_timeout_s: float | None = None) -> None:
+        self.name = name
+        self.grabber = grabber
+        self.idle_timeout_s = float(settings.CAMERA_IDLE_TIMEOUT_S if idle_timeout_s is None else idle_timeout_s)
+        self.refs = 0
+        self._stop_when_idle = False
+        self._idle_timer: threading.Timer | None = None
+        self._lock = threading.RLock()
+        # última inferencia (seq, dets): varios clientes del mismo stream no infieren dos veces el mismo frame.
+        # Se publica como una sola tupla para que un lector de otro hilo (grabación) no mezcle seq y dets.
+        self.result: tuple[int, list[dict]] = (0, [])
+        # inferencia en curso {"seq", "done", "dets"}: los demás clientes del mismo frame esperan su resultado
+        self._inflight: dict | None = None
+        # cajas retenidas HOLD_MS cuando un frame sale sin detecciones
+        self.last_boxes: list[dict] = []
+        self.last_ts = 0.0
+        self.current_frame: np.ndarray | None = None
+        # nitidez por seq (la usan la compuerta de inferencia y la auto-captura)
+        self.sharpness = 0.0
+        self.sharpness_seq = 0
+        self.autocapture: AutoCapture | None = None
+        # región de interés normalizada (x1, y1, x2, y2) en 0..1; None = frame completo
+        self.roi: tuple[float, float, float, float] | None = None
+        self.roi_follow = True
+        self.fps = 0.0
+        self.latency_ms: float | None = None
+
+    # ------------------------------------------------------------ ciclo de vida
+    def subscribe(self) -> None:
+        """Un cliente más; arranca el lector si estaba detenido (RuntimeError si la fuente no abre)."""
+        with self._lock:
+            self.refs += 1
+            self._stop_when_idle = False
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+        CAMERA_SUBSCRIBERS.set(self.refs, cam=self.name)
+        self.ensure_running()
+
+    def unsubscribe(self) -> None:
+        """Un cliente menos; con cero clientes programa el apagado (inmediato si se pidió con request_stop)."""
+        with self._lock:
+            self.refs = max(0, self.refs - 1)
+            if self.refs == 0:
+                delay = 0.0 if self._stop_when_idle else self.idle_timeout_s
+                self._schedule_stop(delay)
+        CAMERA_SUBSCRIBERS.set(self.refs, cam=self.name)
+
+    def request_stop(self) -> None:
+        """/stop_stream: apagar ya si no hay clientes, o en cuanto se vaya el último (sin esperar el margen)."""
+        with self._lock:
+            self._stop_when_idle = True
+            if self.refs == 0:
+                self._schedule_stop(0.0)
+
+    def _schedule_stop(self, delay: float) -> None:
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+        if delay <= 0:
+            self._idle_timer = None
+            self._stop_if_idle()
+            return
+        self._idle_timer = threading.Timer(delay, self._stop_if_idle)
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+    def _stop_if_idle(self) -> None:
+        with self._lock:
+            if self.refs > 0 or not self.grabber.running:
+                return
+            self._idle_timer = None
+            self.grabber.stop()
+            # sin clientes no hay nada que mostrar: se descartan frame y cajas retenidas
+            self.result, self.last_boxes = (0, []), []
+            self.current_frame = None
+        CAMERA_ACTIVE.set(0, cam=self.name)
+        print(f"[Camera] '{self.name}' detenida por inactividad")
+
+    def ensure_running(self) -> bool:
+        if self.grabber.running:
+            return True
+        self.grabber.start()
+        CAMERA_ACTIVE.set(1, cam=self.name)
+        return True
+
+    # ------------------------------------------------------------ inferencia
+    def detections_for(self, seq: int, frame: np.ndarray) -> list[dict]:
+        """
+        Detecciones del frame 'seq'. Un mismo frame se infiere una sola vez aunque lo
+        vean varios clientes; si la cámara agotó su cuota (varias cámaras compitiendo
+        por la NPU) se reutilizan las últimas detecciones.
+        """
+        with self._lock:
+            dseq, dets = self.result
+            if dseq == seq:
+                return dets
+            slot = self._inflight
+            owner = slot is None or slot["seq"] != seq
+            if owner:
+                slot = self._inflight = {"seq": seq, "done": threading.Event(), "dets": []}
+        if not owner:
+            # otro cliente ya está infiriendo este frame (cediendo en run_blocking o en la cola NPU)
+            slot["done"].wait()
+            return slot["dets"]
+        try:
+            slot["dets"] = self._infer_frame(seq, frame)
+        finally:
+            with self._lock:
+                if self._inflight is slot:
+                    self._inflight = None
+            slot["done"].set()
+        return slot["dets"]
+
+    def _infer_frame(self, seq: int, frame: np.ndarray) -> list[dict]:
+        if not is_sharp(self.sharpness_for(seq, frame)):
+            # desenfocado: no vale un turno de NPU (y las cajas de un frame borroso no sirven)
+            INFERENCES_SKIPPED.inc(reason="blurry")
+            self.result = (seq, [])
+            return []
+        if not ENGINE.sched.admit(self.name):
+            DROPPED_FRAMES.inc(reason="quota")
+            return self.result[1]
+        thr, _ver = THRESHOLDS_CACHE.snapshot()
+        try:
+            # un frame en vivo que no consigue NPU dentro de su SLO se salta (se mantienen las últimas cajas)
+            roi = self.roi
+            if roi is not None:
+                dets = self._infer_roi(frame, thr, roi)
+            elif (settings.TILE_MODE == "on" and max(frame.shape[:2]) > settings.TILE_SIZE
+                  and TILED.pool() is not None):
+                # teselas a resolución nativa repartidas entre los núcleos (ver tiling_service);
+                # mientras el pool compartido se arma en segundo plano se infiere el frame completo
+                try:
+                    dets = TILED.detect(frame, thr, ENGINE.infer.img_size, priority="live",
+                                        timeout=NPU_QUEUE.live_timeout())
+                except PoolUnavailable:
+                    dets = ENGINE.sched.predict(frame, thr, priority="live", timeout=NPU_QUEUE.live_timeout(),
+                                                gate_key=self.name)
+            else:
+                dets = ENGINE.sched.predict(frame, thr, priority="live", timeout=NPU_QUEUE.live_timeout(),
+                                            gate_key=self.name)
+            ENGINE.mark("first_inferred_frame")
+        except NpuBusy:
+            DROPPED_FRAMES.inc(reason="npu_busy")
+            dets = []
+        self.result = (seq, dets)
+        return dets
+
+    # ------------------------------------------------------------ región de interés
+    def set_roi(self, roi: tuple | None, follow: bool = True) -> None:
+        """ROI normalizada (x1, y1, x2, y2) en 0..1 del frame; None vuelve al frame completo (ValueError si es chica)."""
+        if roi is not None:
+            x1, y1, x2, y2 = (min(max(float(v), 0.0), 1.0) for v in roi)
+            x1, x2 = sorted((x1, x2))
+            y1, y2 = sorted((y1, y2))
+            if x2 - x1 < settings.ROI_MIN_FRAC or y2 - y1 < settings.ROI_MIN_FRAC:
+                raise ValueError(f"ROI demasiado chica (mínimo {settings.ROI_MIN_FRAC:.0%} del frame por lado)")
+            roi = (x1, y1, x2, y2)
+        self.roi, self.roi_follow = roi, bool(follow)
+        self.result, self.last_boxes = (0, []), []
+
+    def _infer_roi(self, frame: np.ndarray, thr, roi: tuple) -> list[dict]:
+        """Infiere solo el recorte de la ROI a resolución nativa y devuelve cajas en 0..img_size del frame."""
+        H, W = frame.shape[:2]
+        x0, y0 = int(roi[0] * W), int(roi[1] * H)
+        x1, y1 = max(x0 + 1, int(round(roi[2] * W))), max(y0 + 1, int(round(roi[3] * H)))
+        crop = frame[y0:y1, x0:x1]
+        dets = ENGINE.sched.predict(crop, thr, priority="live", timeout=NPU_QUEUE.live_timeout(),
+                                    gate_key=self.name)
+        s = float(ENGINE.infer.img_size)
+        # 0..s del recorte -> px del frame -> 0..s del frame
+        kx, ky = (x1 - x0) / W, (y1 - y0) / H
+        ox, oy = x0 * s / W, y0 * s / H
+        for d in dets:
+            bx1, by1, bx2, by2 = d["bbox_xyxy"]
+            d["bbox_xyxy"] = [ox + bx1 * kx, oy + by1 * ky, ox + bx2 * kx, oy + by2 * ky]
+        if self.roi_follow and dets:
+            self._follow(roi, max(dets, key=lambda d: d["confidence"]), s)
+        return dets
+
+    def _follow(self, roi: tuple, det: dict, s: float) -> None:
+        """
+        Recentra la ROI sobre la detección más segura (suavizado ROI_FOLLOW_GAIN); crece si la lesión no entra.
+        'roi' es la del recorte inferido: si durante la inferencia se pidió otra (o ninguna), no se toca.
+        """
+        x1, y1, x2, y2 = roi
+        bx1, by1, bx2, by2 = (v / s for v in det["bbox_xyxy"])
+        w = min(1.0, max(x2 - x1, (bx2 - bx1) * 1.25))
+        h = min(1.0, max(y2 - y1, (by2 - by1) * 1.25))
+        g = settings.ROI_FOLLOW_GAIN
+        cx = (x1 + x2) / 2 + g * ((bx1 + bx2) / 2 - (x1 + x2) / 2)
+        cy = (y1 + y2) / 2 + g * ((by1 + by2) / 2 - (y1 + y2) / 2)
+        cx = min(max(cx, w / 2), 1.0 - w / 2)
+        cy = min(max(cy, h / 2), 1.0 - h / 2)
+        if self.roi is roi:
+            self.roi = (cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2)
+
+    def sharpness_for(self, seq: int, frame: np.ndarray) -> float:
+        """Nitidez del frame 'seq' (se calcula una vez por frame)."""
+        if self.sharpness_seq != seq:
+            with STAGE_SECONDS.time(stage="sharpness"):
+                self.sharpness = run_blocking(sharpness, frame)
+            self.sharpness_seq = seq
+            SHARPNESS.set(self.sharpness, cam=self.name)
+        return self.sharpness
+
+    def start_autocapture(self, cedula: str, window_s: float | None = None) -> AutoCapture:
+        self.autocapture = AutoCapture(self.name, cedula, window_s)
+        return self.autocapture
+
+    def offer_autocapture(self, seq: int, frame: np.ndarray) -> None:
+        """Frame sin anotar para la auto-captura en curso (con las detecciones de ese mismo frame)."""
+        ac = self.autocapture
+        if ac is None or ac.state != "running":
+            return
+        dseq, dets = self.result
+        if dseq != seq:
+            dets = []
+        ac.offer(seq, frame, self.sharpness_for(seq, frame), dets)
+
+    def annotate(self, seq: int, frame: np.ndarray) -> tuple[np.ndarray, list[dict]]:
+        """Infiere (o reutiliza) y dibuja sobre una copia del frame. Devuelve (frame anotado, cajas dibujadas)."""
+        frame = frame.copy()  # el frame del lector es compartido entre clientes
+        dets = self.detections_for(seq, frame)
+
+        now = time.time() * 1000.0
+        if len(dets) == 0 and (now - self.last_ts) < HOLD_MS:
+            dets_to_draw = self.last_boxes
+        else:
+            dets_to_draw = dets
+            if len(dets) > 0:
+                self.last_boxes = dets
+                self.last_ts = now
+
+        with STAGE_SECONDS.time(stage="draw"):
+            frame = run_blocking(draw_detections, frame, dets_to_draw, img_size=ENGINE.infer.img_size)
+            if self.roi is not None:
+                draw_roi(frame, self.roi)
+        return frame, dets_to_draw
+
+    def stats(self) -> dict:
+        return {"name": self.name, "subscribers": self.refs, "fps": round(self.fps, 2),
+                "sharpness": round(self.sharpness, 1), "roi": self.roi, "roi_follow": self.roi_follow,
+                "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+                **self.grabber.stats()}
+
+
+def parse_cameras(spec: str) -> dict[str, str]:
+    """'main=0,overview=v4l2:2' -> {'main': '0', 'overview': 'v4l2:2'} (sin nombre: cam0, cam1...)."""
+    out = {}
+    for i, part in enumerate(p.strip() for p in spec.split(",") if p.strip()):
+        name, sep, src = part.partition("=")
+        if not sep:
+            name, src = f"cam{i}", part
+        out[name.strip()] = src.strip()
+    return out
+
+
+CAMERAS: dict[str, CameraSession] = {
+    name: CameraSession(name, FrameGrabber(create_frame_source(src)))
+    for name, src in parse_cameras(settings.CAMERAS).items()
+}
+DEFAULT_CAMERA = next(iter(CAMERAS))
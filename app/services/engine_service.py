@@ -0,0 +1,94 @@
+"""Service: arranque perezoso del motor de inferencia.
+
+create_app() ya no carga la NPU: el servidor HTTP queda listo de inmediato y el
+modelo se carga y calienta en segundo plano. Mientras tanto el stream sirve la
+cámara sin predicciones y /ready responde 503. También registra los hitos de
+arranque en frío (app creada, primer request, modelo listo, primer frame inferido).
+"""
+from __future__ import annotations
+import time
+import numpy as np
+from app.config import settings
+from app.services.executor import run_blocking, spawn_task
+from app.services.metrics_service import STARTUP_SECONDS
+
+
+class InferenceEngine:
+    """Contenedor del InferenceService, el scheduler y el ModelManager, creados al estar listo el modelo."""
+    def __init__(self) -> None:
+        self.t0 = time.perf_counter()
+        self.state = "idle"  # idle | loading | warming | ready | error
+        self.error: str | None = None
+        self.infer = None
+        self.sched = None
+        self.models = None
+        self.milestones: dict[str, float] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def wait(self, timeout: float | None = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.ready and self.state != "error":
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            time.sleep(0.05)
+        return self.ready
+
+    def mark(self, milestone: str) -> None:
+        """Registra el primer paso por un hito (ms desde el arranque); los siguientes se ignoran."""
+        if milestone in self.milestones:
+            return
+        ms = (time.perf_counter() - self.t0) * 1000.0
+        if self.milestones.setdefault(milestone, round(ms, 1)) != round(ms, 1):
+            return
+        STARTUP_SECONDS.set(ms / 1000.0, milestone=milestone)
+        print(f"[Startup] {milestone}: {ms:.0f} ms")
+
+    def start(self, t0: float | None = None) -> None:
+        """Lanza la carga en segundo plano (idempotente)."""
+        if self.state != "idle":
+            return
+        if t0 is not None:
+            self.t0 = t0
+        self.state = "loading"
+        # greenlet bajo gevent: el warm-up pasa por el lock del modelo y la cola NPU igual que un
+        # request; solo la carga del runtime y las inferencias salen a hilos nativos (run_blocking)
+        spawn_task(self._load, "engine-load")
+
+    def _load(self) -> None:
+        # imports pesados (RKNNLite, cv2 del pipeline) recién aquí
+        from app.services.inference_service import InferenceService
+        from app.services.scheduler_service import HybridScheduler
+        from app.services.model_manager import ModelManager
+        try:
+            infer = run_blocking(InferenceService)
+            self.mark("model_loaded")
+            self.state = "warming"
+            frame = np.zeros((infer.img_size, infer.img_size, 3), np.uint8)
+            for _ in range(max(0, settings.WARMUP_INFERENCES)):
+                infer.predict(frame, priority="batch")
+                if infer.gate is not None:
+                    # el modelo de presencia de la cascada también arranca en frío
+                    g = infer.gate.img_size
+                    run_blocking(infer.gate.infer, np.zeros((1, g, g, 3), np.uint8))
+            self.infer = infer
+            self.sched = run_blocking(HybridScheduler.from_settings, infer)
+            self.models = ModelManager(infer)
+            self.state = "ready"
+            self.mark("model_ready")
+            if settings.TILE_MODE == "on":
+                # el modo teselas usa el pool de /predict: se arma ya, fuera del camino del stream
+                from app.services.predict_service import PREDICT
+                PREDICT.prepare(infer.model.backend.model_path, infer.img_size, infer.backend_name)
+        except Exception as e:
+            self.state, self.error = "error", str(e)
+            print(f"[Startup] Motor de inferencia no disponible: {e}")
+
+    def status(self) -> dict:
+        return {"state": self.state, "ready": self.ready, "error": self.error,
+                "startup_ms": dict(self.milestones)}
+
+
+ENGINE = InferenceEngine()
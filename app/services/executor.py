@@ -0,0 +1,61 @@
+"""Service: llamadas bloqueantes (OpenCV, NPU, ReportLab) fuera del loop de gevent.
+
+Con Gunicorn + gevent todas las peticiones comparten un hilo; una llamada C que
+no suelta el control (cap.read, rknn.inference, imencode, imwrite, doc.build)
+congela a los demás clientes durante un frame entero. run_blocking() ejecuta la
+función en el threadpool nativo del hub de gevent y solo suspende al greenlet
+que la pidió. Sin gevent (servidor de desarrollo con hilos, herramientas) llama
+directo: ya se está en un hilo propio.
+"""
+from __future__ import annotations
+import threading
+from app.config import settings
+
+_pool = None
+
+
+def gevent_active() -> bool:
+    try:
+        import gevent.monkey
+    except ImportError:
+        return False
+    return gevent.monkey.is_module_patched("threading")
+
+
+def _threadpool():
+    global _pool
+    if _pool is None:
+        import gevent
+        _pool = gevent.get_hub().threadpool
+        # los lectores de cámara ocupan un hilo cada uno de forma permanente
+        _pool.maxsize = max(_pool.maxsize, settings.BLOCKING_POOL_SIZE)
+    return _pool
+
+
+def run_blocking(fn, *args, **kwargs):
+    """fn(*args, **kwargs) en un hilo nativo si corre bajo gevent; directo en otro caso."""
+    if not gevent_active():
+        return fn(*args, **kwargs)
+    return _threadpool().apply(fn, args, kwargs)
+
+
+def spawn_background(fn, name: str) -> None:
+    """Tarea larga en un hilo del SO real incluso bajo gevent (la carga del runtime o la lectura de cámara bloquean)."""
+    if gevent_active():
+        _threadpool().spawn(fn)
+        return
+    threading.Thread(target=fn, name=name, daemon=True).start()
+
+
+def spawn_task(fn, name: str) -> None:
+    """
+    Tarea de coordinación (carga y calentamiento del modelo, cambio en caliente): bajo
+    gevent corre como greenlet del hub, así comparte locks y colas parcheados con los
+    requests sin mezclar hilos; sus llamadas C bloqueantes deben ir por run_blocking.
+    Sin gevent es un hilo normal.
+    """
+    if gevent_active():
+        import gevent
+        gevent.spawn(fn)
+        return
+    threading.Thread(target=fn, name=name, daemon=True).start()
@@ -0,0 +1,198 @@
+"""Service: bus de frames en memoria compartida (un proceso de visión -> N workers HTTP).
+
+Un segmento multiprocessing.shared_memory por cámara ("nds_bus_<cam>") con un
+ring buffer de JPEGs ya codificados + detecciones (JSON) + timestamps:
+
+    cabecera  magic | versión | slots | slot_bytes | write_seq | reader_hb | writer_hb | predictions | running
+              | roi_follow | - | roi (4 x float32) | roi_version
+    slot i    seq | ts_capture | ts_infer | ts_encode | jpeg_len | meta_len | jpeg... | meta...
+
+Escribe un solo proceso (vision.py). Cada slot funciona como seqlock: el escritor
+pone seq=0, copia los datos y recién entonces publica el seq; el lector valida
+el seq antes y después de copiar y reintenta si el slot se reescribió en medio.
+El control va en la cabecera: los workers marcan reader_hb (hay clientes) y el
+flag de predicciones; el proceso de visión marca writer_hb y si la cámara corre.
+"""
+from __future__ import annotations
+import json
+import struct
+import time
+from multiprocessing import shared_memory
+from app.config import settings
+
+MAGIC = b"NDSB"
+VERSION = 2
+_HDR = struct.Struct("<4sIIIQddBB")
+_HDR_SIZE = 64
+_SLOT = struct.Struct("<QdddII")
+# offsets de los campos de cabecera que se actualizan por separado
+_OFF_WRITE_SEQ = 16
+_OFF_READER_HB = 24
+_OFF_WRITER_HB = 32
+_OFF_PREDICTIONS = 40
+_OFF_RUNNING = 41
+_OFF_ROI_FOLLOW = 42
+_OFF_ROI = 44
+_OFF_ROI_VERSION = 60
+
+
+def bus_name(cam: str) -> str:
+    return f"nds_bus_{cam}"
+
+
+class FrameBus:
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool) -> None:
+        self.shm = shm
+        self.buf = shm.buf
+        self.owner = owner
+        magic, version, self.slots, self.slot_bytes, *_ = _HDR.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise RuntimeError(f"Segmento {shm.name} no es un bus de frames v{VERSION}")
+        self._stride = _SLOT.size + self.slot_bytes
+
+    # ------------------------------------------------------------ creación / conexión
+    @classmethod
+    def create(cls, cam: str, slots: int | None = None, slot_bytes: int | None = None) -> "FrameBus":
+        """Lo llama el proceso de visión (dueño: lo borra al cerrar). Reemplaza un segmento huérfano."""
+        slots = int(slots or settings.FRAME_BUS_SLOTS)
+        slot_bytes = int(slot_bytes or settings.FRAME_BUS_SLOT_BYTES)
+        size = _HDR_SIZE + slots * (_SLOT.size + slot_bytes)
+        try:
+            old = shared_memory.SharedMemory(name=bus_name(cam))
+            old.close()
+            old.unlink()
+        except FileNotFoundError:
+            pass
+        shm = shared_memory.SharedMemory(name=bus_name(cam), create=True, size=size)
+        _HDR.pack_into(shm.buf, 0, MAGIC, VERSION, slots, slot_bytes, 0, 0.0, 0.0, 0, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, cam: str) -> "FrameBus":
+        """Lo llaman los workers HTTP. FileNotFoundError si el proceso de visión no está corriendo."""
+        shm = shared_memory.SharedMemory(name=bus_name(cam))
+        try:
+            # solo lectores: que el resource_tracker de este proceso no borre el segmento al salir
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return cls(shm, owner=False)
+
+    def close(self) -> None:
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    # ------------------------------------------------------------ control
+    def _get(self, fmt: str, off: int):
+        return struct.unpack_from(fmt, self.buf, off)[0]
+
+    @property
+    def write_seq(self) -> int:
+        return self._get("<Q", _OFF_WRITE_SEQ)
+
+    def touch_reader(self) -> None:
+        struct.pack_into("<d", self.buf, _OFF_READER_HB, time.time())
+
+    def reader_idle_s(self) -> float:
+        hb = self._get("<d", _OFF_READER_HB)
+        return time.time() - hb if hb else float("inf")
+
+    def touch_writer(self, running: bool) -> None:
+        struct.pack_into("<d", self.buf, _OFF_WRITER_HB, time.time())
+        struct.pack_into("<B", self.buf, _OFF_RUNNING, 1 if running else 0)
+
+    def writer_age_s(self) -> float:
+        hb = self._get("<d", _OFF_WRITER_HB)
+        return time.time() - hb if hb else float("inf")
+
+    @property
+    def predictions(self) -> bool:
+        return bool(self._get("<B", _OFF_PREDICTIONS))
+
+    @predictions.setter
+    def predictions(self, on: bool) -> None:
+        struct.pack_into("<B", self.buf, _OFF_PREDICTIONS, 1 if on else 0)
+
+    def request_roi(self, roi: tuple | None, follow: bool = True) -> None:
+        """Pedido de ROI de un worker (normalizado 0..1; None = frame completo). Lo aplica el proceso de visión."""
+        struct.pack_into("<4f", self.buf, _OFF_ROI, *(roi or (0.0, 0.0, 0.0, 0.0)))
+        struct.pack_into("<B", self.buf, _OFF_ROI_FOLLOW, 1 if follow else 0)
+        struct.pack_into("<I", self.buf, _OFF_ROI_VERSION, (self._get("<I", _OFF_ROI_VERSION) + 1) & 0xFFFFFFFF)
+
+    def roi_request(self) -> tuple[int, tuple | None, bool]:
+        """(versión, roi o None, follow) del último pedido."""
+        roi = struct.unpack_from("<4f", self.buf, _OFF_ROI)
+        return (self._get("<I", _OFF_ROI_VERSION), roi if roi[2] > roi[0] else None,
+                bool(self._get("<B", _OFF_ROI_FOLLOW)))
+
+    def status(self) -> dict:
+        return {"write_seq": self.write_seq, "running": bool(self._get("<B", _OFF_RUNNING)),
+                "predictions": self.predictions, "writer_age_s": round(self.writer_age_s(), 2),
+                "reader_idle_s": round(self.reader_idle_s(), 2), "slots": self.slots, "slot_bytes": self.slot_bytes}
+
+    # ------------------------------------------------------------ datos
+    def _slot_off(self, seq: int) -> int:
+        return _HDR_SIZE + (seq % self.slots) * self._stride
+
+    def publish(self, jpeg, meta: dict, ts_capture: float, ts_infer: float, ts_encode: float) -> int:
+        """Escribe el frame en el siguiente slot y lo publica. Devuelve su seq."""
+        jpeg = memoryview(jpeg).cast("B")
+        meta_b = json.dumps(meta, default=float).encode("utf-8")
+        if len(jpeg) + len(meta_b) > self.slot_bytes:
+            raise ValueError(f"Frame de {len(jpeg) + len(meta_b)} B no cabe en el slot ({self.slot_bytes} B)")
+        seq = self.write_seq + 1
+        off = self._slot_off(seq)
+        struct.pack_into("<Q", self.buf, off, 0)  # slot en escritura
+        data = off + _SLOT.size
+        self.buf[data:data + len(jpeg)] = jpeg
+        self.buf[data + len(jpeg):data + len(jpeg) + len(meta_b)] = meta_b
+        _SLOT.pack_into(self.buf, off, 0, ts_capture, ts_infer, ts_encode, len(jpeg), len(meta_b))
+        struct.pack_into("<Q", self.buf, off, seq)
+        struct.pack_into("<Q", self.buf, _OFF_WRITE_SEQ, seq)
+        return seq
+
+    def read_latest(self, after_seq: int = 0, with_meta: bool = True):
+        """
+        Último frame publicado si es más nuevo que 'after_seq':
+        (seq, (ts_capture, ts_infer, ts_encode), jpeg_bytes, meta) o None.
+        """
+        for _ in range(3):
+            seq = self.write_seq
+            if seq <= after_seq:
+                return None
+            off = self._slot_off(seq)
+            s1, t_cap, t_inf, t_enc, jlen, mlen = _SLOT.unpack_from(self.buf, off)
+            if s1 != seq:
+                continue
+            data = off + _SLOT.size
+            jpeg = bytes(self.buf[data:data + jlen])
+            meta_b = bytes(self.buf[data + jlen:data + jlen + mlen]) if with_meta else b""
+            if self._get("<Q", off) != seq:
+                continue  # se reescribió mientras copiábamos
+            return seq, (t_cap, t_inf, t_enc), jpeg, (json.loads(meta_b) if meta_b else {})
+        return None
+
+
+_ATTACHED: dict[str, FrameBus] = {}
+
+
+def attached_bus(cam: str) -> FrameBus | None:
+    """Bus de la cámara para este worker (se conecta una vez); None si el proceso de visión no corre."""
+    bus = _ATTACHED.get(cam)
+    if bus is not None and bus.writer_age_s() > 5.0:
+        # el proceso de visión se reinició (segmento nuevo) o murió: reconectar
+        _ATTACHED.pop(cam, None)
+        bus.close()
+        bus = None
+    if bus is None:
+        try:
+            bus = _ATTACHED[cam] = FrameBus.attach(cam)
+        except FileNotFoundError:
+            return None
+    return bus
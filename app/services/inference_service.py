@@ -1,53 +1,161 @@
 # app/services/inference_service.py
+import threading
 import cv2
 import numpy as np
 from typing import List, Dict
 from app.adapters.rknn_adapter import RknnModel
+from app.adapters.inference_backend import InferenceBackend, create_backend
+from app.adapters.trace_store import shared_writer
 from app.config import settings
 from app.services.settings_service import Thresholds  # <- nuevo import
+from app.services.metrics_service import (
+    STAGE_SECONDS, INFER_QUEUE_DEPTH, INFERENCES_TOTAL, INFERENCES_SKIPPED, CASCADE_GATE,
+)
+from app.services.npu_queue import NPU_QUEUE
+from app.services.executor import run_blocking
 
 class InferenceService:
-    def __init__(self, model_path: str | None = None, yaml_path: str | None = None, img_size: int | None = None) -> None:
-        model_path = model_path or settings.RKNN_MODEL_PATH
+    GRUPOS = {
+        "MALIGNO/PREMALIGNO": ["AKIEC", "BCC", "SCC", "MEL"],
+        "BENIGNO": ["BKL", "DF", "NV", "VASC"],
+    }
+
+    def __init__(self, model_path: str | None = None, yaml_path: str | None = None, img_size: int | None = None,
+                 backend: str | None = None, cascade: bool | None = None, trace: bool | None = None) -> None:
         yaml_path  = yaml_path  or settings.CLASSES_YAML
         img_size   = int(img_size or settings.RKNN_IMG_SIZE)
-        self.model = RknnModel(model_path=model_path, yaml_path=yaml_path, img_size=img_size)
+        self.model = RknnModel(model_path=model_path or settings.RKNN_MODEL_PATH, yaml_path=yaml_path,
+                               img_size=img_size, backend=self._load_backend(backend, model_path))
         self.img_size = img_size
-        self.grupos = {
-            "MALIGNO/PREMALIGNO": ["AKIEC", "BCC", "SCC", "MEL"],
-            "BENIGNO": ["BKL", "DF", "NV", "VASC"],
-        }
-
-    def predict(self, frame_bgr: np.ndarray, thr: Thresholds | None = None) -> list[dict]:
-        """Inferencia; si 'thr' es None, el adapter usará sus defaults."""
-        img_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-
-        if hasattr(self.model, "preprocess") and hasattr(self.model, "rknn"):
-            img_input = self.model.preprocess(img_rgb)
-            outputs = self.model.rknn.inference(inputs=[img_input])
-            try:
-                if thr is not None:
-                    return self.model.postprocess(outputs, float(thr.conf_th), float(thr.iou_th), float(thr.min_box_frac))
-                else:
-                    return self.model.postprocess(outputs)
-            except TypeError:
-                try:
-                    return self.model.postprocess(outputs)
-                except Exception:
-                    return self.model.predict(img_rgb)
+        self.grupos = self.GRUPOS
+        # protege self.model durante un frame: un swap en caliente espera a que termine
+        self._model_lock = threading.Lock()
+        # cascada opcional: un detector chico de presencia decide si corre el completo
+        use_cascade = bool(settings.CASCADE_MODEL_PATH) if cascade is None else cascade
+        self.gate = self._load_gate(yaml_path) if use_cascade else None
+        # frames que quedan sin compuerta tras un disparo, por cámara (gate_key): el servicio es compartido
+        self._gate_hot: dict[str, int] = {}
+        # traza opcional (frame + salidas crudas) para reproducir sin NPU con el backend "replay"
+        self.trace = None
+        use_trace = bool(settings.TRACE_RECORD_DIR) if trace is None else trace
+        if use_trace and self.backend_name != "replay":
+            self.trace = shared_writer(settings.TRACE_RECORD_DIR, model=self.model.model_path,
+                                       backend=self.backend_name, img_size=img_size)
+
+    @staticmethod
+    def _load_backend(name: str | None, model_path: str | None) -> InferenceBackend:
+        """Backend configurado; si no carga (p.ej. driver NPU caído) intenta settings.INFERENCE_FALLBACK."""
+        b = create_backend(name, model_path)
+        try:
+            b.load()
+            return b
+        except Exception as e:
+            fallback = settings.INFERENCE_FALLBACK
+            if not fallback or fallback == b.name:
+                raise
+            print(f"[Inference] Backend '{b.name}' no disponible ({e}); usando fallback '{fallback}'")
+            fb = create_backend(fallback)
+            fb.load()
+            return fb
+
+    @staticmethod
+    def _load_gate(yaml_path: str) -> RknnModel | None:
+        """Modelo de presencia de la cascada (p.ej. el mismo YOLO exportado a 320); None si no carga."""
+        path = settings.CASCADE_MODEL_PATH
         try:
-            return self.model.predict(img_rgb)
-        except Exception:
-            return []
+            return RknnModel(model_path=path, yaml_path=yaml_path, img_size=settings.CASCADE_IMG_SIZE,
+                             backend=create_backend(None, path))
+        except Exception as e:
+            print(f"[Inference] Cascada deshabilitada: no se pudo cargar '{path}' ({e})")
+            return None
+
+    @property
+    def backend_name(self) -> str:
+        return self.model.backend.name
+
+    def predict(self, frame_bgr: np.ndarray, thr: Thresholds | None = None,
+                priority: str = "live", timeout: float | None = None, gate_key: str = "") -> list[dict]:
+        """
+        Inferencia; si 'thr' es None, el adapter usará sus defaults.
+        priority/timeout: clase y espera máxima en la cola de la NPU (NpuBusy si se agota).
+        gate_key: secuencia a la que pertenece el frame (la cámara) para la retención de la cascada.
+        """
+        INFER_QUEUE_DEPTH.inc()
+        try:
+            return self._predict(frame_bgr, thr, priority, timeout, gate_key)
+        finally:
+            INFER_QUEUE_DEPTH.dec()
+            INFERENCES_TOTAL.inc()
+
+    def _predict(self, frame_bgr: np.ndarray, thr: Thresholds | None, priority: str,
+                 timeout: float | None, gate_key: str = "") -> list[dict]:
+        with self._model_lock:
+            model = self.model
+            # la cascada solo filtra el stream en vivo: /predict y el warm-up piden el detector completo
+            if (self.gate is not None and priority == "live"
+                    and not self._lesion_present(frame_bgr, priority, timeout, gate_key)):
+                INFERENCES_SKIPPED.inc(reason="cascade")
+                return []
+
+            # cada etapa corre en un hilo nativo bajo gevent (ver executor); la espera de turno NPU no
+            with STAGE_SECONDS.time(stage="preprocess"):
+                img_input = run_blocking(self._preprocess, model, frame_bgr)
+
+            with NPU_QUEUE.for_backend(model.backend.name, priority, timeout), \
+                    STAGE_SECONDS.time(stage="inference"):
+                outputs = run_blocking(model.infer, img_input)
+
+            if self.trace is not None and model.img_size == self.trace.info["img_size"]:
+                run_blocking(self.trace.append, frame_bgr, img_input, outputs)
+
+            with STAGE_SECONDS.time(stage="postprocess"):
+                if thr is None:
+                    return run_blocking(model.postprocess, outputs)
+                return run_blocking(model.postprocess, outputs, thr.conf_th, thr.iou_th, thr.min_box_frac)
+
+    def _lesion_present(self, frame_bgr: np.ndarray, priority: str, timeout: float | None,
+                        gate_key: str = "") -> bool:
+        """
+        Primera etapa: ¿hay algo con score >= CASCADE_CONF en el modelo chico? Tras un
+        disparo el detector completo corre sin compuerta CASCADE_HOLD_FRAMES frames
+        de esa misma cámara, para no cortar las cajas mientras la lesión está en cuadro.
+        """
+        if self._gate_hot.get(gate_key, 0) > 0:
+            self._gate_hot[gate_key] -= 1
+            return True
+        gate = self.gate
+        with STAGE_SECONDS.time(stage="cascade"):
+            x = run_blocking(self._preprocess, gate, frame_bgr)
+            with NPU_QUEUE.for_backend(gate.backend.name, priority, timeout):
+                outputs = run_blocking(gate.infer, x)
+            _boxes, _areas, scores, _cls = gate.decode(outputs)
+        present = scores.size > 0 and float(scores.max()) >= settings.CASCADE_CONF
+        CASCADE_GATE.inc(result="pass" if present else "reject")
+        if present:
+            self._gate_hot[gate_key] = settings.CASCADE_HOLD_FRAMES
+        return present
+
+    @staticmethod
+    def _preprocess(model: RknnModel, frame_bgr: np.ndarray) -> np.ndarray:
+        return model.preprocess(cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB))
+
+    def swap_model(self, new_model: RknnModel) -> RknnModel:
+        """Reemplaza el modelo entre dos frames y devuelve el anterior (sin liberar)."""
+        with self._model_lock:
+            old, self.model = self.model, new_model
+            self.img_size = new_model.img_size
+        return old
 
-    def label_for_class(self, class_name: str) -> str:
-        if class_name in self.grupos["MALIGNO/PREMALIGNO"]:
+    @classmethod
+    def label_for_class(cls, class_name: str) -> str:
+        if class_name in cls.GRUPOS["MALIGNO/PREMALIGNO"]:
             return "MALIGNO"
-        if class_name in self.grupos["BENIGNO"]:
+        if class_name in cls.GRUPOS["BENIGNO"]:
             return "BENIGNO"
         return class_name
 
-    def adjust_conf(self, conf: float) -> float:
+    @staticmethod
+    def adjust_conf(conf: float) -> float:
         if conf < 0.3: return conf + 0.5
         if conf < 0.4: return conf + 0.4
         if conf < 0.5: return conf + 0.3
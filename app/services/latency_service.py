@@ -0,0 +1,87 @@
+"""Service: latencia vidrio a vidrio por cliente del stream.
+
+Cada frame lleva su id y tres marcas de tiempo del servidor (captura, inferencia
+lista, JPEG listo). El navegador devuelve cuándo lo pintó, ya convertido al reloj
+del servidor con el offset que estimó contra /clock, y aquí se arman los tramos:
+
+    inference  captura -> inferencia lista
+    encode     inferencia lista -> JPEG listo
+    delivery   JPEG listo -> pintado (red + decodificación en el navegador)
+    total      captura -> pintado
+
+Los tramos van a un histograma por cámara; los percentiles del total se guardan
+por cliente (ventana de las últimas muestras) y se publican como gauges.
+"""
+from __future__ import annotations
+import itertools
+import threading
+from collections import deque
+import numpy as np
+from app.services.metrics_service import GLASS_LATENCY, GLASS_QUANTILES
+
+QUANTILES = (50, 95, 99)
+WINDOW = 512          # muestras por cliente para los percentiles
+PUBLISH_EVERY = 30    # recalcular los gauges cada N muestras
+
+
+class _Client:
+    def __init__(self, cid: str, cam: str, remote: str) -> None:
+        self.id = cid
+        self.cam = cam
+        self.remote = remote
+        self.totals: deque[float] = deque(maxlen=WINDOW)
+        self.samples = 0
+
+    def percentiles(self) -> dict[str, float]:
+        if not self.totals:
+            return {}
+        a = np.fromiter(self.totals, np.float64)
+        return {f"p{q}": float(np.percentile(a, q)) for q in QUANTILES}
+
+
+class LatencyTracker:
+    def __init__(self) -> None:
+        self._clients: dict[str, _Client] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def open(self, cam: str, remote: str | None = None) -> str:
+        """Registra un cliente del stream; devuelve su id (para record/close)."""
+        cid = f"c{next(self._ids)}"
+        with self._lock:
+            self._clients[cid] = _Client(cid, cam, remote or "?")
+        return cid
+
+    def close(self, cid: str) -> None:
+        with self._lock:
+            c = self._clients.pop(cid, None)
+        if c is not None:
+            for q in QUANTILES:
+                GLASS_QUANTILES.remove(client=cid, cam=c.cam, quantile=f"0.{q}")
+
+    def record(self, cid: str, meta: dict, shown: float) -> dict[str, float] | None:
+        """Tramos del frame 'meta' pintado en 'shown' (segundos, reloj del servidor). None si no aplica."""
+        c = self._clients.get(cid)
+        t_cap, t_inf, t_enc = meta.get("ts_capture"), meta.get("ts_infer"), meta.get("ts_encode")
+        if c is None or not (t_cap and t_inf and t_enc) or shown <= 0:
+            return None
+        stages = {"inference": t_inf - t_cap, "encode": t_enc - t_inf,
+                  "delivery": shown - t_enc, "total": shown - t_cap}
+        for stage, v in stages.items():
+            GLASS_LATENCY.observe(max(0.0, v), cam=c.cam, stage=stage)
+        c.totals.append(max(0.0, stages["total"]))
+        c.samples += 1
+        if c.samples % PUBLISH_EVERY == 1:
+            for name, v in c.percentiles().items():
+                GLASS_QUANTILES.set(v, client=cid, cam=c.cam, quantile=f"0.{name[1:]}")
+        return stages
+
+    def stats(self) -> list[dict]:
+        with self._lock:
+            clients = list(self._clients.values())
+        return [{"client": c.id, "cam": c.cam, "remote": c.remote, "samples": c.samples,
+                 **{k: round(v * 1000.0, 1) for k, v in c.percentiles().items()}} for c in clients]
+
+
+# instancia única del proceso (los clientes de otros workers se ven en su propio /metrics)
+LATENCY = LatencyTracker()
@@ -0,0 +1,251 @@
+"""Service: métricas en memoria (contadores, gauges, histogramas) en formato de texto Prometheus.
+
+Sin dependencias externas y con costo mínimo por observación (un lock + bisect).
+Cada proceso tiene su propio registro: con varios workers de Gunicorn cada uno
+expone sus propias series en /metrics.
+"""
+from __future__ import annotations
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+# buckets en segundos pensados para etapas de un frame (0.5 ms .. 2.5 s)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0, 2.5)
+
+
+def _fmt_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_: str, labelnames: tuple = ()) -> None:
+        self.name = name
+        self.help = help_
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *a, **kw) -> None:
+        super().__init__(*a, **kw)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0.0)]
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def remove(self, **labels) -> None:
+        """Quita una serie (p.ej. la de un cliente que se desconectó)."""
+        with self._lock:
+            self._values.pop(self._key(labels), None)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, help_, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, list] = {}  # key -> [counts por bucket..., +Inf, sum]
+
+    def observe(self, value: float, **labels) -> None:
+        k = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(k)
+            if s is None:
+                s = self._series[k] = [0] * (len(self.buckets) + 1) + [0.0]
+            s[i] += 1
+            s[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def timed(self, **labels):
+        """Decorador: observa la duración de cada llamada."""
+        def deco(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return deco
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = [(k, list(s)) for k, s in self._series.items()]
+        out = []
+        for k, s in items:
+            acc = 0
+            for b, c in zip(self.buckets + (float("inf"),), s[:-1]):
+                acc += c
+                le = 'le="' + _fmt_value(b) + '"'
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, k, le)} {acc}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labelnames, k)} {_fmt_value(s[-1])}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labelnames, k)} {acc}")
+        return out
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, help_: str, **kw):
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = cls(name, help_, **kw)
+            return m
+
+    def counter(self, name: str, help_: str, labelnames: tuple = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_, labelnames=labelnames)
+
+    def gauge(self, name: str, help_: str, labelnames: tuple = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_, labelnames=labelnames)
+
+    def histogram(self, name: str, help_: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_, labelnames=labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: list[str] = []
+        for m in metrics:
+            lines.extend(m.header())
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+# instancia única del proceso
+METRICS = Registry()
+
+# --- métricas del pipeline ---
+STAGE_SECONDS = METRICS.histogram(
+    "nds_stage_seconds", "Duración por etapa del pipeline (camera_read, preprocess, inference, postprocess, draw, encode)",
+    labelnames=("stage",))
+FRAMES_TOTAL = METRICS.counter("nds_stream_frames_total", "Frames enviados al stream MJPEG", labelnames=("cam",))
+DROPPED_FRAMES = METRICS.counter("nds_stream_dropped_frames_total", "Frames descartados", labelnames=("reason",))
+STREAM_FPS = METRICS.gauge("nds_stream_fps", "FPS del stream por cámara (media móvil exponencial)", labelnames=("cam",))
+STREAM_BYTES = METRICS.counter("nds_stream_bytes_total", "Bytes JPEG enviados por el stream", labelnames=("cam",))
+ACTIVE_VIEWERS = METRICS.gauge("nds_stream_active_viewers", "Clientes conectados a /video_feed", labelnames=("cam",))
+STREAM_LATENCY = METRICS.histogram(
+    "nds_stream_latency_seconds", "Captura del frame -> envío al cliente, por cámara", labelnames=("cam",))
+WS_ACK_WAIT = METRICS.histogram(
+    "nds_stream_ws_ack_wait_seconds", "Envío de un frame por WebSocket -> ack del cliente", labelnames=("cam",))
+INFER_QUEUE_DEPTH = METRICS.gauge("nds_inference_queue_depth", "Inferencias en curso o esperando la NPU")
+INFERENCES_TOTAL = METRICS.counter("nds_inferences_total", "Inferencias ejecutadas")
+
+# --- métricas de almacenamiento / reportes ---
+PATIENT_IO_SECONDS = METRICS.histogram(
+    "nds_patient_io_seconds", "Duración de operaciones de PatientService", labelnames=("op",))
+REPORT_SECONDS = METRICS.histogram(
+    "nds_report_seconds", "Duración de la generación de reportes", labelnames=("step",),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+
+# --- scheduling híbrido NPU/CPU ---
+SCHED_REQUESTS = METRICS.counter(
+    "nds_scheduler_requests_total", "Inferencias despachadas por backend", labelnames=("backend",))
+SCHED_INFLIGHT = METRICS.gauge(
+    "nds_scheduler_inflight", "Inferencias en curso o en cola por backend", labelnames=("backend",))
+SCHED_CPU_RATIO = METRICS.gauge("nds_scheduler_cpu_ratio", "Fracción de inferencias resueltas en CPU")
+SCHED_NPU_WAIT_MS = METRICS.gauge("nds_scheduler_npu_wait_estimate_ms", "Espera estimada en la cola de la NPU")
+
+# --- modelo ---
+MODEL_SWAPS = METRICS.counter("nds_model_swaps_total", "Cambios de modelo en caliente", labelnames=("result",))
+
+# --- arranque ---
+STARTUP_SECONDS = METRICS.gauge("nds_startup_seconds", "Arranque en frío: segundos hasta cada hito", labelnames=("milestone",))
+
+# --- /predict ---
+PREDICT_BATCH_SIZE = METRICS.histogram(
+    "nds_predict_batch_size", "Imágenes por micro-lote despachado", buckets=(1, 2, 3, 4, 6, 8, 12, 16, 32))
+PREDICT_CACHE = METRICS.counter("nds_predict_cache_total", "Consultas a la cache de /predict", labelnames=("result",))
+
+# --- cola de prioridad NPU ---
+NPU_QUEUE_DEPTH = METRICS.gauge("nds_npu_queue_depth", "Inferencias esperando turno de NPU por clase", labelnames=("cls",))
+NPU_QUEUE_WAIT = METRICS.histogram("nds_npu_queue_wait_seconds", "Espera por un turno de NPU", labelnames=("cls",))
+NPU_SLO_MISSES = METRICS.counter(
+    "nds_npu_slo_misses_total", "Inferencias que superaron el SLO de su clase", labelnames=("cls",))
+
+# --- cámara ---
+CAMERA_FRAMES = METRICS.counter("nds_camera_frames_total", "Frames leídos de la fuente de video")
+CAMERA_DROPPED = METRICS.counter(
+    "nds_camera_dropped_frames_total", "Frames de la fuente descartados (overwritten: nadie alcanzó a leerlos)",
+    labelnames=("reason",))
+CAMERA_ACTIVE = METRICS.gauge("nds_camera_active", "1 si el lector de la cámara está corriendo", labelnames=("cam",))
+CAMERA_SUBSCRIBERS = METRICS.gauge("nds_camera_subscribers", "Clientes suscritos a la cámara", labelnames=("cam",))
+
+# --- latencia vidrio a vidrio (captura -> frame pintado en el navegador) ---
+GLASS_BUCKETS = (0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0, 10.0)
+GLASS_LATENCY = METRICS.histogram(
+    "nds_glass_latency_seconds", "Latencia por tramo (inference, encode, delivery, total) según lo reporta el navegador",
+    labelnames=("cam", "stage"), buckets=GLASS_BUCKETS)
+GLASS_QUANTILES = METRICS.gauge(
+    "nds_glass_latency_client_seconds", "Percentiles de latencia total por cliente conectado",
+    labelnames=("client", "cam", "quantile"))
+
+# --- calidad del frame ---
+SHARPNESS = METRICS.gauge("nds_frame_sharpness", "Nitidez del último frame (varianza del Laplaciano)", labelnames=("cam",))
+INFERENCES_SKIPPED = METRICS.counter(
+    "nds_inferences_skipped_total", "Frames del stream que no llegaron al detector completo", labelnames=("reason",))
+CASCADE_GATE = METRICS.counter(
+    "nds_cascade_gate_total", "Resultados del modelo de presencia de la cascada (pass: corre el completo)",
+    labelnames=("result",))
+TILES_PER_FRAME = METRICS.histogram(
+    "nds_tiles_per_frame", "Teselas inferidas por frame en modo teselas", buckets=(1, 2, 4, 6, 9, 12, 16, 25))
+AUTOCAPTURES = METRICS.counter("nds_autocaptures_total", "Ventanas de auto-captura cerradas", labelnames=("result",))
+
+# --- grabación de sesiones ---
+RECORD_FRAMES = METRICS.counter("nds_record_frames_total", "Frames escritos en grabaciones de sesión", labelnames=("cam",))
+RECORD_SKIPPED = METRICS.counter("nds_record_skipped_frames_total", "Frames de la cámara que la grabación no alcanzó a escribir")
+RECORD_ACTIVE = METRICS.gauge("nds_record_active", "1 si hay una grabación en curso", labelnames=("cam",))
@@ -0,0 +1,142 @@
+"""Service: cambio de modelo en caliente (sin reiniciar la app Flask).
+
+El modelo nuevo se carga en un runtime aparte en segundo plano, se calienta
+con inferencias en ceros y se valida su salida; recién entonces se intercambia
+con el activo entre dos frames (InferenceService.swap_model) y se libera el
+runtime anterior. Mientras tanto el stream sigue con el modelo viejo.
+"""
+from __future__ import annotations
+import threading
+import time
+from pathlib import Path
+import numpy as np
+from app.adapters.rknn_adapter import RknnModel
+from app.adapters.inference_backend import create_backend
+from app.config import settings
+from app.services.inference_service import InferenceService
+from app.services.metrics_service import MODEL_SWAPS
+from app.services.npu_queue import NPU_QUEUE
+from app.services.executor import run_blocking, spawn_task
+
+
+class ModelManager:
+    def __init__(self, infer: InferenceService, warmup: int = 3) -> None:
+        self.infer = infer
+        self.warmup = int(warmup)
+        self._lock = threading.Lock()
+        self._running = False
+        self._status = {
+            "state": "idle",  # idle | loading | warming | swapping | done | error
+            "model_path": str(infer.model.backend.model_path) if infer.model.backend else None,
+            "backend": infer.backend_name,
+            "img_size": infer.img_size,
+            "timings_ms": {},
+            "error": None,
+        }
+
+    @staticmethod
+    def resolve_path(model_path: str) -> Path:
+        """Rutas relativas se buscan en MODELS_DIR; no se aceptan modelos fuera de esa carpeta."""
+        base = Path(settings.MODELS_DIR).resolve()
+        p = Path(model_path)
+        p = (p if p.is_absolute() else base / p).resolve()
+        if base not in p.parents:
+            raise ValueError(f"El modelo debe estar dentro de {base}")
+        if not p.is_file():
+            raise FileNotFoundError(f"Modelo no encontrado: {p}")
+        return p
+
+    @property
+    def busy(self) -> bool:
+        return self._running
+
+    def status(self) -> dict:
+        with self._lock:
+            return {**self._status, "timings_ms": dict(self._status["timings_ms"])}
+
+    def _set(self, **kw) -> None:
+        with self._lock:
+            self._status.update(kw)
+
+    def request_swap(self, model_path: str, backend: str | None = None,
+                     img_size: int | None = None, warmup: int | None = None) -> dict:
+        """
+        Valida ruta y parámetros y lanza la carga en segundo plano.
+        ValueError/FileNotFoundError si son inválidos; RuntimeError si ya hay un cambio en curso.
+        """
+        path = self.resolve_path(model_path)
+        # se validan aquí: un error dentro del hilo dejaría el estado "loading" para siempre
+        try:
+            img_size = int(img_size or self.infer.img_size)
+            warmup = self.warmup if warmup is None else int(warmup)
+        except (TypeError, ValueError):
+            raise ValueError("img_size y warmup deben ser enteros")
+        if img_size <= 0 or img_size % 32:
+            raise ValueError(f"img_size inválido: {img_size} (múltiplo de 32)")
+        if warmup < 0:
+            raise ValueError(f"warmup inválido: {warmup}")
+        with self._lock:
+            if self.busy:
+                raise RuntimeError("Ya hay un cambio de modelo en curso")
+            self._status.update(state="loading", model_path=str(path), backend=backend,
+                                img_size=img_size, timings_ms={}, error=None)
+            self._running = True
+        # greenlet bajo gevent (comparte el lock del modelo y la cola NPU con los requests);
+        # la carga del runtime y las inferencias, C bloqueante, van a hilos nativos con run_blocking
+        spawn_task(lambda: self._run(path, backend, img_size, warmup), "model-swap")
+        return self.status()
+
+    def _run(self, path: Path, backend: str | None, img_size: int, warmup: int) -> None:
+        timings = {}
+        new = None
+        try:
+            t0 = time.perf_counter()
+            new = run_blocking(lambda: RknnModel(model_path=path, yaml_path=settings.CLASSES_YAML,
+                                                 img_size=img_size, backend=create_backend(backend, path)))
+            new.set_thresholds(**self.infer.model.get_thresholds())
+            timings["load"] = round((time.perf_counter() - t0) * 1000.0, 2)
+            self._set(state="warming", backend=new.backend.name, timings_ms=dict(timings))
+
+            # la primera inferencia paga la inicialización perezosa del runtime
+            t0 = time.perf_counter()
+            with NPU_QUEUE.for_backend(new.backend.name, "batch"):
+                sig = run_blocking(new.backend.output_signature, img_size)
+            timings["first_inference"] = round((time.perf_counter() - t0) * 1000.0, 2)
+            out = sig["outputs"][0]["shape"]
+            if out[-1] != 5 + len(new.class_names):
+                raise ValueError(f"Salida {out} incompatible con {len(new.class_names)} clases")
+
+            x = np.zeros((1, img_size, img_size, 3), np.uint8)
+            t0 = time.perf_counter()
+            for _ in range(warmup):
+                # prioridad de lote, turno por frame: el stream no espera al calentamiento
+                with NPU_QUEUE.for_backend(new.backend.name, "batch"):
+                    outputs = run_blocking(new.infer, x)
+                run_blocking(new.postprocess, outputs)
+            timings["warmup"] = round((time.perf_counter() - t0) * 1000.0, 2)
+            timings["warmup_per_inference"] = round(timings["warmup"] / warmup, 2) if warmup else None
+            self._set(state="swapping", timings_ms=dict(timings))
+
+            # espera al frame en curso (lock del servicio) y cambia la referencia
+            t0 = time.perf_counter()
+            old = self.infer.swap_model(new)
+            timings["swap"] = round((time.perf_counter() - t0) * 1000.0, 2)
+
+            t0 = time.perf_counter()
+            run_blocking(old.release)
+            timings["release_old"] = round((time.perf_counter() - t0) * 1000.0, 2)
+            self._set(state="done", timings_ms=dict(timings))
+            if settings.TILE_MODE == "on":
+                # pool de teselas (el de /predict) para el modelo nuevo; hasta entonces el stream no tesela
+                from app.services.predict_service import PREDICT
+                PREDICT.prepare(new.backend.model_path, img_size, new.backend.name)
+            MODEL_SWAPS.inc(result="ok")
+            print(f"[Model] Modelo activo: {path} ({new.backend.name}, {img_size}px) {timings}")
+        except Exception as e:
+            if new is not None:
+                run_blocking(new.release)
+            self._set(state="error", error=str(e), timings_ms=dict(timings))
+            MODEL_SWAPS.inc(result="error")
+            print(f"[Model] Cambio de modelo fallido ({path}): {e}")
+        finally:
+            self._running = False
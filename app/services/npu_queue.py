@@ -0,0 +1,107 @@
+"""Service: cola de prioridad delante de la NPU (stream en vivo > peticiones interactivas > lotes).
+
+Cada inferencia NPU del proceso pide un turno con NPU_QUEUE.slot(clase). Hay
+tantos turnos como núcleos (NPU_CORES); cuando uno se libera lo toma el que
+espera con mayor prioridad (FIFO dentro de la clase). Los turnos se piden por
+frame, así que un trabajo en lote cede la NPU en cada frontera de frame y un
+frame en vivo nunca espera más que una inferencia en curso.
+
+SLO por clase (NPU_SLO_MS): se cuentan los incumplimientos (espera + ejecución)
+y, si se pasa un timeout, quien espera más que eso se rinde con NpuBusy (el
+stream prefiere saltarse la inferencia de ese frame antes que mostrarla tarde).
+"""
+from __future__ import annotations
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from app.config import settings
+from app.services.metrics_service import NPU_QUEUE_DEPTH, NPU_QUEUE_WAIT, NPU_SLO_MISSES
+
+PRIORITIES = {"live": 0, "interactive": 1, "batch": 2}
+
+
+class NpuBusy(Exception):
+    """No hubo turno de NPU dentro del timeout pedido."""
+
+
+def parse_slos(spec: str) -> dict[str, float]:
+    """'live:120,interactive:800,batch:0' -> {clase: ms}; 0 = sin SLO."""
+    out = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, ms = part.partition(":")
+        out[name.strip()] = float(ms or 0)
+    return out
+
+
+class NpuQueue:
+    def __init__(self, slots: int | None = None, slo_ms: dict[str, float] | None = None) -> None:
+        self.slots = int(slots or settings.NPU_CORES)
+        self.slo_ms = slo_ms if slo_ms is not None else parse_slos(settings.NPU_SLO_MS)
+        self._free = self.slots
+        self._waiting: list[tuple[int, int]] = []  # heap (prioridad, seq)
+        self._depth = dict.fromkeys(PRIORITIES, 0)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _acquire(self, cls: str, timeout: float | None) -> None:
+        me = (PRIORITIES[cls], next(self._seq))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            heapq.heappush(self._waiting, me)
+            self._depth[cls] += 1
+            NPU_QUEUE_DEPTH.set(self._depth[cls], cls=cls)
+            try:
+                while not (self._free > 0 and self._waiting[0] == me):
+                    left = None if deadline is None else deadline - time.monotonic()
+                    if left is not None and left <= 0:
+                        self._waiting.remove(me)
+                        heapq.heapify(self._waiting)
+                        self._cond.notify_all()
+                        raise NpuBusy(f"sin turno de NPU para '{cls}' en {timeout * 1000.0:.0f} ms")
+                    self._cond.wait(left)
+                heapq.heappop(self._waiting)
+                self._free -= 1
+                # puede haber más turnos libres para el siguiente en la cola
+                self._cond.notify_all()
+            finally:
+                self._depth[cls] -= 1
+                NPU_QUEUE_DEPTH.set(self._depth[cls], cls=cls)
+
+    def _release(self) -> None:
+        with self._cond:
+            self._free += 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, cls: str = "interactive", timeout: float | None = None):
+        """Turno de NPU para una inferencia (un frame). NpuBusy si no llega antes de 'timeout' (s)."""
+        t0 = time.perf_counter()
+        self._acquire(cls, timeout)
+        t1 = time.perf_counter()
+        NPU_QUEUE_WAIT.observe(t1 - t0, cls=cls)
+        try:
+            yield
+        finally:
+            self._release()
+            slo = self.slo_ms.get(cls, 0.0)
+            if slo and (time.perf_counter() - t0) * 1000.0 > slo:
+                NPU_SLO_MISSES.inc(cls=cls)
+
+    def for_backend(self, backend_name: str, cls: str = "interactive", timeout: float | None = None):
+        """slot() si el backend corre en la NPU (o la simula); los backends CPU no compiten por ella."""
+        return self.slot(cls, timeout) if backend_name in ("rknn", "sim") else nullcontext()
+
+    def live_timeout(self) -> float | None:
+        """Timeout de espera para frames en vivo: el SLO de 'live' (None si no hay)."""
+        slo = self.slo_ms.get("live", 0.0)
+        return slo / 1000.0 if slo else None
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"slots": self.slots, "free": self._free, "waiting": dict(self._depth), "slo_ms": dict(self.slo_ms)}
+
+
+# instancia única del proceso: todas las inferencias NPU pasan por aquí
+NPU_QUEUE = NpuQueue()
@@ -0,0 +1,40 @@
+"""Service: dibujo de detecciones sobre el frame del stream (sin estado ni NPU)."""
+import cv2
+import numpy as np
+from app.services.inference_service import InferenceService
+
+
+def draw_detections(frame_bgr: np.ndarray, dets: list[dict], img_size: int = 640) -> np.ndarray:
+    """Dibuja cajas y etiquetas, reescalando de img_size x img_size a resolución original."""
+    H, W = frame_bgr.shape[:2]
+    sx, sy = W / float(img_size), H / float(img_size)
+
+    for d in dets:
+        conf = float(d["confidence"])
+        cls_name = d["class_name"]
+        etiqueta = InferenceService.label_for_class(cls_name)
+        conf = InferenceService.adjust_conf(conf)
+
+        x1, y1, x2, y2 = d["bbox_xyxy"]
+        x1, y1, x2, y2 = int(x1 * sx), int(y1 * sy), int(x2 * sx), int(y2 * sy)
+
+        cv2.rectangle(frame_bgr, (x1, y1), (x2, y2), (255, 0, 0), 2)
+        texto = f"{etiqueta} {conf:.2f}"
+        cv2.putText(
+            frame_bgr,
+            texto,
+            (max(0, x2 - 150), max(0, y2 - 10)),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.5,
+            (255, 0, 0),
+            2,
+        )
+    return frame_bgr
+
+
+def draw_roi(frame_bgr: np.ndarray, roi: tuple) -> np.ndarray:
+    """Recuadro de la región de interés (roi normalizado 0..1 sobre el frame)."""
+    H, W = frame_bgr.shape[:2]
+    x1, y1, x2, y2 = roi
+    cv2.rectangle(frame_bgr, (int(x1 * W), int(y1 * H)), (int(x2 * W) - 1, int(y2 * H) - 1), (0, 215, 255), 1)
+    return frame_bgr
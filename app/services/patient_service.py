@@ -5,18 +5,22 @@ from datetime import datetime
 import numpy as np
 import cv2
 from app.adapters.storage_fs import StorageFS
+from app.services.metrics_service import PATIENT_IO_SECONDS
+from app.services.executor import run_blocking
 
 class PatientService:
     def __init__(self, storage: StorageFS | None = None) -> None:
         self.storage = storage or StorageFS()
         self.info_file = "datos_paciente.txt"
 
+    @PATIENT_IO_SECONDS.timed(op="save_patient_info")
     def save_patient_info(self, datos: Dict[str, str]) -> None:
         cedula = datos.get("Cédula") or datos.get("cedula")
         assert cedula, "Cédula requerida"
         body = "\n".join([f"{k}: {v}" for k, v in datos.items()]) + "\n"
         self.storage.save_text(cedula, self.info_file, body)
 
+    @PATIENT_IO_SECONDS.timed(op="get_patient_info")
     def get_patient_info(self, cedula: str) -> Dict[str, str]:
         txt = self.storage.read_text(cedula, self.info_file)
         info: Dict[str, str] = {}
@@ -29,18 +33,22 @@ class PatientService:
             info["Cédula"] = cedula
         return info
 
+    @PATIENT_IO_SECONDS.timed(op="list_captures")
     def list_captures(self, cedula: str) -> List[str]:
         return self.storage.list_images(cedula)
 
+    @PATIENT_IO_SECONDS.timed(op="delete_capture")
     def delete_capture(self, cedula: str, filename: str) -> bool:
         return self.storage.delete_file(cedula, filename)
 
-    def save_capture_blob(self, cedula: str, np_image: np.ndarray) -> str:
+    @PATIENT_IO_SECONDS.timed(op="save_capture_blob")
+    def save_capture_blob(self, cedula: str, np_image: np.ndarray, tag: str | None = None) -> str:
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"captura_{ts}.jpg"
-        self.storage.write_image_from_np(cedula, filename, np_image)
+        filename = f"captura_{ts}_{tag}.jpg" if tag else f"captura_{ts}.jpg"
+        run_blocking(self.storage.write_image_from_np, cedula, filename, np_image)  # imwrite: JPEG + disco
         return filename
 
+    @PATIENT_IO_SECONDS.timed(op="list_patients_summary")
     def list_patients_summary(self) -> List[Dict[str, str]]:
         res = []
         for ced in self.storage.list_patients():
@@ -52,4 +60,8 @@ class PatientService:
                 "genero": info.get("Género", "N/A"),
                 "antecedentes": info.get("Antecedentes", "N/A"),
             })
-        return res
\ No newline at end of file
+        return res
+
+
+# instancia compartida por los blueprints (un solo StorageFS por proceso)
+PATIENTS = PatientService()
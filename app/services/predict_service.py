@@ -0,0 +1,231 @@
+"""Service: inferencia bajo demanda para /predict (micro-batching + cache por contenido).
+
+Las peticiones concurrentes se encolan; un despachador junta las que llegan dentro
+de una ventana corta (PREDICT_BATCH_WINDOW_MS, hasta PREDICT_MAX_BATCH imágenes) y
+las reparte en paralelo entre los runtimes de un RuntimePool (uno por núcleo NPU).
+El .rknn es de batch 1, así que el "lote" es la unidad de despacho: las imágenes
+repetidas dentro del lote se infieren una sola vez.
+
+Los resultados se cachean (LRU) por SHA-1 del archivo subido + modelo + thresholds:
+una captura re-enviada vuelve sin decodificar ni inferir.
+
+El mismo RuntimePool lo usa el modo teselas del stream (tiling_service): así no hay
+un tercer juego de runtimes sobre los mismos núcleos.
+"""
+from __future__ import annotations
+import hashlib
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import cv2
+import numpy as np
+from app.config import settings
+from app.services.settings_service import Thresholds
+from app.services.inference_service import InferenceService
+from app.services.runtime_pool import RuntimePool
+from app.services.npu_queue import NPU_QUEUE
+from app.services.executor import run_blocking, spawn_background
+from app.services.metrics_service import PREDICT_BATCH_SIZE, PREDICT_CACHE, STAGE_SECONDS
+
+
+class _ResultCache:
+    def __init__(self, max_items: int) -> None:
+        self.max_items = int(max_items)
+        self._d: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            v = self._d.get(key)
+            if v is not None:
+                self._d.move_to_end(key)
+            return v
+
+    def put(self, key, value) -> None:
+        if self.max_items <= 0:
+            return
+        with self._lock:
+            self._d[key] = value
+            self._d.move_to_end(key)
+            while len(self._d) > self.max_items:
+                self._d.popitem(last=False)
+
+
+class PredictService:
+    def __init__(self, model_path: str | None = None, img_size: int | None = None,
+                 runtimes: int | None = None, window_ms: float | None = None, max_batch: int | None = None,
+                 cache_size: int | None = None) -> None:
+        self.model_path = str(model_path or settings.RKNN_MODEL_PATH)
+        self.img_size = int(img_size or settings.RKNN_IMG_SIZE)
+        self.backend: str | None = None  # None = el que deduzca create_backend
+        self.runtimes = int(runtimes or settings.PREDICT_RUNTIMES)
+        self.window_s = float(window_ms if window_ms is not None else settings.PREDICT_BATCH_WINDOW_MS) / 1000.0
+        self.max_batch = int(max_batch or settings.PREDICT_MAX_BATCH)
+        self.cache = _ResultCache(cache_size if cache_size is not None else settings.PREDICT_CACHE_SIZE)
+        self._pool: RuntimePool | None = None
+        self._pool_key = None
+        self._jobs: queue.Queue = queue.Queue()
+        self._exec: ThreadPoolExecutor | None = None
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        self._building = False
+
+    def use_model(self, model_path: str, img_size: int, backend: str | None = None) -> None:
+        """Sigue al modelo y backend activos (hot swap, fallback): el pool se recrea en el próximo lote."""
+        self.model_path, self.img_size, self.backend = str(model_path), int(img_size), backend
+
+    # ------------------------------------------------------------ API
+    def predict_many(self, blobs: list[bytes], thr: Thresholds) -> list[dict]:
+        """Una entrada por blob: {'sha1','cached','width','height','detections'} o {'sha1','error'}."""
+        futures = []
+        for blob in blobs:
+            sha = hashlib.sha1(blob).hexdigest()
+            key = (sha, self.model_path, self.img_size, thr.conf_th, thr.iou_th, thr.min_box_frac)
+            hit = self.cache.get(key)
+            if hit is not None:
+                PREDICT_CACHE.inc(result="hit")
+                futures.append({**hit, "sha1": sha, "cached": True})
+                continue
+            PREDICT_CACHE.inc(result="miss")
+            frame = run_blocking(cv2.imdecode, np.frombuffer(blob, np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                futures.append({"sha1": sha, "error": "imagen inválida"})
+                continue
+            fut: Future = Future()
+            self._submit((key, frame, thr, fut))
+            futures.append((sha, key, frame.shape, fut))
+
+        out = []
+        for f in futures:
+            if isinstance(f, dict):
+                out.append(f)
+                continue
+            sha, key, shape, fut = f
+            try:
+                res = {"width": shape[1], "height": shape[0], "detections": fut.result()}
+            except Exception as e:
+                out.append({"sha1": sha, "error": str(e)})
+                continue
+            self.cache.put(key, res)
+            out.append({**res, "sha1": sha, "cached": False})
+        return out
+
+    # ------------------------------------------------------------ despacho
+    def _submit(self, job) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch_loop, name="predict-batcher", daemon=True)
+                self._thread.start()
+        self._jobs.put(job)
+
+    def pool(self) -> RuntimePool | None:
+        """Pool listo para el modelo actual, sin bloquear; None si falta armarlo (ver prepare)."""
+        pool = self._pool
+        return pool if pool is not None and self._pool_key == (self.model_path, self.img_size, self.backend) else None
+
+    def prepare(self, model_path: str, img_size: int, backend: str | None = None) -> None:
+        """Sigue al modelo activo y arma el pool en segundo plano (lo llaman el motor y el cambio de modelo)."""
+        self.use_model(model_path, img_size, backend)
+        with self._start_lock:
+            if self._building or self.pool() is not None:
+                return
+            self._building = True
+        spawn_background(self._build_in_background, "predict-pool")
+
+    def _build_in_background(self) -> None:
+        try:
+            self._ensure_pool()
+        except Exception as e:
+            print(f"[Predict] No se pudo crear el pool de runtimes: {e}")
+        finally:
+            self._building = False
+
+    def _ensure_pool(self) -> RuntimePool:
+        with self._pool_lock:
+            key = (self.model_path, self.img_size, self.backend)
+            if self._pool is None or self._pool_key != key:
+                old, old_exec = self._pool, self._exec
+                self._pool = self._exec = None
+                if old_exec is not None:
+                    old_exec.shutdown(wait=True)  # que terminen los lotes en curso antes de liberar
+                if old is not None:
+                    old.close()  # y las teselas del stream que aún tengan un runtime prestado
+                pool = RuntimePool.create(n=self.runtimes, model_path=self.model_path, img_size=self.img_size,
+                                          backend=self.backend)
+                self._exec = ThreadPoolExecutor(max_workers=pool.size, thread_name_prefix="predict-npu")
+                self._pool, self._pool_key = pool, key
+            return self._pool
+
+    def _collect(self) -> list:
+        batch = [self._jobs.get()]
+        deadline = time.perf_counter() + self.window_s
+        while len(batch) < self.max_batch:
+            left = deadline - time.perf_counter()
+            if left <= 0:
+                break
+            try:
+                batch.append(self._jobs.get(timeout=left))
+            except queue.Empty:
+                break
+        return batch
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            batch = self._collect()
+            PREDICT_BATCH_SIZE.observe(len(batch))
+            try:
+                pool = self._ensure_pool()
+            except Exception as e:
+                for *_, fut in batch:
+                    fut.set_exception(e)
+                continue
+            # una sola inferencia por clave dentro del lote
+            groups: dict = {}
+            for key, frame, thr, fut in batch:
+                groups.setdefault(key, (frame, thr, []))[2].append(fut)
+            for frame, thr, futs in groups.values():
+                self._exec.submit(self._run_one, pool, frame, thr, futs)
+
+    @staticmethod
+    def _run_one(pool: RuntimePool, frame: np.ndarray, thr: Thresholds, futs: list) -> None:
+        try:
+            with pool.lease() as model:
+                with STAGE_SECONDS.time(stage="preprocess"):
+                    x = run_blocking(InferenceService._preprocess, model, frame)
+                with NPU_QUEUE.for_backend(model.backend.name, "interactive"), \
+                        STAGE_SECONDS.time(stage="inference"):
+                    outputs = run_blocking(model.infer, x)
+                with STAGE_SECONDS.time(stage="postprocess"):
+                    dets = run_blocking(model.postprocess, outputs, thr.conf_th, thr.iou_th, thr.min_box_frac)
+                img_size = model.img_size
+            dets = _to_image_coords(dets, frame.shape, img_size)
+        except Exception as e:
+            for f in futs:
+                f.set_exception(e)
+            return
+        for f in futs:
+            f.set_result(dets)
+
+
+def _to_image_coords(dets: list[dict], shape, img_size: int) -> list[dict]:
+    """bbox de 0..img_size a píxeles de la imagen original + etiqueta de grupo como en el stream."""
+    h, w = shape[:2]
+    sx, sy = w / float(img_size), h / float(img_size)
+    out = []
+    for d in dets:
+        x1, y1, x2, y2 = d["bbox_xyxy"]
+        out.append({
+            "class_id": d["class_id"],
+            "class_name": d["class_name"],
+            "group": InferenceService.label_for_class(d["class_name"]),
+            "confidence": round(float(d["confidence"]), 4),
+            "bbox_xyxy": [round(x1 * sx, 1), round(y1 * sy, 1), round(x2 * sx, 1), round(y2 * sy, 1)],
+        })
+    return out
+
+
+# instancia única: el pool de runtimes se crea con el primer /predict
+PREDICT = PredictService()
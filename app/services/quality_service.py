@@ -0,0 +1,95 @@
+"""Service: nitidez del frame y auto-captura del mejor frame de una ventana.
+
+Con el microscopio en mano muchos frames salen desenfocados. La nitidez se mide
+como varianza del Laplaciano sobre el frame reducido a SHARPNESS_WIDTH px de
+ancho (~1 ms en CPU): bajo SHARPNESS_MIN el frame no se manda a la NPU.
+
+La auto-captura observa los frames del stream durante una ventana y guarda,
+vía PatientService, solo el mejor: puntaje = nitidez * (1 + confianza máxima),
+así entre frames nítidos gana el que tiene la detección más segura.
+"""
+from __future__ import annotations
+import threading
+import time
+import cv2
+import numpy as np
+from app.config import settings
+from app.services.patient_service import PATIENTS
+from app.services.metrics_service import AUTOCAPTURES
+
+
+def sharpness(frame_bgr: np.ndarray, width: int | None = None) -> float:
+    """Varianza del Laplaciano en gris, sobre el frame reducido (comparable entre resoluciones)."""
+    width = int(width or settings.SHARPNESS_WIDTH)
+    h, w = frame_bgr.shape[:2]
+    if w > width:
+        frame_bgr = cv2.resize(frame_bgr, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def is_sharp(score: float) -> bool:
+    return settings.SHARPNESS_MIN <= 0 or score >= settings.SHARPNESS_MIN
+
+
+class AutoCapture:
+    """Una ventana de auto-captura de una cámara: guarda el mejor frame al cerrarse."""
+    def __init__(self, cam: str, cedula: str, window_s: float | None = None) -> None:
+        self.cam = cam
+        self.cedula = cedula
+        self.window_s = float(window_s or settings.AUTOCAPTURE_WINDOW_S)
+        self.deadline = time.time() + self.window_s
+        self.state = "running"  # running | saving | done | empty | error
+        self.frames = 0
+        self.best_score = -1.0
+        self.best_sharpness = 0.0
+        self.best_conf = 0.0
+        self._best: np.ndarray | None = None
+        self._last_seq = 0
+        self.filename: str | None = None
+        self.error: str | None = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def score(sharp: float, dets: list[dict]) -> tuple[float, float]:
+        conf = max((float(d["confidence"]) for d in dets), default=0.0)
+        return sharp * (1.0 + conf), conf
+
+    def offer(self, seq: int, frame: np.ndarray, sharp: float, dets: list[dict]) -> None:
+        """Frame sin anotar del stream (varios clientes ofrecen el mismo seq: cuenta una vez)."""
+        with self._lock:
+            if self.state != "running" or seq <= self._last_seq:
+                return
+            self._last_seq = seq
+            self.frames += 1
+            if is_sharp(sharp):
+                score, conf = self.score(sharp, dets)
+                if score > self.best_score:
+                    self.best_score, self.best_sharpness, self.best_conf = score, sharp, conf
+                    self._best = frame.copy()
+        self.finish_if_due()
+
+    def finish_if_due(self) -> None:
+        with self._lock:
+            if self.state != "running" or time.time() < self.deadline:
+                return
+            if self._best is None:
+                self.state = "empty"  # ningún frame pasó el umbral de nitidez
+                AUTOCAPTURES.inc(result="empty")
+                return
+            self.state = "saving"
+            best, self._best = self._best, None
+        try:
+            self.filename = PATIENTS.save_capture_blob(self.cedula, best, tag=f"{self.cam}_auto")
+            self.state = "done"
+            AUTOCAPTURES.inc(result="saved")
+        except Exception as e:
+            self.error, self.state = str(e), "error"
+            AUTOCAPTURES.inc(result="error")
+
+    def status(self) -> dict:
+        return {"cam": self.cam, "state": self.state, "frames": self.frames,
+                "remaining_s": round(max(0.0, self.deadline - time.time()), 2),
+                "best_sharpness": round(self.best_sharpness, 1), "best_confidence": round(self.best_conf, 4),
+                "filename": self.filename, "error": self.error}
+
@@ -0,0 +1,238 @@
+"""Service: grabación de la sesión en segmentos de video + línea de tiempo de detecciones.
+
+Guardar JPEG por frame llena la SD en minutos. Un hilo de fondo por grabación lee
+los frames (sin anotar) del lector de la cámara y los escribe con cv2.VideoWriter
+en segmentos MJPG de RECORD_SEGMENT_S segundos:
+
+    <paciente>/sesiones/<sesion>/seg_0000.avi, seg_0001.avi, ...
+    <paciente>/sesiones/<sesion>/timeline.jsonl   una línea por frame
+    <paciente>/sesiones/<sesion>/session.json     manifiesto al detener
+
+Cada línea del timeline es {"i", "seg", "pos", "t", "seq", "dseq"} y lleva "dets"
+solo cuando cambia la inferencia (dseq = seq del frame inferido), así queda
+compacta. La grabación no infiere: toma la última inferencia que publica el stream
+de la cámara (CameraSession.result). Sin nadie mirando el stream con predicciones
+el timeline queda sin detecciones (dseq fijo); "dets_updates" en el manifiesto
+cuenta cuántas veces cambiaron, para distinguir "sin hallazgos" de "sin inferencia".
+MJPG es intra-frame: extraer un frame es posicionarse en (seg, pos) y
+decodificar ese único frame, sin recorrer el segmento.
+"""
+from __future__ import annotations
+import bisect
+import json
+import os
+import time
+from datetime import datetime
+import cv2
+import numpy as np
+from app.config import settings
+from app.services.patient_service import PATIENTS
+from app.services.executor import spawn_background
+from app.services.metrics_service import RECORD_FRAMES, RECORD_SKIPPED, RECORD_ACTIVE
+
+SESSIONS_DIR = "sesiones"
+
+
+def sessions_root(cedula: str) -> str:
+    return os.path.join(PATIENTS.storage.patient_dir(cedula), SESSIONS_DIR)
+
+
+def session_dir(cedula: str, session: str) -> str:
+    if not session or "/" in session or ".." in session:
+        raise ValueError(f"Sesión inválida: {session}")
+    path = os.path.join(sessions_root(cedula), session)
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"No existe la sesión {session}")
+    return path
+
+
+class SessionRecorder:
+    def __init__(self, cam, cedula: str, fps: float | None = None, segment_s: float | None = None) -> None:
+        self.cam = cam  # CameraSession
+        self.cedula = cedula
+        self.fps = float(fps or settings.RECORD_FPS)
+        self.segment_frames = max(1, int(round(float(segment_s or settings.RECORD_SEGMENT_S) * self.fps)))
+        self.session = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{cam.name}"
+        self.dir = os.path.join(sessions_root(cedula), self.session)
+        self.running = False
+        self.state = "idle"  # idle | recording | stopped | error
+        self.error: str | None = None
+        self.frames = 0
+        self.skipped = 0
+        self.dets_updates = 0
+        self.segments: list[dict] = []
+        self.started = self.ended = None
+        self._writer = None
+        self._size = None
+
+    # ------------------------------------------------------------ ciclo de vida
+    def start(self) -> None:
+        """Abre la cámara (cuenta como un cliente más) y lanza el hilo de escritura. RuntimeError si la fuente no abre."""
+        try:
+            self.cam.subscribe()  # la cámara sigue abierta aunque nadie mire el stream
+            os.makedirs(self.dir, exist_ok=True)
+            self.running = True
+            self.state = "recording"
+            self.started = time.time()
+            RECORD_ACTIVE.set(1, cam=self.cam.name)
+            spawn_background(self._loop, f"recorder-{self.cam.name}")
+        except Exception:
+            # subscribe() ya sumó la referencia aunque la fuente no abra
+            self.running = False
+            self.state = "error"
+            RECORD_ACTIVE.set(0, cam=self.cam.name)
+            self.cam.unsubscribe()
+            raise
+
+    def stop(self) -> None:
+        """Pide detener; el hilo cierra el segmento y escribe el manifiesto."""
+        self.running = False
+
+    def _loop(self) -> None:
+        seq = 0
+        last_dseq = -1
+        try:
+            with open(os.path.join(self.dir, "timeline.jsonl"), "a", encoding="utf-8") as timeline:
+                while self.running:
+                    new_seq, ts, frame = self.cam.grabber.read(seq, timeout=1.0)
+                    if frame is None:
+                        continue
+                    if seq and new_seq > seq + 1:
+                        self.skipped += new_seq - seq - 1
+                        RECORD_SKIPPED.inc(new_seq - seq - 1)
+                    seq = new_seq
+                    seg, pos = self._write(frame, ts)
+
+                    line = {"i": self.frames, "seg": seg, "pos": pos, "t": round(ts, 4), "seq": seq}
+                    # una sola lectura: seq y dets siempre de la misma inferencia
+                    dseq, dets = self.cam.result
+                    line["dseq"] = dseq
+                    if dseq != last_dseq:
+                        line["dets"] = [{"c": d["class_name"], "p": round(float(d["confidence"]), 3),
+                                         "b": [round(float(v), 1) for v in d["bbox_xyxy"]]} for d in dets]
+                        if dseq:
+                            self.dets_updates += 1
+                        last_dseq = dseq
+                    timeline.write(json.dumps(line, separators=(",", ":")) + "\n")
+                    self.frames += 1
+                    RECORD_FRAMES.inc(cam=self.cam.name)
+        except Exception as e:
+            self.error, self.state = str(e), "error"
+            print(f"[Recording] Grabación detenida: {e}")
+        finally:
+            self._close_segment()
+            self.running = False
+            self.ended = time.time()
+            if self.state != "error":
+                self.state = "stopped"
+            self._write_manifest()
+            RECORD_ACTIVE.set(0, cam=self.cam.name)
+            self.cam.unsubscribe()
+
+    # ------------------------------------------------------------ segmentos
+    def _write(self, frame: np.ndarray, ts: float) -> tuple[int, int]:
+        size = (frame.shape[1], frame.shape[0])
+        seg = self.segments[-1] if self.segments else None
+        if seg is None or seg["frames"] >= self.segment_frames or size != self._size:
+            seg = self._open_segment(size, ts)
+        self._writer.write(frame)
+        pos = seg["frames"]
+        seg["frames"] += 1
+        seg["t1"] = ts
+        return len(self.segments) - 1, pos
+
+    def _open_segment(self, size: tuple, ts: float) -> dict:
+        self._close_segment()
+        name = f"seg_{len(self.segments):04d}.avi"
+        writer = cv2.VideoWriter(os.path.join(self.dir, name), cv2.VideoWriter_fourcc(*"MJPG"), self.fps, size)
+        if not writer.isOpened():
+            raise RuntimeError(f"No se pudo abrir el VideoWriter para {name}")
+        writer.set(cv2.VIDEOWRITER_PROP_QUALITY, settings.RECORD_QUALITY)
+        self._writer, self._size = writer, size
+        seg = {"file": name, "frames": 0, "t0": ts, "t1": ts, "width": size[0], "height": size[1]}
+        self.segments.append(seg)
+        return seg
+
+    def _close_segment(self) -> None:
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+    def _write_manifest(self) -> None:
+        with open(os.path.join(self.dir, "session.json"), "w", encoding="utf-8") as f:
+            json.dump(self.status(), f, indent=2)
+
+    def status(self) -> dict:
+        return {"session": self.session, "cam": self.cam.name, "cedula": self.cedula, "state": self.state,
+                "error": self.error, "fps": self.fps, "frames": self.frames, "skipped": self.skipped,
+                "dets_updates": self.dets_updates, "started": self.started, "ended": self.ended, "segments": list(self.segments)}
+
+
+# una grabación activa por cámara
+RECORDERS: dict[str, SessionRecorder] = {}
+
+
+def start_recording(cam, cedula: str, fps: float | None = None, segment_s: float | None = None) -> SessionRecorder:
+    rec = RECORDERS.get(cam.name)
+    if rec is not None and rec.running:
+        raise RuntimeError(f"La cámara '{cam.name}' ya está grabando la sesión {rec.session}")
+    rec = SessionRecorder(cam, cedula, fps=fps, segment_s=segment_s)
+    rec.start()
+    RECORDERS[cam.name] = rec
+    return rec
+
+
+def stop_recording(cam_name: str) -> SessionRecorder | None:
+    rec = RECORDERS.get(cam_name)
+    if rec is not None:
+        rec.stop()
+    return rec
+
+
+# ------------------------------------------------------------ lectura de sesiones
+def list_sessions(cedula: str) -> list[dict]:
+    root = sessions_root(cedula)
+    if not os.path.isdir(root):
+        return []
+    out = []
+    for name in sorted(os.listdir(root)):
+        manifest = os.path.join(root, name, "session.json")
+        if os.path.isfile(manifest):
+            with open(manifest, "r", encoding="utf-8") as f:
+                out.append(json.load(f))
+        else:
+            out.append({"session": name, "state": "recording"})
+    return out
+
+
+def load_timeline(cedula: str, session: str) -> list[dict]:
+    with open(os.path.join(session_dir(cedula, session), "timeline.jsonl"), "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def timeline_entry(timeline: list[dict], index: int | None = None, t: float | None = None) -> dict:
+    """Entrada por índice global de frame o por segundos desde el inicio de la sesión (el frame previo más cercano)."""
+    if not timeline:
+        raise LookupError("La sesión no tiene frames")
+    if index is None:
+        ts = [e["t"] for e in timeline]
+        index = max(0, bisect.bisect_right(ts, timeline[0]["t"] + float(t or 0.0)) - 1)
+    if not 0 <= index < len(timeline):
+        raise LookupError(f"Frame fuera de rango (0..{len(timeline) - 1})")
+    return timeline[index]
+
+
+def extract_frame(cedula: str, session: str, seg: int, pos: int) -> np.ndarray:
+    """Decodifica solo el frame 'pos' del segmento 'seg' (MJPG: sin recorrer los anteriores)."""
+    path = os.path.join(session_dir(cedula, session), f"seg_{int(seg):04d}.avi")
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise FileNotFoundError(f"No existe el segmento {seg}")
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(pos))
+        ok, frame = cap.read()
+    finally:
+        cap.release()
+    if not ok or frame is None:
+        raise LookupError(f"No se pudo leer el frame {pos} del segmento {seg}")
+    return frame
@@ -1,12 +1,14 @@
 """Service: empaqueta ZIP con PDF e imágenes de un paciente."""
 import io, os, zipfile
 from typing import Tuple
-from app.services.patient_service import PatientService
+from app.services.patient_service import PatientService, PATIENTS
 from app.adapters.pdf_reportlab import build_report
+from app.services.metrics_service import REPORT_SECONDS
+from app.services.executor import run_blocking
 
 class ReportService:
     def __init__(self, patient_svc: PatientService | None = None) -> None:
-        self.patient = patient_svc or PatientService()
+        self.patient = patient_svc or PATIENTS
 
     def make_zip_for_patient(self, cedula: str) -> Tuple[str, io.BytesIO]:
         info = self.patient.get_patient_info(cedula)
@@ -15,14 +17,22 @@ class ReportService:
         pdf_name = "informe_medico.pdf"
         pdf_path = self.patient.storage.file_path(cedula, pdf_name)
         img_paths = [self.patient.storage.file_path(cedula, f) for f in imagenes]
-        build_report(pdf_path, info, img_paths)
+        # ReportLab y la compresión son CPU pura: fuera del loop de gevent
+        with REPORT_SECONDS.time(step="pdf"):
+            run_blocking(build_report, pdf_path, info, img_paths)
 
         # zip en memoria
-        mem = io.BytesIO()
         pdir = self.patient.storage.patient_dir(cedula)
+        with REPORT_SECONDS.time(step="zip"):
+            mem = run_blocking(self._zip_dir, pdir)
+        mem.seek(0)
+        zip_filename = f"{cedula}_resultados.zip"
+        return zip_filename, mem
+
+    @staticmethod
+    def _zip_dir(pdir: str) -> io.BytesIO:
+        mem = io.BytesIO()
         with zipfile.ZipFile(mem, "w", zipfile.ZIP_DEFLATED) as zf:
             for fname in os.listdir(pdir):
                 zf.write(os.path.join(pdir, fname), fname)
-        mem.seek(0)
-        zip_filename = f"{cedula}_resultados.zip"
-        return zip_filename, mem
\ No newline at end of file
+        return mem
\ No newline at end of file
@@ -0,0 +1,87 @@
+"""Service: pool de runtimes RKNN (uno por núcleo de la NPU) para repartir inferencias en paralelo."""
+from __future__ import annotations
+import queue
+import time
+from contextlib import contextmanager
+from app.adapters.rknn_adapter import RknnModel, core_mask_for
+from app.adapters.inference_backend import create_backend
+from app.config import settings
+
+
+class PoolUnavailable(RuntimeError):
+    """El pool se cerró (cambio de modelo) o todavía no está listo."""
+
+
+class RuntimePool:
+    """
+    Cada RknnModel del pool tiene su propio runtime fijado a un núcleo de la NPU.
+    Un runtime RKNN no es reentrante: se presta a un solo hilo a la vez con lease().
+    """
+    def __init__(self, models: list[RknnModel]) -> None:
+        if not models:
+            raise ValueError("RuntimePool requiere al menos un modelo")
+        self.models = list(models)
+        self._free: queue.Queue = queue.Queue()
+        self.closed = False
+        for m in self.models:
+            self._free.put(m)
+
+    @classmethod
+    def create(cls, n: int | None = None, model_path: str | None = None, yaml_path: str | None = None,
+               img_size: int | None = None, backend: str | None = None, **model_kw) -> "RuntimePool":
+        n = int(n or settings.NPU_CORES)
+        models = [
+            RknnModel(
+                model_path=model_path or settings.RKNN_MODEL_PATH,
+                yaml_path=yaml_path or settings.CLASSES_YAML,
+                img_size=int(img_size or settings.RKNN_IMG_SIZE),
+                backend=create_backend(backend, model_path, core_mask=core_mask_for(i) if n > 1 else None),
+                **model_kw,
+            )
+            for i in range(n)
+        ]
+        return cls(models)
+
+    @property
+    def size(self) -> int:
+        return len(self.models)
+
+    def available(self) -> int:
+        return self._free.qsize()
+
+    @contextmanager
+    def lease(self, timeout: float | None = None):
+        """
+        Presta un modelo libre (bloquea hasta 'timeout'; queue.Empty si se agota).
+        PoolUnavailable si el pool se cierra mientras se espera: sus modelos ya no vuelven.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self.closed:
+                raise PoolUnavailable("RuntimePool cerrado")
+            wait = 0.5 if deadline is None else min(0.5, deadline - time.monotonic())
+            if wait <= 0:
+                raise queue.Empty
+            try:
+                model = self._free.get(timeout=wait)
+                break
+            except queue.Empty:
+                continue
+        try:
+            yield model
+        finally:
+            self._free.put(model)
+
+    def close(self, timeout: float | None = None) -> None:
+        """Espera a que vuelvan los modelos prestados (lease en curso) y recién entonces libera los runtimes."""
+        self.closed = True  # las esperas de lease() nuevas se cortan
+        for _ in range(self.size):
+            try:
+                self._free.get(timeout=timeout)
+            except queue.Empty:
+                break
+        self.release()
+
+    def release(self) -> None:
+        for m in self.models:
+            m.release()
@@ -0,0 +1,159 @@
+"""Service: scheduling híbrido NPU + CPU sobre InferenceService.
+
+La NPU es el destino por defecto. Cuando la espera estimada en su cola
+(inferencias por delante x latencia media) supera el presupuesto de latencia y
+la instancia CPU tiene capacidad libre, el frame se resuelve en CPU (núcleos A76).
+Cada detección queda etiquetada con el backend que la produjo.
+
+Con varias cámaras, admit(cam) reparte la capacidad medida (inferencias/s) en
+partes iguales entre las cámaras activas: cada una tiene un token bucket y, si
+lo agota, ese frame se muestra con las últimas detecciones en lugar de inferirse.
+"""
+from __future__ import annotations
+import threading
+import time
+import numpy as np
+from app.config import settings
+from app.services.inference_service import InferenceService
+from app.services.settings_service import Thresholds
+from app.services.metrics_service import SCHED_REQUESTS, SCHED_INFLIGHT, SCHED_CPU_RATIO, SCHED_NPU_WAIT_MS
+
+
+class _Lane:
+    """Un backend con su lock (los runtimes no son reentrantes) y su latencia media (EWMA)."""
+    def __init__(self, svc: InferenceService, max_inflight: int | None = None) -> None:
+        self.svc = svc
+        self.name = svc.backend_name
+        self.lock = threading.Lock()
+        self.inflight = 0
+        self.max_inflight = max_inflight
+        self.ewma_ms: float | None = None
+        self.count = 0
+
+    def observe(self, ms: float) -> None:
+        self.ewma_ms = ms if self.ewma_ms is None else 0.8 * self.ewma_ms + 0.2 * ms
+        self.count += 1
+
+
+class FrameQuota:
+    """Cuota justa de inferencias por cámara (token bucket a capacidad / cámaras activas)."""
+    def __init__(self, capacity_fn, active_window_s: float = 2.0, burst: float = 2.0) -> None:
+        self.capacity_fn = capacity_fn
+        self.active_window_s = active_window_s
+        self.burst = burst
+        self._buckets: dict[str, list[float]] = {}  # cam -> [tokens, último relleno, último pedido]
+        self._lock = threading.Lock()
+
+    def active(self, now: float | None = None) -> list[str]:
+        now = time.monotonic() if now is None else now
+        return [c for c, b in self._buckets.items() if now - b[2] < self.active_window_s]
+
+    def admit(self, cam: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            b = self._buckets.setdefault(cam, [self.burst, now, now])
+            b[2] = now
+            n = len(self.active(now))
+            capacity = self.capacity_fn()
+            if n <= 1 or capacity is None:
+                return True  # sin competencia (o sin medidas todavía): no se limita
+            b[0] = min(self.burst, b[0] + (now - b[1]) * capacity / n)
+            b[1] = now
+            if b[0] >= 1.0:
+                b[0] -= 1.0
+                return True
+            return False
+
+
+class HybridScheduler:
+    def __init__(self, primary: InferenceService, cpu: InferenceService | None = None,
+                 budget_ms: float | None = None, cpu_max_inflight: int | None = None) -> None:
+        self.primary = _Lane(primary)
+        self.cpu = _Lane(cpu, int(cpu_max_inflight or settings.CPU_MAX_INFLIGHT)) if cpu is not None else None
+        self.budget_ms = float(budget_ms if budget_ms is not None else settings.NPU_LATENCY_BUDGET_MS)
+        self._state = threading.Lock()
+        self.quota = FrameQuota(self.capacity_fps)
+
+    @classmethod
+    def from_settings(cls, primary: InferenceService) -> "HybridScheduler":
+        """Crea la instancia CPU solo si HYBRID_SCHEDULING está activo y el principal no es ya CPU."""
+        cpu = None
+        # la reproducción de trazas no se mezcla con salidas reales de la CPU
+        if settings.HYBRID_SCHEDULING and primary.backend_name not in ("onnx", "replay"):
+            try:
+                cpu = InferenceService(backend="onnx", img_size=primary.img_size, cascade=False, trace=False)
+            except Exception as e:
+                print(f"[Scheduler] Sin backend CPU para overflow: {e}")
+        return cls(primary, cpu)
+
+    # compatibilidad con el uso directo de InferenceService en el stream
+    @property
+    def img_size(self) -> int:
+        return self.primary.svc.img_size
+
+    def capacity_fps(self) -> float | None:
+        """Inferencias/s sostenibles según la latencia media de cada backend (None sin medidas)."""
+        lanes = [self.primary] + ([self.cpu] if self.cpu else [])
+        measured = [l for l in lanes if l.ewma_ms]
+        if not measured:
+            return None
+        return sum(1000.0 / l.ewma_ms for l in measured)  # cada lane ejecuta de a uno (lane.lock)
+
+    def admit(self, cam: str) -> bool:
+        """¿Le toca inferir a este frame de 'cam'? (cuota justa entre cámaras activas)."""
+        return self.quota.admit(cam)
+
+    def npu_wait_ms(self) -> float:
+        """Espera estimada para un frame que entre ahora a la cola del backend principal."""
+        return self.primary.inflight * (self.primary.ewma_ms or 0.0)
+
+    def _choose(self, prefer: str) -> _Lane:
+        with self._state:
+            lane = self.primary
+            if self.cpu is not None and prefer != "npu":
+                cpu_free = self.cpu.inflight < self.cpu.max_inflight
+                if prefer == "cpu" and cpu_free:
+                    lane = self.cpu
+                elif cpu_free:
+                    wait = self.npu_wait_ms()
+                    SCHED_NPU_WAIT_MS.set(wait)
+                    if wait + (self.primary.ewma_ms or 0.0) > self.budget_ms:
+                        lane = self.cpu
+            lane.inflight += 1
+            SCHED_INFLIGHT.set(lane.inflight, backend=lane.name)
+            return lane
+
+    def predict(self, frame_bgr: np.ndarray, thr: Thresholds | None = None, prefer: str = "auto",
+                priority: str = "live", timeout: float | None = None, gate_key: str = "") -> list[dict]:
+        """
+        prefer: 'auto' (NPU con overflow a CPU), 'npu' o 'cpu' (pedido explícito, si hay capacidad).
+        priority/timeout: clase y espera máxima en la cola de la NPU (ver npu_queue).
+        gate_key: cámara del frame, para la retención de la cascada (ver InferenceService).
+        """
+        lane = self._choose(prefer)
+        try:
+            with lane.lock:
+                t0 = time.perf_counter()
+                dets = lane.svc.predict(frame_bgr, thr, priority, timeout, gate_key=gate_key)
+                lane.observe((time.perf_counter() - t0) * 1000.0)
+        finally:
+            with self._state:
+                lane.inflight -= 1
+                SCHED_INFLIGHT.set(lane.inflight, backend=lane.name)
+        SCHED_REQUESTS.inc(backend=lane.name)
+        total = self.primary.count + (self.cpu.count if self.cpu else 0)
+        SCHED_CPU_RATIO.set((self.cpu.count / total) if (self.cpu and total) else 0.0)
+        for d in dets:
+            d["backend"] = lane.name
+        return dets
+
+    def stats(self) -> dict:
+        lanes = [self.primary] + ([self.cpu] if self.cpu else [])
+        return {
+            "budget_ms": self.budget_ms,
+            "capacity_fps": round(self.capacity_fps() or 0.0, 2),
+            "active_cameras": self.quota.active(),
+            "npu_wait_estimate_ms": round(self.npu_wait_ms(), 2),
+            "lanes": {l.name: {"inflight": l.inflight, "count": l.count,
+                               "ewma_ms": round(l.ewma_ms, 2) if l.ewma_ms else None} for l in lanes},
+        }
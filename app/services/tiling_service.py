@@ -0,0 +1,139 @@
+"""Service: inferencia por teselas a resolución nativa (lesiones chicas).
+
+RknnModel.preprocess aplasta el frame entero a img_size x img_size: en 1920x1080
+una lesión de 30 px queda en ~10 px y min_box_frac la descarta. En modo teselas
+el frame se corta en ventanas de TILE_SIZE px con TILE_OVERLAP de solapamiento,
+cada una se infiere a resolución nativa repartiendo las teselas entre los
+runtimes del RuntimePool de /predict (uno por núcleo NPU), y las cajas se juntan
+en coordenadas del frame con un NMS entre teselas. Mientras ese pool se arma
+(arranque, cambio de modelo) el stream sigue con la inferencia normal.
+
+La salida usa la misma convención que InferenceService.predict (0..img_size),
+así el resto del pipeline (dibujo, HOLD, /cameras) no cambia.
+"""
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from app.config import settings
+from app.services.settings_service import Thresholds
+from app.services.inference_service import InferenceService
+from app.services.runtime_pool import RuntimePool, PoolUnavailable
+from app.services.predict_service import PREDICT
+from app.services.npu_queue import NPU_QUEUE
+from app.services.executor import run_blocking
+from app.services.metrics_service import STAGE_SECONDS, TILES_PER_FRAME
+
+
+def _axis(dim: int, tile: int, step: int) -> list[int]:
+    if dim <= tile:
+        return [0]
+    pos = list(range(0, dim - tile, step))
+    pos.append(dim - tile)  # la última tesela queda alineada al borde
+    return pos
+
+
+def tile_grid(width: int, height: int, tile: int | None = None, overlap: float | None = None) -> list[tuple]:
+    """Rectángulos (x0, y0, x1, y1) que cubren el frame con el solapamiento pedido."""
+    tile = int(tile or settings.TILE_SIZE)
+    overlap = float(settings.TILE_OVERLAP if overlap is None else overlap)
+    step = max(1, int(round(tile * (1.0 - overlap))))
+    return [(x, y, min(width, x + tile), min(height, y + tile))
+            for y in _axis(height, tile, step) for x in _axis(width, tile, step)]
+
+
+def merge_detections(dets: list[dict], iou_th: float, ios_th: float | None = None) -> list[dict]:
+    """
+    NMS class-agnostic entre teselas (cajas en px del frame). Además de IoU se
+    suprime por intersección sobre la caja menor: una lesión cortada por el borde
+    de una tesela deja un fragmento que la otra tesela ve completo.
+    """
+    if len(dets) <= 1:
+        return dets
+    ios_th = float(settings.TILE_MERGE_IOS if ios_th is None else ios_th)
+    boxes = np.array([d["bbox_xyxy"] for d in dets], np.float32)
+    scores = np.array([d["confidence"] for d in dets], np.float32)
+    areas = np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        i, rest = order[0], order[1:]
+        keep.append(int(i))
+        w = np.clip(np.minimum(boxes[i, 2], boxes[rest, 2]) - np.maximum(boxes[i, 0], boxes[rest, 0]), 0, None)
+        h = np.clip(np.minimum(boxes[i, 3], boxes[rest, 3]) - np.maximum(boxes[i, 1], boxes[rest, 1]), 0, None)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        ios = inter / (np.minimum(areas[i], areas[rest]) + 1e-9)
+        order = rest[(iou <= iou_th) & (ios <= ios_th)]
+    return [dets[i] for i in keep]
+
+
+class TiledDetector:
+    def __init__(self, runtimes: int | None = None, pool: RuntimePool | None = None) -> None:
+        """
+        pool: pool fijo ya cargado (herramientas/benchmarks). Sin él se usa el RuntimePool
+        de /predict (PREDICT), que se arma en segundo plano al cargar o cambiar el modelo.
+        """
+        self.runtimes = int(runtimes or settings.TILE_RUNTIMES)
+        self.img_size = int(settings.RKNN_IMG_SIZE)
+        self._fixed: RuntimePool | None = pool
+        self._exec = ThreadPoolExecutor(max_workers=pool.size if pool else self.runtimes,
+                                        thread_name_prefix="tile-npu")
+
+    def pool(self) -> RuntimePool | None:
+        """Pool listo o None (aún armándose tras el arranque o un cambio de modelo: el stream usa el scheduler)."""
+        if self._fixed is not None:
+            return self._fixed
+        pool = PREDICT.pool()
+        if pool is not None:
+            self.img_size = PREDICT.img_size
+        return pool
+
+    def detect(self, frame_bgr: np.ndarray, thr: Thresholds, out_size: int | None = None,
+               priority: str = "live", timeout: float | None = None,
+               tile: int | None = None, overlap: float | None = None) -> list[dict]:
+        """
+        Detecciones del frame completo en coordenadas 0..out_size (def. img_size del modelo).
+        PoolUnavailable si el pool no está listo o se cierra a mitad del frame (cambio de modelo).
+        """
+        pool = self.pool()
+        if pool is None:
+            raise PoolUnavailable("El pool de runtimes para teselas todavía no está listo")
+        H, W = frame_bgr.shape[:2]
+        rects = tile_grid(W, H, tile, overlap)
+        TILES_PER_FRAME.observe(len(rects))
+        futs = [self._exec.submit(self._run_tile, pool, frame_bgr, r, thr, priority, timeout) for r in rects]
+        dets = [d for f in futs for d in f.result()]  # NpuBusy de cualquier tesela se propaga
+        with STAGE_SECONDS.time(stage="tile_merge"):
+            dets = merge_detections(dets, thr.iou_th)
+
+        out_size = int(out_size or self.img_size)
+        sx, sy = out_size / float(W), out_size / float(H)
+        for d in dets:
+            x1, y1, x2, y2 = d["bbox_xyxy"]
+            d["bbox_xyxy"] = [x1 * sx, y1 * sy, x2 * sx, y2 * sy]
+        return dets
+
+    @staticmethod
+    def _run_tile(pool: RuntimePool, frame: np.ndarray, rect: tuple, thr: Thresholds,
+                  priority: str, timeout: float | None) -> list[dict]:
+        x0, y0, x1, y1 = rect
+        crop = frame[y0:y1, x0:x1]
+        with pool.lease() as model:
+            with STAGE_SECONDS.time(stage="preprocess"):
+                x = run_blocking(InferenceService._preprocess, model, crop)
+            with NPU_QUEUE.for_backend(model.backend.name, priority, timeout), \
+                    STAGE_SECONDS.time(stage="inference"):
+                outputs = run_blocking(model.infer, x)
+            with STAGE_SECONDS.time(stage="postprocess"):
+                dets = run_blocking(model.postprocess, outputs, thr.conf_th, thr.iou_th, thr.min_box_frac)
+            size = model.img_size
+        # 0..img_size de la tesela -> px del frame
+        sx, sy = (x1 - x0) / float(size), (y1 - y0) / float(size)
+        for d in dets:
+            bx1, by1, bx2, by2 = d["bbox_xyxy"]
+            d["bbox_xyxy"] = [x0 + bx1 * sx, y0 + by1 * sy, x0 + bx2 * sx, y0 + by2 * sy]
+        return dets
+
+
+# instancia única: comparte el pool de runtimes de /predict
+TILED = TiledDetector()
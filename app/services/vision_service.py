@@ -0,0 +1,106 @@
+"""Service: proceso de visión único (cámara + NPU) que publica en el bus de frames.
+
+Con varios workers de Gunicorn cada uno abriría la cámara y cargaría el modelo en
+la NPU por su cuenta. En VISION_MODE=bus un solo proceso (vision.py) lee cada
+cámara, infiere, codifica el JPEG una vez y lo publica en la memoria compartida
+(app/services/frame_bus.py); los workers HTTP solo sirven esos bytes.
+
+La cámara corre mientras algún worker tenga clientes (reader_hb reciente) y se
+apaga tras CAMERA_IDLE_TIMEOUT_S, igual que el ciclo de vida en proceso.
+"""
+from __future__ import annotations
+import threading
+import time
+import cv2
+from app.config import settings
+from app.services.camera_service import CAMERAS, CameraSession
+from app.services.engine_service import ENGINE
+from app.services.frame_bus import FrameBus
+from app.services.metrics_service import FRAMES_TOTAL, DROPPED_FRAMES, STAGE_SECONDS
+
+HEARTBEAT_S = 0.5
+
+
+def publish_loop(cam: CameraSession, bus: FrameBus, halt: threading.Event) -> None:
+    """Lee, anota, codifica y publica los frames de 'cam' mientras haya lectores en algún worker."""
+    seq = 0
+    last_hb = 0.0
+    roi_version = bus.roi_request()[0]
+    encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), settings.JPEG_QUALITY]
+    while not halt.is_set():
+        now = time.time()
+        if now - last_hb >= HEARTBEAT_S:
+            bus.touch_writer(cam.grabber.running)
+            last_hb = now
+
+        if bus.reader_idle_s() >= cam.idle_timeout_s:
+            if cam.grabber.running:
+                cam.request_stop()
+            time.sleep(0.05)
+            continue
+        if not cam.grabber.running:
+            try:
+                cam.ensure_running()
+            except Exception as e:
+                print(f"[Vision] No se pudo abrir la fuente '{cam.name}': {e}")
+                time.sleep(1.0)
+                continue
+
+        seq, ts, frame = cam.grabber.read(seq, timeout=1.0)
+        if frame is None:
+            DROPPED_FRAMES.inc(reason="read_fail")
+            continue
+
+        version, roi, follow = bus.roi_request()
+        if version != roi_version:
+            roi_version = version
+            try:
+                cam.set_roi(roi, follow)
+            except ValueError as e:
+                print(f"[Vision] ROI ignorada en '{cam.name}': {e}")
+
+        dets = []
+        if bus.predictions and ENGINE.ready:
+            frame, dets = cam.annotate(seq, frame)
+        ts_infer = time.time()
+
+        with STAGE_SECONDS.time(stage="encode"):
+            ok, buffer = cv2.imencode(".jpg", frame, encode_params)
+        if not ok:
+            DROPPED_FRAMES.inc(reason="encode_fail")
+            continue
+        try:
+            meta = {"cam": cam.name, "dets": dets, "roi": cam.roi,
+                    "img_size": ENGINE.infer.img_size if ENGINE.ready else None}
+            bus.publish(buffer, meta, ts, ts_infer, time.time())
+        except ValueError as e:
+            DROPPED_FRAMES.inc(reason="bus_overflow")
+            print(f"[Vision] {e}")
+            continue
+        FRAMES_TOTAL.inc(cam=cam.name)
+
+
+def main() -> int:
+    ENGINE.start()
+    halt = threading.Event()
+    buses = {name: FrameBus.create(name) for name in CAMERAS}
+    threads = []
+    for name, cam in CAMERAS.items():
+        t = threading.Thread(target=publish_loop, args=(cam, buses[name], halt), name=f"vision-{name}", daemon=True)
+        t.start()
+        threads.append(t)
+    print(f"[Vision] Publicando {', '.join(buses)} en memoria compartida")
+    try:
+        while any(t.is_alive() for t in threads):
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        halt.set()
+        for t in threads:
+            t.join(timeout=2.0)
+        for cam in CAMERAS.values():
+            cam.grabber.stop()
+        for bus in buses.values():
+            bus.close()
+    return 0
@@ -141,9 +141,187 @@ $(document).ready(function () {
         }, 'image/jpeg');
     });
 
+    // --- AUTO-CAPTURA: el servidor guarda el frame más nítido de la ventana ---
+    $('#autoCaptureButton').click(function () {
+        const button = $(this);
+        const originalIcon = button.find('i').attr('class');
+        const url = window.__APP__.autoCaptureTpl.replace('__CAM__', encodeURIComponent(currentCamera));
+        const done = function () {
+            setButtonLoading(button, false);
+            button.find('i').removeClass().addClass(originalIcon);
+        };
+
+        setButtonLoading(button, true);
+        $.post(url, { cedula: cedula })
+            .done(function () {
+                const poll = setInterval(function () {
+                    $.getJSON(url).done(function (st) {
+                        if (st.state === 'running' || st.state === 'saving') return;
+                        clearInterval(poll);
+                        done();
+                        if (st.state === 'done') {
+                            showNotification('Auto-captura guardada', 'success');
+                            loadCaptures();
+                        } else if (st.state === 'empty') {
+                            showNotification('Ningún frame suficientemente nítido', 'error');
+                        } else {
+                            showNotification(st.error || 'Error en la auto-captura', 'error');
+                        }
+                    }).fail(function () { clearInterval(poll); done(); });
+                }, 500);
+            })
+            .fail(function (xhr) {
+                done();
+                showNotification((xhr.responseJSON && xhr.responseJSON.message) || 'No se pudo iniciar la auto-captura', 'error');
+            });
+    });
+
+    // --- ROI: arrastrar un recuadro sobre el video para inferir solo esa zona (la sigue el servidor) ---
+    const videoEl = document.getElementById('video-frame');
+    const $roiBox = $('#roiBox');
+    let roiStart = null;
+
+    function roiPoint(ev) {
+        const r = videoEl.getBoundingClientRect();
+        return {
+            x: Math.max(0, Math.min(1, (ev.clientX - r.left) / r.width)),
+            y: Math.max(0, Math.min(1, (ev.clientY - r.top) / r.height))
+        };
+    }
+
+    function drawRoiBox(a, b) {
+        $roiBox.css({
+            left: videoEl.offsetLeft + Math.min(a.x, b.x) * videoEl.clientWidth,
+            top: videoEl.offsetTop + Math.min(a.y, b.y) * videoEl.clientHeight,
+            width: Math.abs(b.x - a.x) * videoEl.clientWidth,
+            height: Math.abs(b.y - a.y) * videoEl.clientHeight
+        }).show();
+    }
+
+    function postRoi(roi) {
+        $.ajax({
+            url: window.__APP__.roiTpl.replace('__CAM__', encodeURIComponent(currentCamera)),
+            type: 'POST',
+            contentType: 'application/json',
+            data: JSON.stringify({ roi: roi, follow: true })
+        }).done(function () {
+            showNotification(roi ? 'Región de interés activa' : 'Frame completo', 'success');
+        }).fail(function (xhr) {
+            showNotification((xhr.responseJSON && xhr.responseJSON.message) || 'No se pudo fijar la región', 'error');
+        });
+    }
+
+    $(videoEl).on('mousedown', function (ev) {
+        if (ev.button !== 0) return;
+        roiStart = roiPoint(ev);
+        ev.preventDefault();
+    });
+    $(document).on('mousemove', function (ev) {
+        if (roiStart) drawRoiBox(roiStart, roiPoint(ev));
+    });
+    $(document).on('mouseup', function (ev) {
+        if (!roiStart) return;
+        const a = roiStart, b = roiPoint(ev);
+        roiStart = null;
+        $roiBox.hide();
+        // un clic sin arrastre no cambia nada (el servidor dibuja la ROI vigente en el stream)
+        if (Math.abs(b.x - a.x) < 0.02 || Math.abs(b.y - a.y) < 0.02) return;
+        postRoi([Math.min(a.x, b.x), Math.min(a.y, b.y), Math.max(a.x, b.x), Math.max(a.y, b.y)]);
+    });
+    $(videoEl).on('dblclick', function () { postRoi(null); });
+
     // --- OTRAS FUNCIONES ---
     $('#backButton').click(() => { window.location.href = window.__APP__.backUrl; });
 
+    // --- stream por WebSocket: cada frame se confirma (ack) al pintarse y recién entonces
+    // el servidor manda el más reciente; con Wi-Fi lento baja el FPS pero no se acumula retraso ---
+    let feedSocket = null;
+    let lastFrameUrl = null;
+    let lastDets = [];
+    let clockOffsetMs = null;  // reloj del servidor - reloj local
+    let currentCamera = window.__APP__.defaultCamera;
+
+    // offset de reloj contra /clock (la muestra con menor ida y vuelta), para reportar
+    // en el ack cuándo se pintó cada frame en el reloj del servidor
+    function syncClock(samples = 5) {
+        let best = null;
+        function probe(left) {
+            const t0 = Date.now();
+            $.getJSON(window.__APP__.clockUrl).done(function (r) {
+                const t1 = Date.now();
+                if (best === null || t1 - t0 < best.rtt) {
+                    best = { rtt: t1 - t0, offset: r.t * 1000 - (t0 + t1) / 2 };
+                }
+                if (left > 1) {
+                    probe(left - 1);
+                } else {
+                    clockOffsetMs = best.offset;
+                }
+            });
+        }
+        probe(samples);
+    }
+
+    function openWsFeed(cam) {
+        if (feedSocket) {
+            feedSocket.onclose = null;
+            feedSocket.close();
+        }
+        const path = window.__APP__.wsFeedTpl.replace('__CAM__', encodeURIComponent(cam));
+        const ws = new WebSocket((location.protocol === 'https:' ? 'wss://' : 'ws://') + location.host + path);
+        ws.binaryType = 'arraybuffer';
+        const img = document.getElementById('video-frame');
+
+        ws.onmessage = function (ev) {
+            // uint32 largo de cabecera | cabecera JSON {cam, seq, ts, dets, img_size} | JPEG
+            const headerLen = new DataView(ev.data).getUint32(0);
+            const meta = JSON.parse(new TextDecoder().decode(new Uint8Array(ev.data, 4, headerLen)));
+            const url = URL.createObjectURL(new Blob([new Uint8Array(ev.data, 4 + headerLen)], { type: 'image/jpeg' }));
+            const ack = function () {
+                if (lastFrameUrl) URL.revokeObjectURL(lastFrameUrl);
+                lastFrameUrl = url;
+                lastDets = meta.dets || [];
+                const msg = { ack: meta.seq };
+                if (clockOffsetMs !== null) msg.shown = (Date.now() + clockOffsetMs) / 1000;
+                if (ws.readyState === WebSocket.OPEN) ws.send(JSON.stringify(msg));
+            };
+            // onload = decodificado; el siguiente requestAnimationFrame ~ ya en pantalla
+            img.onload = function () { requestAnimationFrame(ack); };
+            img.onerror = ack;  // un JPEG corrupto no debe frenar el stream
+            img.src = url;
+        };
+        ws.onclose = function () { setTimeout(() => openWsFeed(cam), 1000); };
+        feedSocket = ws;
+    }
+
+    function showCamera(cam) {
+        currentCamera = cam;
+        if (window.__APP__.wsFeedTpl) {
+            openWsFeed(cam);
+        } else {
+            $('#video-frame').attr('src', window.__APP__.videoFeedTpl.replace('__CAM__', encodeURIComponent(cam)));
+        }
+    }
+
+    if (window.__APP__.wsFeedTpl) {
+        syncClock();
+        openWsFeed(window.__APP__.defaultCamera);
+    }
+
+    // al salir de la página: soltar la cámara sin esperar el margen de inactividad
+    window.addEventListener('pagehide', function () {
+        if (feedSocket) {
+            feedSocket.onclose = null;
+            feedSocket.close();
+        }
+        navigator.sendBeacon(window.__APP__.stopStream);
+    });
+
+    // --- selección de cámara (solo si hay varias configuradas) ---
+    $('#cameraSelect').change(function () {
+        showCamera(this.value);
+    });
+
     $('#predictionSwitch').change(function () {
         $.post(window.__APP__.togglePred, { enabled: this.checked });
     });
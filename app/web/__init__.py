@@ -1,7 +1,13 @@
+import time
 from flask import Flask
 
 def create_app() -> Flask:
-    """Crea la app Flask y registra blueprints."""
+    """
+    Crea la app Flask y registra blueprints. El modelo se carga en segundo plano.
+    Solo la llaman los puntos de entrada del servidor (app.py, `gunicorn app:app`):
+    las herramientas importan app.services/app.adapters sin crear la app ni tocar la NPU.
+    """
+    t0 = time.perf_counter()
     app = Flask(
         __name__,
         template_folder="../templates",
@@ -9,11 +15,26 @@ def create_app() -> Flask:
     )
 
     # Registrar blueprints
-    from . import pages, camera, gallery, settings_bp
+    from . import pages, camera, gallery, settings_bp, metrics_bp, admin_bp, predict_bp, recording_bp
 
     app.register_blueprint(pages.bp)
     app.register_blueprint(camera.bp)
     app.register_blueprint(gallery.bp)
     app.register_blueprint(settings_bp.bp)
+    app.register_blueprint(metrics_bp.bp)
+    app.register_blueprint(admin_bp.bp)
+    app.register_blueprint(predict_bp.bp)
+    app.register_blueprint(recording_bp.bp)
+
+    from app.config import settings
+    from app.services.engine_service import ENGINE
+    if settings.VISION_MODE != "bus":
+        # en modo bus el modelo lo carga el proceso de visión (vision.py), no cada worker
+        ENGINE.start(t0)
+    ENGINE.mark("app_created")
+
+    @app.before_request
+    def _first_request():
+        ENGINE.mark("first_request")
 
     return app
\ No newline at end of file
@@ -0,0 +1,29 @@
+# app/web/admin_bp.py
+"""Blueprint: administración del modelo activo (cambio en caliente)."""
+from flask import Blueprint, jsonify, request
+from app.services.engine_service import ENGINE
+
+bp = Blueprint("admin", __name__)
+
+@bp.route("/admin/model", methods=["GET"])
+def model_status():
+    if not ENGINE.ready:
+        return jsonify({"error": "Modelo cargando", **ENGINE.status()}), 503
+    return jsonify(ENGINE.models.status())
+
+@bp.route("/admin/model", methods=["POST"])
+def swap_model():
+    """JSON: {"model_path": "model2.rknn", "backend": opcional, "img_size": opcional, "warmup": opcional}."""
+    if not ENGINE.ready:
+        return jsonify({"error": "Modelo cargando", **ENGINE.status()}), 503
+    data = request.get_json(force=True, silent=True) or {}
+    if not data.get("model_path"):
+        return jsonify({"error": "model_path requerido"}), 400
+    try:
+        st = ENGINE.models.request_swap(data["model_path"], backend=data.get("backend"),
+                                       img_size=data.get("img_size"), warmup=data.get("warmup"))
+    except (ValueError, FileNotFoundError) as e:
+        return jsonify({"error": str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify(st), 202
@@ -3,102 +3,265 @@
 
 import os
 import io
+import json
+import struct
 import time
 import cv2
 import numpy as np
+from contextlib import contextmanager
 from datetime import datetime
-from flask import Blueprint, Response, request, jsonify
-from app.services.inference_service import InferenceService
-from app.services.patient_service import PatientService
-from app.services.settings_service import THRESHOLDS_CACHE
-_patients = PatientService()
+from flask import Blueprint, Response, request, jsonify, abort
+from app.config import settings
+from app.services.engine_service import ENGINE
+from app.services.patient_service import PATIENTS
+from app.services.camera_service import CAMERAS, DEFAULT_CAMERA, CameraSession
+from app.services.frame_bus import attached_bus
+from app.services.executor import run_blocking
+from app.services.latency_service import LATENCY
+from app.services.metrics_service import (
+    STAGE_SECONDS, FRAMES_TOTAL, DROPPED_FRAMES, STREAM_FPS, STREAM_BYTES, ACTIVE_VIEWERS, STREAM_LATENCY,
+    WS_ACK_WAIT,
+)
+try:
+    from flask_sock import Sock  # opcional: transporte WebSocket del stream
+except ImportError:
+    Sock = None
+_patients = PATIENTS
 
-# Globals controlados por este módulo (estado de cámara/stream)
+# Globals controlados por este módulo (estado del stream; cada cámara guarda el suyo en su CameraSession)
 bp = Blueprint("camera", __name__)
-_camera = None
 _predictions_enabled = False
-_current_frame = None
-_last_boxes = []
-_last_ts = 0.0
-HOLD_MS = 250
-
-# Servicio de inferencia (usa RKNN adapter)
-_infer = InferenceService()
-
-
-def _draw_detections(frame_bgr, dets, img_size=640):
-    """Dibuja cajas y etiquetas, reescalando de 640x640 a resolución original."""
-    H, W = frame_bgr.shape[:2]
-    sx, sy = W / float(img_size), H / float(img_size)
-
-    for d in dets:
-        conf = float(d["confidence"])
-        cls_name = d["class_name"]
-        etiqueta = _infer.label_for_class(cls_name)
-        conf = _infer.adjust_conf(conf)
-
-        x1, y1, x2, y2 = d["bbox_xyxy"]
-        x1, y1, x2, y2 = int(x1 * sx), int(y1 * sy), int(x2 * sx), int(y2 * sy)
-
-        cv2.rectangle(frame_bgr, (x1, y1), (x2, y2), (255, 0, 0), 2)
-        texto = f"{etiqueta} {conf:.2f}"
-        cv2.putText(
-            frame_bgr,
-            texto,
-            (max(0, x2 - 150), max(0, y2 - 10)),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            (255, 0, 0),
-            2,
-        )
-    return frame_bgr
-
-
-def _stream_generator():
-    """Genera frames JPEG para MJPEG stream."""
-    global _camera, _current_frame, _predictions_enabled
-
-    if _camera is None:
-        _camera = cv2.VideoCapture(0)
-
-    while True:
-        ok, frame = _camera.read()
-        if not ok:
-            time.sleep(0.05)
-            continue
-
-        if _predictions_enabled:
-            thr, _ver = THRESHOLDS_CACHE.snapshot()
-            dets = _infer.predict(frame, thr)
-
-            now = time.time() * 1000.0
-            global _last_boxes, _last_ts
-            if len(dets) == 0 and (now - _last_ts) < HOLD_MS:
-                dets_to_draw = _last_boxes
-            else:
-                dets_to_draw = dets
-                if len(dets) > 0:
-                    _last_boxes = dets
-                    _last_ts = now
-
-            frame = _draw_detections(frame, dets_to_draw, img_size=_infer.img_size)
-
-        _current_frame = frame
-
-        ret, buffer = cv2.imencode(".jpg", frame)
-        if not ret:
-            time.sleep(0.01)
-            continue
-
-        chunk = b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + buffer.tobytes() + b"\r\n"
-        yield chunk
+
+# El motor de inferencia (InferenceService + scheduler NPU/CPU + ModelManager) se carga
+# en segundo plano (ENGINE.start en create_app); hasta que esté listo el stream va sin predicciones.
+# Con VISION_MODE=bus la cámara y la NPU viven en vision.py y este módulo solo sirve el bus.
+_BUS_MODE = settings.VISION_MODE == "bus"
+
+
+def _get_camera(cam_id: str | None) -> CameraSession:
+    cam = CAMERAS.get(cam_id or DEFAULT_CAMERA)
+    if cam is None:
+        abort(404, description=f"Cámara desconocida: {cam_id}")
+    return cam
+
+
+def _ensure_camera(cam: CameraSession) -> bool:
+    """Arranca el lector si no corre; False si la fuente no abre (se reintenta en el siguiente ciclo)."""
+    try:
+        return cam.ensure_running()
+    except Exception as e:
+        print(f"[Camera] No se pudo abrir la fuente '{cam.name}': {e}")
+        return False
+
+
+@contextmanager
+def _viewer(cam: CameraSession):
+    """Un cliente del stream: mantiene la cámara abierta (en modo bus la sostiene el latido del lector)."""
+    if not _BUS_MODE:
+        try:
+            cam.subscribe()
+        except Exception as e:
+            print(f"[Camera] No se pudo abrir la fuente '{cam.name}': {e}")  # se reintenta dentro del bucle
+    ACTIVE_VIEWERS.inc(cam=cam.name)
+    try:
+        yield
+    finally:
+        # GeneratorExit / socket cerrado al desconectarse el cliente
+        ACTIVE_VIEWERS.dec(cam=cam.name)
+        if not _BUS_MODE:
+            cam.unsubscribe()
+
+
+def _next_frame(cam: CameraSession, after_seq: int) -> tuple[int, bytes | None, dict]:
+    """
+    Frame codificado más reciente posterior a 'after_seq' (los intermedios se saltan).
+    Devuelve (seq, jpeg, meta); jpeg None si no llegó nada a tiempo (el llamador
+    simplemente vuelve a pedir). meta lleva el id del frame ("cam:seq"), las marcas
+    ts_capture / ts_infer / ts_encode (epoch, reloj del servidor), dets e img_size.
+    """
+    if _BUS_MODE:
+        bus = attached_bus(cam.name)
+        if bus is None:
+            time.sleep(0.5)
+            return after_seq, None, {}
+        bus.touch_reader()  # mantiene la cámara encendida en el proceso de visión
+        item = bus.read_latest(after_seq)
+        if item is None:
+            time.sleep(0.005)
+            return after_seq, None, {}
+        seq, (ts_capture, ts_infer, ts_encode), jpeg, meta = item
+        return seq, jpeg, {"id": f"{cam.name}:{seq}", "cam": cam.name, "seq": seq, "ts_capture": ts_capture,
+                           "ts_infer": ts_infer, "ts_encode": ts_encode, "dets": meta.get("dets", []),
+                           "roi": meta.get("roi"), "img_size": meta.get("img_size")}
+
+    # espera el siguiente frame del lector (nunca uno viejo del buffer del driver)
+    with STAGE_SECONDS.time(stage="camera_read"):
+        seq, ts, frame = cam.grabber.read(after_seq, timeout=1.0)
+    if frame is None:
+        DROPPED_FRAMES.inc(reason="read_fail")
+        if not _ensure_camera(cam):
+            time.sleep(0.5)
+        return after_seq, None, {}
+
+    raw, dets = frame, []
+    if _predictions_enabled and ENGINE.ready:
+        frame, dets = cam.annotate(seq, frame)
+    cam.offer_autocapture(seq, raw)
+    ts_infer = time.time()
+    cam.current_frame = frame
+
+    with STAGE_SECONDS.time(stage="encode"):
+        ret, buffer = run_blocking(cv2.imencode, ".jpg", frame)
+    if not ret:
+        DROPPED_FRAMES.inc(reason="encode_fail")
         time.sleep(0.01)
+        return seq, None, {}
+    return seq, buffer.tobytes(), {"id": f"{cam.name}:{seq}", "cam": cam.name, "seq": seq, "ts_capture": ts,
+                                   "ts_infer": ts_infer, "ts_encode": time.time(), "dets": dets, "roi": cam.roi,
+                                   "img_size": ENGINE.infer.img_size if ENGINE.ready else None}
+
+
+def _account(cam: CameraSession, nbytes: int, ts: float, last_t: float) -> float:
+    """Métricas de un frame enviado (bytes, latencia captura -> envío, FPS). Devuelve el nuevo last_t."""
+    FRAMES_TOTAL.inc(cam=cam.name)
+    STREAM_BYTES.inc(nbytes, cam=cam.name)
+    latency = time.time() - ts
+    STREAM_LATENCY.observe(latency, cam=cam.name)
+    cam.latency_ms = latency * 1000.0 if cam.latency_ms is None else 0.9 * cam.latency_ms + 100.0 * latency
+    t = time.perf_counter()
+    dt = t - last_t
+    if dt > 0:
+        cam.fps = (1.0 / dt) if cam.fps == 0.0 else 0.9 * cam.fps + 0.1 / dt
+        STREAM_FPS.set(cam.fps, cam=cam.name)
+    return t
+
+
+def _part_headers(meta: dict) -> bytes:
+    """Cabeceras extra de cada parte MJPEG: id y marcas de tiempo del frame (para clientes que las lean)."""
+    return (f"X-Frame-Id: {meta['id']}\r\nX-Timestamp-Capture: {meta['ts_capture']:.6f}\r\n"
+            f"X-Timestamp-Inference: {meta['ts_infer']:.6f}\r\nX-Timestamp-Encode: {meta['ts_encode']:.6f}\r\n"
+            ).encode("ascii")
+
+
+def _stream_generator(cam: CameraSession):
+    """Genera frames JPEG para MJPEG stream. La cámara vive mientras tenga clientes (ver CameraSession)."""
+    with _viewer(cam):
+        last_t = time.perf_counter()
+        seq = 0
+        while True:
+            seq, jpeg, meta = _next_frame(cam, seq)
+            if jpeg is None:
+                continue
+            chunk = (b"--frame\r\nContent-Type: image/jpeg\r\n" + _part_headers(meta) + b"\r\n"
+                     + jpeg + b"\r\n")
+            last_t = _account(cam, len(chunk), meta["ts_capture"], last_t)
+            yield chunk
+
+
+def _ws_stream(ws, cam: CameraSession) -> None:
+    """
+    Stream por WebSocket con contrapresión: se envía un frame y no se envía el
+    siguiente hasta que el cliente lo confirma ({"ack": seq}). Entonces se manda el
+    más reciente, así un cliente lento recibe menos FPS pero nunca frames atrasados
+    (con MJPEG esos frames se acumulan en los buffers TCP como segundos de retraso).
+
+    Mensaje binario: uint32 big-endian con el largo de la cabecera JSON (meta de
+    _next_frame), la cabecera y el JPEG. El ack trae "shown": cuándo se pintó el
+    frame en el reloj del servidor, para la latencia vidrio a vidrio del cliente.
+    """
+    cid = LATENCY.open(cam.name, request.remote_addr)
+    try:
+        with _viewer(cam):
+            last_t = time.perf_counter()
+            seq = 0
+            while True:
+                new_seq, jpeg, meta = _next_frame(cam, seq)
+                if jpeg is None:
+                    continue
+                if seq and new_seq > seq + 1:
+                    DROPPED_FRAMES.inc(new_seq - seq - 1, reason="backpressure")
+                seq = new_seq
+                header = json.dumps(meta, default=float).encode("utf-8")
+                ws.send(struct.pack(">I", len(header)) + header + jpeg)
+                last_t = _account(cam, len(jpeg) + len(header) + 4, meta["ts_capture"], last_t)
+
+                # esperar el ack de este frame; cualquier otro mensaje se ignora
+                t_wait = time.perf_counter()
+                while True:
+                    msg = ws.receive(timeout=settings.WS_ACK_TIMEOUT_S)
+                    if msg is None:
+                        continue  # cliente lento: seguir esperando sin enviar más
+                    try:
+                        ack = json.loads(msg)
+                        if int(ack.get("ack", -1)) >= seq:
+                            break
+                    except (ValueError, TypeError, AttributeError):
+                        pass
+                WS_ACK_WAIT.observe(time.perf_counter() - t_wait, cam=cam.name)
+                if ack.get("shown"):
+                    LATENCY.record(cid, meta, float(ack["shown"]))
+    finally:
+        LATENCY.close(cid)
+
+
+def _bus_stats(cam: CameraSession) -> dict:
+    bus = attached_bus(cam.name)
+    return {"name": cam.name, "fps": round(cam.fps, 2),
+            "latency_ms": round(cam.latency_ms, 1) if cam.latency_ms is not None else None,
+            "bus": bus.status() if bus is not None else None}
 
 
 @bp.route("/video_feed")
-def video_feed():
-    """Endpoint del stream de cámara."""
-    return Response(_stream_generator(), mimetype="multipart/x-mixed-replace; boundary=frame")
+@bp.route("/video_feed/<cam_id>")
+def video_feed(cam_id=None):
+    """Endpoint del stream de cámara (sin cam_id: la primera de settings.CAMERAS)."""
+    cam = _get_camera(cam_id)
+    if _BUS_MODE:
+        if attached_bus(cam.name) is None:
+            return jsonify({"message": "Proceso de visión no disponible (vision.py)"}), 503
+    return Response(_stream_generator(cam), mimetype="multipart/x-mixed-replace; boundary=frame")
+
+
+def ws_video_feed(ws, cam_id=None):
+    """Stream por WebSocket (mismo contenido que /video_feed, con acks del cliente)."""
+    _ws_stream(ws, _get_camera(cam_id))
+
+
+# rutas WebSocket solo si flask-sock está instalado; sin él la UI usa /video_feed (MJPEG)
+WS_AVAILABLE = Sock is not None
+if WS_AVAILABLE:
+    _sock = Sock()
+    _sock.route("/ws/video_feed", bp=bp, endpoint="ws_video_feed_default")(ws_video_feed)
+    _sock.route("/ws/video_feed/<cam_id>", bp=bp)(ws_video_feed)
+
+
+@bp.route("/cameras")
+def cameras():
+    """Cámaras configuradas con su FPS y latencia (captura -> envío) actuales."""
+    if _BUS_MODE:
+        return jsonify({"default": DEFAULT_CAMERA, "mode": "bus", "cameras": [_bus_stats(c) for c in CAMERAS.values()]})
+    return jsonify({"default": DEFAULT_CAMERA, "cameras": [c.stats() for c in CAMERAS.values()],
+                    "scheduler": ENGINE.sched.stats() if ENGINE.ready else None})
+
+
+@bp.route("/camera_status")
+@bp.route("/camera_status/<cam_id>")
+def camera_status(cam_id=None):
+    """Fuente activa, modo negociado con el driver (FOURCC/resolución/FPS) y frames leídos/descartados."""
+    cam = _get_camera(cam_id)
+    return jsonify(_bus_stats(cam) if _BUS_MODE else cam.stats())
+
+
+@bp.route("/clock")
+def clock():
+    """Hora del servidor: el navegador estima su offset de reloj para reportar cuándo pintó cada frame."""
+    return jsonify({"t": time.time()})
+
+
+@bp.route("/stream_latency")
+def stream_latency():
+    """Latencia vidrio a vidrio (ms) por cliente WebSocket conectado a este worker."""
+    return jsonify({"clients": LATENCY.stats()})
 
 
 @bp.route("/toggle_predictions", methods=["POST"])
@@ -107,6 +270,12 @@ def toggle_predictions():
     global _predictions_enabled
     enabled = request.form.get("enabled") == "true"
     _predictions_enabled = enabled
+    if _BUS_MODE:
+        # el flag vive en la cabecera del bus: lo comparten todos los workers
+        for name in CAMERAS:
+            bus = attached_bus(name)
+            if bus is not None:
+                bus.predictions = enabled
     return "OK"
 
 
@@ -118,11 +287,118 @@ def capture():
 
         filestr = image_file.read()
         npimg = np.frombuffer(filestr, np.uint8)
-        frame_capturado = cv2.imdecode(npimg, cv2.IMREAD_COLOR)
+        frame_capturado = run_blocking(cv2.imdecode, npimg, cv2.IMREAD_COLOR)
         if frame_capturado is None:
             return jsonify({"message": "Error: imagen inválida"}), 400
 
         filename = _patients.save_capture_blob(cedula, frame_capturado)
         return jsonify({"message": "Foto capturada correctamente", "filename": filename})
     except Exception as e:
-        return jsonify({"message": f"Ocurrió un error en el servidor: {e}"}), 500
\ No newline at end of file
+        return jsonify({"message": f"Ocurrió un error en el servidor: {e}"}), 500
+
+
+def _bus_frame(cam: CameraSession, timeout: float = 2.0) -> np.ndarray | None:
+    """Último frame del bus decodificado (lleva las anotaciones si las predicciones están activas)."""
+    bus = attached_bus(cam.name)
+    if bus is None:
+        return None
+    bus.touch_reader()
+    deadline = time.monotonic() + timeout
+    item = bus.read_latest(0, with_meta=False)
+    while item is None and time.monotonic() < deadline:
+        time.sleep(0.02)
+        bus.touch_reader()
+        item = bus.read_latest(0, with_meta=False)
+    if item is None:
+        return None
+    return run_blocking(cv2.imdecode, np.frombuffer(item[2], np.uint8), cv2.IMREAD_COLOR)
+
+
+@bp.route("/roi/<cam_id>", methods=["GET", "POST"])
+def camera_roi(cam_id):
+    """
+    Región de interés de la cámara: solo ese recorte (a resolución nativa) va a la NPU.
+    POST JSON {"roi": [x1, y1, x2, y2] normalizado 0..1 | null, "follow": true}.
+    """
+    cam = _get_camera(cam_id)
+    if request.method == "GET":
+        if _BUS_MODE:
+            bus = attached_bus(cam.name)
+            item = bus.read_latest(0) if bus is not None else None
+            return jsonify({"cam": cam.name, "roi": item[3].get("roi") if item else None})
+        return jsonify({"cam": cam.name, "roi": cam.roi, "follow": cam.roi_follow})
+
+    data = request.get_json(silent=True) or {}
+    box = data.get("roi")
+    follow = bool(data.get("follow", True))
+    try:
+        if box is not None and len(box) != 4:
+            raise ValueError("roi debe ser [x1, y1, x2, y2]")
+        if _BUS_MODE:
+            bus = attached_bus(cam.name)
+            if bus is None:
+                return jsonify({"message": "Proceso de visión no disponible (vision.py)"}), 503
+            cam.set_roi(box, follow)  # valida igual que el proceso de visión
+            bus.request_roi(cam.roi, follow)
+        else:
+            cam.set_roi(box, follow)
+    except (TypeError, ValueError) as e:
+        return jsonify({"message": f"ROI inválida: {e}"}), 400
+    return jsonify({"cam": cam.name, "roi": cam.roi, "follow": cam.roi_follow})
+
+
+@bp.route("/autocapture/<cam_id>", methods=["POST"])
+def start_autocapture(cam_id):
+    """
+    Auto-captura: durante 'window_s' (def. AUTOCAPTURE_WINDOW_S) observa el stream y
+    guarda solo el frame más nítido y con la detección más segura.
+    """
+    cam = _get_camera(cam_id)
+    if _BUS_MODE:
+        return jsonify({"message": "La auto-captura solo está disponible con VISION_MODE=inprocess"}), 409
+    if cam.refs == 0:
+        return jsonify({"message": f"La cámara '{cam.name}' no tiene el stream abierto"}), 409
+    try:
+        cedula = request.form["cedula"]
+        window_s = float(request.form.get("window_s") or settings.AUTOCAPTURE_WINDOW_S)
+    except (KeyError, ValueError) as e:
+        return jsonify({"message": f"Parámetros inválidos: {e}"}), 400
+    ac = cam.start_autocapture(cedula, window_s)
+    return jsonify(ac.status()), 202
+
+
+@bp.route("/autocapture/<cam_id>")
+def autocapture_status(cam_id):
+    cam = _get_camera(cam_id)
+    ac = cam.autocapture
+    if ac is None:
+        return jsonify({"cam": cam.name, "state": "idle"})
+    ac.finish_if_due()  # cierra la ventana aunque el stream se haya detenido
+    return jsonify(ac.status())
+
+
+@bp.route("/capture/<cam_id>", methods=["POST"])
+def capture_camera(cam_id):
+    """Guarda el último frame de la cámara a resolución nativa y sin anotaciones."""
+    cam = _get_camera(cam_id)
+    try:
+        cedula = request.form["cedula"]
+        # suscripción breve: si nadie la miraba, queda abierta el margen de inactividad
+        if _BUS_MODE:
+            frame = _bus_frame(cam)
+        else:
+            try:
+                cam.subscribe()
+            except Exception:
+                cam.unsubscribe()
+                return jsonify({"message": f"Cámara '{cam.name}' no disponible"}), 503
+            try:
+                _seq, _ts, frame = cam.grabber.read(0, timeout=2.0)
+            finally:
+                cam.unsubscribe()
+        if frame is None:
+            return jsonify({"message": f"Sin frames de la cámara '{cam.name}'"}), 503
+        filename = _patients.save_capture_blob(cedula, frame, tag=cam.name)
+        return jsonify({"message": "Foto capturada correctamente", "filename": filename, "camera": cam.name})
+    except Exception as e:
+        return jsonify({"message": f"Ocurrió un error en el servidor: {e}"}), 500
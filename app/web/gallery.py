@@ -1,9 +1,9 @@
 import os
 from flask import Blueprint, jsonify, request, send_file, abort
-from app.services.patient_service import PatientService
+from app.services.patient_service import PATIENTS
 
 bp = Blueprint("gallery", __name__)
-_patients = PatientService()
+_patients = PATIENTS
 
 @bp.route("/get_capturas/<cedula>")
 def get_capturas(cedula):
@@ -0,0 +1,25 @@
+# app/web/metrics_bp.py
+"""Blueprint: /metrics en formato de texto Prometheus y /ready (readiness del modelo)."""
+from flask import Blueprint, Response, jsonify
+from app.config import settings
+from app.services.engine_service import ENGINE
+from app.services.camera_service import CAMERAS
+from app.services.frame_bus import attached_bus
+from app.services.metrics_service import METRICS
+
+bp = Blueprint("metrics", __name__)
+
+@bp.route("/metrics")
+def metrics():
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
+@bp.route("/ready")
+def ready():
+    """200 cuando el modelo está cargado y calentado; 503 mientras carga (o si falló)."""
+    if settings.VISION_MODE == "bus":
+        # listo si el proceso de visión publica latidos en el bus de cada cámara
+        buses = {name: attached_bus(name) for name in CAMERAS}
+        ok = all(b is not None and b.writer_age_s() < 2.0 for b in buses.values())
+        return jsonify({"mode": "bus", "cameras": {n: (b.status() if b else None) for n, b in buses.items()}}), (200 if ok else 503)
+    return jsonify(ENGINE.status()), (200 if ENGINE.ready else 503)
@@ -1,11 +1,19 @@
 from flask import Blueprint, render_template, request, jsonify, send_file
-from app.services.patient_service import PatientService
+from app.services.patient_service import PATIENTS
 from app.services.report_service import ReportService
+from app.config import settings
+from app.services.camera_service import CAMERAS
+from app.web.camera import WS_AVAILABLE
 
 bp = Blueprint("pages", __name__)
-_patients = PatientService()
+_patients = PATIENTS
 _reports = ReportService(_patients)
 
+
+def _use_ws() -> bool:
+    """La UI usa el stream por WebSocket si está habilitado y flask-sock instalado (si no, MJPEG)."""
+    return WS_AVAILABLE and settings.STREAM_TRANSPORT in ("auto", "ws")
+
 @bp.route("/")
 def index():
     return render_template("index.html")
@@ -25,11 +33,15 @@ def start_stream():
         "Género": genero,
         "Antecedentes": antecedentes,
     })
-    return render_template("camera.html", cedula=cedula)
+    return render_template("camera.html", cedula=cedula, cameras=list(CAMERAS), use_ws=_use_ws())
 
 @bp.route("/stop_stream", methods=["POST"])
 def stop_stream():
-    # la cámara se gestiona en camera.py; aquí no hay nada que soltar
+    # suelta las cámaras en cuanto se vaya su último cliente, sin esperar el margen de inactividad
+    cam_id = request.form.get("cam_id")
+    for name, cam in CAMERAS.items():
+        if cam_id in (None, "", name):
+            cam.request_stop()
     return "Stream detenido"
 
 @bp.route("/download/<cedula>")
@@ -0,0 +1,54 @@
+# app/web/predict_bp.py
+"""Blueprint: /predict (detecciones JSON para imágenes subidas por otros sistemas)."""
+import base64
+import binascii
+from flask import Blueprint, jsonify, request
+from app.config import settings
+from app.services.engine_service import ENGINE
+from app.services.predict_service import PREDICT
+from app.services.settings_service import THRESHOLDS_CACHE
+
+bp = Blueprint("predict", __name__)
+
+@bp.route("/predict", methods=["POST"])
+def predict():
+    """
+    multipart: uno o varios campos 'image' (archivos)
+    JSON:      {"images": ["<base64>", ...]}  o  {"image": "<base64>"}
+    -> {"model", "img_size", "thresholds", "results": [{sha1, cached, width, height, detections} | {sha1, error}]}
+    """
+    if not ENGINE.ready:
+        return jsonify({"error": "Modelo cargando", **ENGINE.status()}), 503
+
+    names, blobs = [], []
+    if request.files:
+        for f in request.files.getlist("image"):
+            names.append(f.filename)
+            blobs.append(f.read())
+    else:
+        data = request.get_json(force=True, silent=True) or {}
+        items = data.get("images") or ([data["image"]] if data.get("image") else [])
+        try:
+            blobs = [base64.b64decode(b, validate=True) for b in items]
+        except (binascii.Error, TypeError, ValueError):
+            return jsonify({"error": "base64 inválido"}), 400
+        names = [None] * len(blobs)
+
+    if not blobs:
+        return jsonify({"error": "Se requiere al menos una imagen"}), 400
+    if len(blobs) > settings.PREDICT_MAX_IMAGES:
+        return jsonify({"error": f"Máximo {settings.PREDICT_MAX_IMAGES} imágenes por petición"}), 413
+
+    # /predict usa el mismo modelo que el stream (incluido tras un cambio en caliente)
+    PREDICT.use_model(ENGINE.infer.model.backend.model_path, ENGINE.infer.img_size, ENGINE.infer.backend_name)
+    thr, _ver = THRESHOLDS_CACHE.snapshot()
+    results = PREDICT.predict_many(blobs, thr)
+    for name, r in zip(names, results):
+        if name:
+            r["filename"] = name
+    return jsonify({
+        "model": PREDICT.model_path,
+        "img_size": PREDICT.img_size,
+        "thresholds": {"conf_th": thr.conf_th, "iou_th": thr.iou_th, "min_box_frac": thr.min_box_frac},
+        "results": results,
+    })
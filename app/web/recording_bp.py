@@ -0,0 +1,95 @@
+"""Blueprint: grabación de sesiones en video segmentado, línea de tiempo y extracción de frames."""
+import cv2
+from flask import Blueprint, Response, jsonify, request, abort
+from app.config import settings
+from app.services.camera_service import CAMERAS
+from app.services.executor import run_blocking
+from app.services import recording_service as rec
+
+bp = Blueprint("recording", __name__)
+_BUS_MODE = settings.VISION_MODE == "bus"
+
+
+def _get_camera(cam_id: str):
+    cam = CAMERAS.get(cam_id)
+    if cam is None:
+        abort(404, description=f"Cámara desconocida: {cam_id}")
+    return cam
+
+
+@bp.route("/recording/<cam_id>/start", methods=["POST"])
+def start_recording(cam_id):
+    """Form: cedula, fps y segment_s opcionales. Graba hasta /recording/<cam>/stop."""
+    cam = _get_camera(cam_id)
+    if _BUS_MODE:
+        return jsonify({"message": "La grabación solo está disponible con VISION_MODE=inprocess"}), 409
+    try:
+        cedula = request.form["cedula"]
+        fps = float(request.form["fps"]) if request.form.get("fps") else None
+        segment_s = float(request.form["segment_s"]) if request.form.get("segment_s") else None
+    except (KeyError, ValueError) as e:
+        return jsonify({"message": f"Parámetros inválidos: {e}"}), 400
+    try:
+        r = run_blocking(rec.start_recording, cam, cedula, fps, segment_s)
+    except RuntimeError as e:
+        return jsonify({"message": str(e)}), 409
+    except OSError as e:
+        return jsonify({"message": f"No se pudo crear la sesión: {e}"}), 500
+    return jsonify(r.status()), 202
+
+
+@bp.route("/recording/<cam_id>/stop", methods=["POST"])
+def stop_recording(cam_id):
+    cam = _get_camera(cam_id)
+    r = rec.stop_recording(cam.name)
+    if r is None:
+        return jsonify({"message": f"La cámara '{cam.name}' no está grabando"}), 409
+    return jsonify(r.status())
+
+
+@bp.route("/recording/<cam_id>")
+def recording_status(cam_id):
+    cam = _get_camera(cam_id)
+    r = rec.RECORDERS.get(cam.name)
+    return jsonify(r.status() if r is not None else {"cam": cam.name, "state": "idle"})
+
+
+@bp.route("/recordings/<cedula>")
+def list_recordings(cedula):
+    return jsonify(rec.list_sessions(cedula))
+
+
+@bp.route("/recordings/<cedula>/<session>/timeline")
+def recording_timeline(cedula, session):
+    """Línea de tiempo completa; ?dets=1 devuelve solo las entradas donde cambió la inferencia."""
+    try:
+        timeline = rec.load_timeline(cedula, session)
+    except (ValueError, FileNotFoundError) as e:
+        return jsonify({"message": str(e)}), 404
+    if request.args.get("dets") == "1":
+        timeline = [e for e in timeline if "dets" in e]
+    return jsonify(timeline)
+
+
+@bp.route("/recordings/<cedula>/<session>/frame")
+def recording_frame(cedula, session):
+    """?i=<índice de frame> o ?t=<segundos desde el inicio>. Devuelve el JPEG y su posición en cabeceras."""
+    try:
+        i = int(request.args["i"]) if "i" in request.args else None
+        t = float(request.args.get("t", 0.0))
+    except ValueError as e:
+        return jsonify({"message": f"Parámetros inválidos: {e}"}), 400
+    try:
+        timeline = rec.load_timeline(cedula, session)
+        entry = rec.timeline_entry(timeline, index=i, t=t)
+        frame = run_blocking(rec.extract_frame, cedula, session, entry["seg"], entry["pos"])
+    except (ValueError, FileNotFoundError) as e:
+        return jsonify({"message": str(e)}), 404
+    except LookupError as e:
+        return jsonify({"message": str(e)}), 416
+    ok, buf = run_blocking(cv2.imencode, ".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), settings.JPEG_QUALITY])
+    if not ok:
+        return jsonify({"message": "No se pudo codificar el frame"}), 500
+    headers = {"X-Frame-Index": str(entry["i"]), "X-Segment": str(entry["seg"]),
+               "X-Segment-Pos": str(entry["pos"]), "X-Timestamp-Capture": f"{entry['t']:.4f}"}
+    return Response(buf.tobytes(), mimetype="image/jpeg", headers=headers)
@@ -0,0 +1,215 @@
+"""
+Inferencia por lotes sobre directorios o listas de imágenes (p.ej. tools/convert/dataset.txt).
+
+Pipeline:
+    decodificación + preprocess  -> pool de hilos (cv2 libera el GIL)
+    inferencia                   -> un hilo por runtime del RuntimePool (uno por núcleo NPU)
+    postprocess                  -> pool de procesos (NMS en paralelo en los núcleos A76)
+    escritura                    -> JSONL en streaming, una línea por imagen
+
+El JSONL de salida es también el checkpoint: al relanzar con el mismo --out se
+omiten las imágenes ya registradas (una última línea truncada se descarta).
+
+Uso:
+    $ python tools/batch_infer.py --source tools/convert/dataset.txt --out runs_batch/resultados.jsonl
+    $ python tools/batch_infer.py --source /ruta/capturas --runtimes 3 --post-workers 4
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]  # raíz del repo
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from app.adapters.dataset_fs import list_images  # noqa: E402
+from app.adapters.rknn_adapter import RknnModel  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.services.runtime_pool import RuntimePool  # noqa: E402
+from app.services.settings_service import SettingsService  # noqa: E402
+
+_DONE = object()
+_POST_MODEL = None  # instancia por proceso del pool de postproceso
+
+
+# ------------------------------------------------------------ workers
+def _init_post(yaml_path, img_size, thresholds):
+    global _POST_MODEL
+    _POST_MODEL = RknnModel(yaml_path=yaml_path, img_size=img_size, init_runtime=False)
+    _POST_MODEL.set_thresholds(**thresholds)
+
+
+def _post(pred):
+    return _POST_MODEL.postprocess([pred])
+
+
+def _decode(path, img_size):
+    """Lee + BGR->RGB + resize. Devuelve (path, img_input, (w, h), error)."""
+    img = cv2.imread(path)
+    if img is None:
+        return path, None, None, "no se pudo leer la imagen"
+    h, w = img.shape[:2]
+    img = cv2.resize(cv2.cvtColor(img, cv2.COLOR_BGR2RGB), (img_size, img_size), interpolation=cv2.INTER_LINEAR)
+    return path, np.expand_dims(img, axis=0), (w, h), None
+
+
+def load_checkpoint(out_path):
+    """
+    Rutas ya procesadas en el JSONL; recorta una última línea incompleta. Las líneas
+    con "error" no cuentan como hechas: al relanzar se reintentan (queda la última línea).
+    """
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    good_bytes = 0
+    with open(out_path, "rb") as f:
+        for raw in f:
+            try:
+                rec = json.loads(raw)
+                path = rec["path"]
+            except (ValueError, KeyError):
+                break
+            if "error" in rec:
+                done.discard(path)
+            else:
+                done.add(path)
+            good_bytes += len(raw)
+    if good_bytes < os.path.getsize(out_path):
+        with open(out_path, "rb+") as f:
+            f.truncate(good_bytes)
+        print(f"⚠️  Checkpoint con línea truncada: se recortó a {good_bytes} bytes")
+    return done
+
+
+def to_image_coords(dets, size, img_size):
+    w, h = size
+    sx, sy = w / float(img_size), h / float(img_size)
+    for d in dets:
+        x1, y1, x2, y2 = d["bbox_xyxy"]
+        d["bbox_img"] = [x1 * sx, y1 * sy, x2 * sx, y2 * sy]
+    return dets
+
+
+# ------------------------------------------------------------ main
+def run(opt):
+    images = list_images(opt.source)
+    out_path = Path(opt.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    done = load_checkpoint(out_path)
+    todo = [p for p in images if p not in done]
+    print(f"--> {len(images)} imágenes, {len(done)} ya procesadas, {len(todo)} pendientes")
+    if not todo:
+        return 0
+
+    t = SettingsService(opt.thresholds).load() if opt.thresholds else SettingsService().load()
+    thresholds = {"conf_th": t.conf_th, "iou_th": t.iou_th, "min_box_frac": t.min_box_frac}
+    for k in thresholds:
+        if getattr(opt, k) is not None:
+            thresholds[k] = getattr(opt, k)
+    print(f"--> Umbrales: {thresholds}")
+
+    pool = RuntimePool.create(n=opt.runtimes, model_path=opt.model, yaml_path=opt.data, img_size=opt.img_size)
+    decode_ex = ThreadPoolExecutor(max_workers=opt.decode_workers)
+    # spawn: un fork copiaría los hilos y runtimes NPU ya vivos en este proceso
+    post_ex = ProcessPoolExecutor(max_workers=opt.post_workers, mp_context=mp.get_context("spawn"),
+                                  initializer=_init_post, initargs=(opt.data, opt.img_size, thresholds))
+    pending = queue.Queue(maxsize=opt.prefetch)   # futures de decodificación (acotado = backpressure)
+    results = queue.Queue(maxsize=opt.prefetch * 2)
+
+    def producer():
+        for path in todo:
+            pending.put(decode_ex.submit(_decode, path, opt.img_size))
+        for _ in range(pool.size):
+            pending.put(None)
+
+    def npu_worker():
+        try:
+            with pool.lease() as model:
+                while True:
+                    fut = pending.get()
+                    if fut is None:
+                        break
+                    path, img_input, size, err = fut.result()
+                    if err:
+                        results.put(({"path": path, "error": err}, None))
+                        continue
+                    t0 = time.perf_counter()
+                    outputs = model.infer(img_input)
+                    infer_ms = (time.perf_counter() - t0) * 1000.0
+                    pred = outputs[0][0] if outputs[0].ndim == 3 else outputs[0]
+                    meta = {"path": path, "image_size": list(size), "infer_ms": round(infer_ms, 3)}
+                    results.put((meta, post_ex.submit(_post, pred)))
+        finally:
+            results.put(_DONE)
+
+    threads = [threading.Thread(target=producer, daemon=True)]
+    threads += [threading.Thread(target=npu_worker, daemon=True) for _ in range(pool.size)]
+    for th in threads:
+        th.start()
+
+    t0 = time.perf_counter()
+    n, errors, finished = 0, 0, 0
+    with open(out_path, "a", encoding="utf-8") as out:
+        while finished < pool.size:
+            item = results.get()
+            if item is _DONE:
+                finished += 1
+                continue
+            meta, post_fut = item
+            if post_fut is not None:
+                try:
+                    meta["detections"] = to_image_coords(post_fut.result(), meta["image_size"], opt.img_size)
+                except Exception as e:
+                    meta["error"] = f"postprocess: {e}"
+            if "error" in meta:
+                errors += 1
+            out.write(json.dumps(meta, ensure_ascii=False) + "\n")
+            n += 1
+            if n % opt.checkpoint_every == 0:
+                out.flush()
+                os.fsync(out.fileno())
+                elapsed = time.perf_counter() - t0
+                print(f"--> {n}/{len(todo)}  {n / elapsed:.1f} img/s")
+
+    elapsed = time.perf_counter() - t0
+    decode_ex.shutdown()
+    post_ex.shutdown()
+    pool.release()
+    print(f"✅ {n} imágenes en {elapsed:.1f}s -> {n / max(elapsed, 1e-9):.2f} img/s "
+          f"({pool.size} runtimes NPU, {errors} errores). Resultados: {out_path}")
+    return 0
+
+
+def parse_opt():
+    ap = argparse.ArgumentParser(description="Inferencia RKNN por lotes con salida JSONL reanudable")
+    ap.add_argument("--source", required=True, help="directorio de imágenes o .txt con una ruta por línea")
+    ap.add_argument("--out", default="runs_batch/resultados.jsonl")
+    ap.add_argument("--model", default=settings.RKNN_MODEL_PATH)
+    ap.add_argument("--data", default=settings.CLASSES_YAML)
+    ap.add_argument("--img-size", type=int, default=settings.RKNN_IMG_SIZE)
+    ap.add_argument("--runtimes", type=int, default=settings.NPU_CORES, help="runtimes NPU (uno por núcleo)")
+    ap.add_argument("--decode-workers", type=int, default=4)
+    ap.add_argument("--post-workers", type=int, default=max(1, (os.cpu_count() or 4) // 2))
+    ap.add_argument("--prefetch", type=int, default=16, help="imágenes decodificadas en vuelo")
+    ap.add_argument("--checkpoint-every", type=int, default=50)
+    ap.add_argument("--thresholds", default=None, help="JSON de umbrales (por defecto el de la app)")
+    ap.add_argument("--conf-th", dest="conf_th", type=float, default=None)
+    ap.add_argument("--iou-th", dest="iou_th", type=float, default=None)
+    ap.add_argument("--min-box-frac", dest="min_box_frac", type=float, default=None)
+    return ap.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(run(parse_opt()))
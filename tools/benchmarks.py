@@ -1,294 +1,285 @@
-# Ultralytics YOLOv5 🚀, AGPL-3.0 license
 """
-Run YOLOv5 benchmarks on all supported export formats.
-
-Format                      | `export.py --include`         | Model
----                         | ---                           | ---
-PyTorch                     | -                             | yolov5s.pt
-TorchScript                 | `torchscript`                 | yolov5s.torchscript
-ONNX                        | `onnx`                        | yolov5s.onnx
-OpenVINO                    | `openvino`                    | yolov5s_openvino_model/
-TensorRT                    | `engine`                      | yolov5s.engine
-CoreML                      | `coreml`                      | yolov5s.mlpackage
-TensorFlow SavedModel       | `saved_model`                 | yolov5s_saved_model/
-TensorFlow GraphDef         | `pb`                          | yolov5s.pb
-TensorFlow Lite             | `tflite`                      | yolov5s.tflite
-TensorFlow Edge TPU         | `edgetpu`                     | yolov5s_edgetpu.tflite
-TensorFlow.js               | `tfjs`                        | yolov5s_web_model/
-
-Requirements:
-    $ pip install -r requirements.txt coremltools onnx onnx-simplifier onnxruntime openvino-dev tensorflow-cpu  # CPU
-    $ pip install -r requirements.txt coremltools onnx onnx-simplifier onnxruntime-gpu openvino-dev tensorflow  # GPU
-    $ pip install -U nvidia-tensorrt --index-url https://pypi.ngc.nvidia.com  # TensorRT
-
-Usage:
-    $ python benchmarks.py --weights yolov5s.pt --img 640
+Benchmark por etapas del pipeline de NeuroDermaScan.
+
+Mide, para cada resolución de cámara y densidad de detecciones:
+    preprocess  -> RknnModel.preprocess (BGR->RGB + resize a img_size)
+    inference   -> backend real (rknn NPU / onnx CPU) o uno simulado (--backend sim)
+    postprocess -> RknnModel.postprocess sobre una salida sintética con N detecciones
+    draw        -> _draw_detections del stream (app.services.overlay)
+    encode      -> cv2.imencode(".jpg") del frame anotado
+
+La salida sintética (densidad) se usa en postprocess/draw con ambos backends, así
+los números son comparables entre equipos; la inferencia real solo cambia la etapa
+'inference'.
+
+Con --tiles mide en cambio la latencia del frame completo en modo teselas
+(app/services/tiling_service.py) según el tamaño de tesela, es decir según cuántas
+teselas se reparten entre --runtimes runtimes.
+
+Uso:
+    $ python tools/benchmarks.py --backend sim --resolutions 640x480,1280x720 --densities 0,5,50 --save bench.json
+    $ python tools/benchmarks.py --backend rknn --compare bench_baseline.json --tolerance 0.10
+    $ python tools/benchmarks.py --tiles --backend sim --sim-ms 25 --runtimes 3 --tile-sizes 1920,960,640,480
 """
 
 import argparse
+import json
 import platform
 import sys
 import time
 from pathlib import Path
 
-import pandas as pd
+import cv2
+import numpy as np
 
 FILE = Path(__file__).resolve()
-ROOT = FILE.parents[0]  # YOLOv5 root directory
+ROOT = FILE.parents[1]  # raíz del repo
 if str(ROOT) not in sys.path:
-    sys.path.append(str(ROOT))  # add ROOT to PATH
-# ROOT = ROOT.relative_to(Path.cwd())  # relative
-
-import export
-from models.experimental import attempt_load
-from models.yolo import SegmentationModel
-from segment.val import run as val_seg
-from utils import notebook_init
-from utils.general import LOGGER, check_yaml, file_size, print_args
-from utils.torch_utils import select_device
-from val import run as val_det
-
-
-def run(
-    weights=ROOT / "yolov5s.pt",  # weights path
-    imgsz=640,  # inference size (pixels)
-    batch_size=1,  # batch size
-    data=ROOT / "data/coco128.yaml",  # dataset.yaml path
-    device="",  # cuda device, i.e. 0 or 0,1,2,3 or cpu
-    half=False,  # use FP16 half-precision inference
-    test=False,  # test exports only
-    pt_only=False,  # test PyTorch only
-    hard_fail=False,  # throw error on benchmark failure
-):
+    sys.path.append(str(ROOT))
+
+from app.adapters.inference_backend import create_backend  # noqa: E402
+from app.adapters.rknn_adapter import RknnModel, core_mask_for  # noqa: E402
+from app.adapters.sim_adapter import SimBackend, synthetic_outputs  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.services.overlay import draw_detections  # noqa: E402
+from app.services.runtime_pool import RuntimePool  # noqa: E402
+from app.services.settings_service import Thresholds  # noqa: E402
+from app.services.tiling_service import TiledDetector, tile_grid  # noqa: E402
+
+STAGES = ("preprocess", "inference", "postprocess", "draw", "encode")
+
+
+def sim_backend(opt, outputs, core_mask=None):
+    """NPU simulada (app/adapters/sim_adapter.py) con la latencia de --sim-ms/--sim-jitter/--sim-contention."""
+    backend = SimBackend(core_mask=core_mask, outputs=outputs, latency_ms=opt.sim_ms,
+                         jitter=opt.sim_jitter, contention=opt.sim_contention)
+    backend.load()
+    return backend
+
+
+def parse_resolutions(spec):
+    res = []
+    for r in spec.split(","):
+        w, h = r.lower().split("x")
+        res.append((int(w), int(h)))
+    return res
+
+
+def summarize(samples_ms):
+    a = np.asarray(samples_ms, np.float64)
+    return {
+        "mean": round(float(a.mean()), 4),
+        "p50": round(float(np.percentile(a, 50)), 4),
+        "p90": round(float(np.percentile(a, 90)), 4),
+        "p99": round(float(np.percentile(a, 99)), 4),
+        "min": round(float(a.min()), 4),
+    }
+
+
+def time_stage(fn, iters, warmup):
+    for _ in range(warmup):
+        fn()
+    out = []
+    for _ in range(iters):
+        t0 = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t0) * 1000.0)
+    return out
+
+
+def make_frame(w, h, image=None, seed=0):
+    if image is not None:
+        return cv2.resize(image, (w, h), interpolation=cv2.INTER_LINEAR)
+    rng = np.random.default_rng(seed)
+    # ruido suavizado: comprime parecido a una imagen real (ruido puro infla el JPEG)
+    frame = rng.integers(0, 255, (h // 8, w // 8, 3), dtype=np.uint8)
+    return cv2.resize(frame, (w, h), interpolation=cv2.INTER_CUBIC)
+
+
+def run(opt):
+    if opt.backend != "sim":
+        model = RknnModel(model_path=opt.model or settings.RKNN_MODEL_PATH, yaml_path=opt.data,
+                          img_size=opt.img_size, backend=create_backend(opt.backend, opt.model))
+    else:
+        model = RknnModel(yaml_path=opt.data, img_size=opt.img_size, init_runtime=False)
+    model.set_thresholds(conf_th=opt.conf_th, iou_th=opt.iou_th, min_box_frac=opt.min_box_frac)
+    nc = len(model.class_names)
+
+    image = cv2.imread(opt.image) if opt.image else None
+    results = []
+    for (w, h) in parse_resolutions(opt.resolutions):
+        frame = make_frame(w, h, image)
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        img_input = model.preprocess(rgb)
+
+        for density in [int(d) for d in opt.densities.split(",")]:
+            outputs = synthetic_outputs(density, nc, opt.img_size)
+            if opt.backend == "sim":
+                # un SimBackend por densidad: se libera el anterior antes de reemplazarlo
+                model.release()
+                model.backend = sim_backend(opt, outputs)
+            dets = model.postprocess(outputs)
+            annotated = draw_detections(frame.copy(), dets, img_size=opt.img_size)
+
+            stages = {
+                "preprocess": lambda: model.preprocess(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)),
+                "inference": lambda: model.infer(img_input),
+                "postprocess": lambda: model.postprocess(outputs),
+                "draw": lambda: draw_detections(frame.copy(), dets, img_size=opt.img_size),
+                "encode": lambda: cv2.imencode(".jpg", annotated),
+            }
+            row = {"resolution": f"{w}x{h}", "density": density, "detections": len(dets), "stages": {}}
+            for name in STAGES:
+                row["stages"][name] = summarize(time_stage(stages[name], opt.iters, opt.warmup))
+            row["total_p50"] = round(sum(s["p50"] for s in row["stages"].values()), 4)
+            results.append(row)
+            print(f"{w}x{h:<5} dens={density:<4} dets={len(dets):<4} "
+                  + "  ".join(f"{n}={row['stages'][n]['p50']:.2f}" for n in STAGES)
+                  + f"  total={row['total_p50']:.2f} ms")
+
+    model.release()
+
+    return {
+        "meta": {
+            "backend": opt.backend,
+            "sim_ms": opt.sim_ms if opt.backend == "sim" else None,
+            "sim_jitter": opt.sim_jitter if opt.backend == "sim" else None,
+            "sim_contention": opt.sim_contention if opt.backend == "sim" else None,
+            "img_size": opt.img_size,
+            "thresholds": model.get_thresholds(),
+            "iters": opt.iters,
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "python": platform.python_version(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def run_tiles(opt):
+    """Latencia del frame completo vs. número de teselas (una fila por resolución y tamaño de tesela)."""
+    models = []
+    for i in range(opt.runtimes):
+        if opt.backend != "sim":
+            backend = create_backend(opt.backend, opt.model, core_mask=core_mask_for(i) if opt.runtimes > 1 else None)
+            models.append(RknnModel(model_path=opt.model or settings.RKNN_MODEL_PATH, yaml_path=opt.data,
+                                    img_size=opt.img_size, backend=backend))
+        else:
+            m = RknnModel(yaml_path=opt.data, img_size=opt.img_size, init_runtime=False)
+            m.backend = sim_backend(opt, synthetic_outputs(5, len(m.class_names), opt.img_size),
+                                    core_mask=core_mask_for(i) if opt.runtimes > 1 else None)
+            models.append(m)
+    pool = RuntimePool(models)
+    tiler = TiledDetector(pool=pool)
+    thr = Thresholds(conf_th=opt.conf_th, iou_th=opt.iou_th, min_box_frac=opt.min_box_frac)
+
+    image = cv2.imread(opt.image) if opt.image else None
+    results = []
+    for (w, h) in parse_resolutions(opt.resolutions):
+        frame = make_frame(w, h, image)
+        for tile in [int(t) for t in opt.tile_sizes.split(",")]:
+            n = len(tile_grid(w, h, tile, opt.overlap))
+            stats = summarize(time_stage(lambda: tiler.detect(frame, thr, opt.img_size, priority="batch",
+                                                              tile=tile, overlap=opt.overlap),
+                                         opt.iters, opt.warmup))
+            row = {"resolution": f"{w}x{h}", "tile": tile, "overlap": opt.overlap, "tiles": n,
+                   "runtimes": pool.size, "frame_ms": stats}
+            results.append(row)
+            print(f"{w}x{h:<5} tile={tile:<5} teselas={n:<3} runtimes={pool.size}  "
+                  f"p50={stats['p50']:.2f}  p90={stats['p90']:.2f} ms  ({stats['p50'] / n:.2f} ms/tesela)")
+    pool.release()
+    return {
+        "meta": {"mode": "tiles", "backend": opt.backend, "sim_ms": opt.sim_ms if opt.backend == "sim" else None,
+                 "sim_contention": opt.sim_contention if opt.backend == "sim" else None,
+                 "img_size": opt.img_size, "iters": opt.iters, "machine": platform.machine(),
+                 "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+
+
+def compare(current, baseline, metric="p50", tolerance=0.10, min_delta_ms=0.05):
     """
-    Run YOLOv5 benchmarks on multiple export formats and log results for model performance evaluation.
-
-    Args:
-        weights (Path | str): Path to the model weights file (default: ROOT / "yolov5s.pt").
-        imgsz (int): Inference size in pixels (default: 640).
-        batch_size (int): Batch size for inference (default: 1).
-        data (Path | str): Path to the dataset.yaml file (default: ROOT / "data/coco128.yaml").
-        device (str): CUDA device, e.g., '0' or '0,1,2,3' or 'cpu' (default: "").
-        half (bool): Use FP16 half-precision inference (default: False).
-        test (bool): Test export formats only (default: False).
-        pt_only (bool): Test PyTorch format only (default: False).
-        hard_fail (bool): Throw an error on benchmark failure if True (default: False).
-
-    Returns:
-        None. Logs information about the benchmark results, including the format, size, mAP50-95, and inference time.
-
-    Notes:
-        Supported export formats and models include PyTorch, TorchScript, ONNX, OpenVINO, TensorRT, CoreML,
-            TensorFlow SavedModel, TensorFlow GraphDef, TensorFlow Lite, and TensorFlow Edge TPU. Edge TPU and TF.js
-            are unsupported.
-
-    Example:
-        ```python
-        $ python benchmarks.py --weights yolov5s.pt --img 640
-        ```
-
-    Usage:
-        Install required packages:
-          $ pip install -r requirements.txt coremltools onnx onnx-simplifier onnxruntime openvino-dev tensorflow-cpu  # CPU support
-          $ pip install -r requirements.txt coremltools onnx onnx-simplifier onnxruntime-gpu openvino-dev tensorflow   # GPU support
-          $ pip install -U nvidia-tensorrt --index-url https://pypi.ngc.nvidia.com  # TensorRT
-
-        Run benchmarks:
-          $ python benchmarks.py --weights yolov5s.pt --img 640
+    Compara etapa a etapa contra un baseline guardado.
+    Regresión = empeora más de 'tolerance' (relativo) Y más de 'min_delta_ms' (ruido).
     """
-    y, t = [], time.time()
-    device = select_device(device)
-    model_type = type(attempt_load(weights, fuse=False))  # DetectionModel, SegmentationModel, etc.
-    for i, (name, f, suffix, cpu, gpu) in export.export_formats().iterrows():  # index, (name, file, suffix, CPU, GPU)
-        try:
-            assert i not in (9, 10), "inference not supported"  # Edge TPU and TF.js are unsupported
-            assert i != 5 or platform.system() == "Darwin", "inference only supported on macOS>=10.13"  # CoreML
-            if "cpu" in device.type:
-                assert cpu, "inference not supported on CPU"
-            if "cuda" in device.type:
-                assert gpu, "inference not supported on GPU"
-
-            # Export
-            if f == "-":
-                w = weights  # PyTorch format
-            else:
-                w = export.run(
-                    weights=weights, imgsz=[imgsz], include=[f], batch_size=batch_size, device=device, half=half
-                )[-1]  # all others
-            assert suffix in str(w), "export failed"
-
-            # Validate
-            if model_type == SegmentationModel:
-                result = val_seg(data, w, batch_size, imgsz, plots=False, device=device, task="speed", half=half)
-                metric = result[0][7]  # (box(p, r, map50, map), mask(p, r, map50, map), *loss(box, obj, cls))
-            else:  # DetectionModel:
-                result = val_det(data, w, batch_size, imgsz, plots=False, device=device, task="speed", half=half)
-                metric = result[0][3]  # (p, r, map50, map, *loss(box, obj, cls))
-            speed = result[2][1]  # times (preprocess, inference, postprocess)
-            y.append([name, round(file_size(w), 1), round(metric, 4), round(speed, 2)])  # MB, mAP, t_inference
-        except Exception as e:
-            if hard_fail:
-                assert type(e) is AssertionError, f"Benchmark --hard-fail for {name}: {e}"
-            LOGGER.warning(f"WARNING ⚠️ Benchmark failure for {name}: {e}")
-            y.append([name, None, None, None])  # mAP, t_inference
-        if pt_only and i == 0:
-            break  # break after PyTorch
-
-    # Print results
-    LOGGER.info("\n")
-    parse_opt()
-    notebook_init()  # print system info
-    c = ["Format", "Size (MB)", "mAP50-95", "Inference time (ms)"] if map else ["Format", "Export", "", ""]
-    py = pd.DataFrame(y, columns=c)
-    LOGGER.info(f"\nBenchmarks complete ({time.time() - t:.2f}s)")
-    LOGGER.info(str(py if map else py.iloc[:, :2]))
-    if hard_fail and isinstance(hard_fail, str):
-        metrics = py["mAP50-95"].array  # values to compare to floor
-        floor = eval(hard_fail)  # minimum metric floor to pass, i.e. = 0.29 mAP for YOLOv5n
-        assert all(x > floor for x in metrics if pd.notna(x)), f"HARD FAIL: mAP50-95 < floor {floor}"
-    return py
-
-
-def test(
-    weights=ROOT / "yolov5s.pt",  # weights path
-    imgsz=640,  # inference size (pixels)
-    batch_size=1,  # batch size
-    data=ROOT / "data/coco128.yaml",  # dataset.yaml path
-    device="",  # cuda device, i.e. 0 or 0,1,2,3 or cpu
-    half=False,  # use FP16 half-precision inference
-    test=False,  # test exports only
-    pt_only=False,  # test PyTorch only
-    hard_fail=False,  # throw error on benchmark failure
-):
-    """
-    Run YOLOv5 export tests for all supported formats and log the results, including export statuses.
-
-    Args:
-        weights (Path | str): Path to the model weights file (.pt format). Default is 'ROOT / "yolov5s.pt"'.
-        imgsz (int): Inference image size (in pixels). Default is 640.
-        batch_size (int): Batch size for testing. Default is 1.
-        data (Path | str): Path to the dataset configuration file (.yaml format). Default is 'ROOT / "data/coco128.yaml"'.
-        device (str): Device for running the tests, can be 'cpu' or a specific CUDA device ('0', '0,1,2,3', etc.). Default is an empty string.
-        half (bool): Use FP16 half-precision for inference if True. Default is False.
-        test (bool): Test export formats only without running inference. Default is False.
-        pt_only (bool): Test only the PyTorch model if True. Default is False.
-        hard_fail (bool): Raise error on export or test failure if True. Default is False.
-
-    Returns:
-        pd.DataFrame: DataFrame containing the results of the export tests, including format names and export statuses.
-
-    Examples:
-        ```python
-        $ python benchmarks.py --weights yolov5s.pt --img 640
-        ```
-
-    Notes:
-        Supported export formats and models include PyTorch, TorchScript, ONNX, OpenVINO, TensorRT, CoreML, TensorFlow
-        SavedModel, TensorFlow GraphDef, TensorFlow Lite, and TensorFlow Edge TPU. Edge TPU and TF.js are unsupported.
-
-    Usage:
-        Install required packages:
-            $ pip install -r requirements.txt coremltools onnx onnx-simplifier onnxruntime openvino-dev tensorflow-cpu  # CPU support
-            $ pip install -r requirements.txt coremltools onnx onnx-simplifier onnxruntime-gpu openvino-dev tensorflow   # GPU support
-            $ pip install -U nvidia-tensorrt --index-url https://pypi.ngc.nvidia.com  # TensorRT
-        Run export tests:
-            $ python benchmarks.py --weights yolov5s.pt --img 640
-    """
-    y, t = [], time.time()
-    device = select_device(device)
-    for i, (name, f, suffix, gpu) in export.export_formats().iterrows():  # index, (name, file, suffix, gpu-capable)
-        try:
-            w = (
-                weights
-                if f == "-"
-                else export.run(weights=weights, imgsz=[imgsz], include=[f], device=device, half=half)[-1]
-            )  # weights
-            assert suffix in str(w), "export failed"
-            y.append([name, True])
-        except Exception:
-            y.append([name, False])  # mAP, t_inference
-
-    # Print results
-    LOGGER.info("\n")
-    parse_opt()
-    notebook_init()  # print system info
-    py = pd.DataFrame(y, columns=["Format", "Export"])
-    LOGGER.info(f"\nExports complete ({time.time() - t:.2f}s)")
-    LOGGER.info(str(py))
-    return py
+    base = {(r["resolution"], r["density"]): r for r in baseline["results"]}
+    regressions, rows = [], []
+    for r in current["results"]:
+        b = base.get((r["resolution"], r["density"]))
+        if b is None:
+            continue
+        for stage, stats in r["stages"].items():
+            if stage not in b["stages"]:
+                continue
+            old, new = b["stages"][stage][metric], stats[metric]
+            ratio = (new / old) if old > 0 else float("inf")
+            bad = (new - old) > min_delta_ms and ratio > 1.0 + tolerance
+            rows.append((r["resolution"], r["density"], stage, old, new, ratio, bad))
+            if bad:
+                regressions.append(rows[-1])
+
+    print(f"\n=== Comparación contra baseline ({metric}, tolerancia {tolerance:.0%}) ===")
+    for res, dens, stage, old, new, ratio, bad in rows:
+        flag = "❌ REGRESIÓN" if bad else ("✅" if ratio <= 1.0 else "")
+        print(f"{res:>10} dens={dens:<4} {stage:<12} {old:9.3f} -> {new:9.3f} ms  x{ratio:5.2f} {flag}")
+    return regressions
 
 
 def parse_opt():
-    """
-    Parses command-line arguments for YOLOv5 model inference configuration.
-
-    Args:
-        weights (str): The path to the weights file. Defaults to 'ROOT / "yolov5s.pt"'.
-        imgsz (int): Inference size in pixels. Defaults to 640.
-        batch_size (int): Batch size. Defaults to 1.
-        data (str): Path to the dataset YAML file. Defaults to 'ROOT / "data/coco128.yaml"'.
-        device (str): CUDA device, e.g., '0' or '0,1,2,3' or 'cpu'. Defaults to an empty string (auto-select).
-        half (bool): Use FP16 half-precision inference. This is a flag and defaults to False.
-        test (bool): Test exports only. This is a flag and defaults to False.
-        pt_only (bool): Test PyTorch only. This is a flag and defaults to False.
-        hard_fail (bool | str): Throw an error on benchmark failure. Can be a boolean or a string representing a minimum
-            metric floor, e.g., '0.29'. Defaults to False.
-
-    Returns:
-        argparse.Namespace: Parsed command-line arguments encapsulated in an argparse Namespace object.
-
-    Notes:
-        The function modifies the 'opt.data' by checking and validating the YAML path using 'check_yaml()'.
-        The parsed arguments are printed for reference using 'print_args()'.
-    """
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--weights", type=str, default=ROOT / "yolov5s.pt", help="weights path")
-    parser.add_argument("--imgsz", "--img", "--img-size", type=int, default=640, help="inference size (pixels)")
-    parser.add_argument("--batch-size", type=int, default=1, help="batch size")
-    parser.add_argument("--data", type=str, default=ROOT / "data/coco128.yaml", help="dataset.yaml path")
-    parser.add_argument("--device", default="", help="cuda device, i.e. 0 or 0,1,2,3 or cpu")
-    parser.add_argument("--half", action="store_true", help="use FP16 half-precision inference")
-    parser.add_argument("--test", action="store_true", help="test exports only")
-    parser.add_argument("--pt-only", action="store_true", help="test PyTorch only")
-    parser.add_argument("--hard-fail", nargs="?", const=True, default=False, help="Exception on error or < min metric")
-    opt = parser.parse_args()
-    opt.data = check_yaml(opt.data)  # check YAML
-    print_args(vars(opt))
-    return opt
+    ap = argparse.ArgumentParser(description="Benchmark por etapas del pipeline RKNN")
+    ap.add_argument("--backend", choices=["rknn", "onnx", "sim"], default="sim")
+    ap.add_argument("--sim-ms", type=float, default=0.0, help="latencia base del runtime simulado")
+    ap.add_argument("--sim-jitter", type=float, default=0.0, help="dispersión lognormal de la latencia simulada")
+    ap.add_argument("--sim-contention", type=float, default=0.0,
+                    help="recargo relativo por cada otro núcleo simulado ocupado (--tiles con varios runtimes)")
+    ap.add_argument("--model", default=None, help="modelo (por defecto el de settings según backend)")
+    ap.add_argument("--data", default=settings.CLASSES_YAML)
+    ap.add_argument("--img-size", type=int, default=settings.RKNN_IMG_SIZE)
+    ap.add_argument("--image", default=None, help="imagen base (si no, ruido suavizado)")
+    ap.add_argument("--resolutions", default="640x480,1280x720,1920x1080")
+    ap.add_argument("--densities", default="0,5,20,100", help="detecciones sintéticas por frame")
+    ap.add_argument("--conf-th", type=float, default=0.30)
+    ap.add_argument("--iou-th", type=float, default=0.50)
+    ap.add_argument("--min-box-frac", type=float, default=0.003)
+    ap.add_argument("--iters", type=int, default=50)
+    ap.add_argument("--warmup", type=int, default=5)
+    ap.add_argument("--save", default=None, help="guardar resultados JSON")
+    ap.add_argument("--compare", default=None, help="baseline JSON contra el cual comparar")
+    ap.add_argument("--metric", default="p50", choices=["mean", "p50", "p90", "p99", "min"])
+    ap.add_argument("--tolerance", type=float, default=0.10)
+    ap.add_argument("--min-delta-ms", type=float, default=0.05)
+    ap.add_argument("--tiles", action="store_true", help="benchmark de latencia vs. número de teselas")
+    ap.add_argument("--tile-sizes", default="1920,960,640,480", help="tamaños de tesela a probar (--tiles)")
+    ap.add_argument("--overlap", type=float, default=settings.TILE_OVERLAP, help="solapamiento entre teselas (--tiles)")
+    ap.add_argument("--runtimes", type=int, default=settings.TILE_RUNTIMES, help="runtimes del pool (--tiles)")
+    return ap.parse_args()
 
 
 def main(opt):
-    """
-    Executes YOLOv5 benchmark tests or main training/inference routines based on the provided command-line arguments.
-
-    Args:
-        opt (argparse.Namespace): Parsed command-line arguments including options for weights, image size, batch size, data
-            configuration, device, and other flags for inference settings.
-
-    Returns:
-        None: This function does not return any value. It leverages side-effects such as logging and running benchmarks.
-
-    Example:
-        ```python
-        if __name__ == "__main__":
-            opt = parse_opt()
-            main(opt)
-        ```
-
-    Notes:
-        - For a complete list of supported export formats and their respective requirements, refer to the
-          [Ultralytics YOLOv5 Export Formats](https://github.com/ultralytics/yolov5#export-formats).
-        - Ensure that you have installed all necessary dependencies by following the installation instructions detailed in
-          the [main repository](https://github.com/ultralytics/yolov5#installation).
-
-        ```shell
-        # Running benchmarks on default weights and image size
-        $ python benchmarks.py --weights yolov5s.pt --img 640
-        ```
-    """
-    test(**vars(opt)) if opt.test else run(**vars(opt))
+    if opt.tiles:
+        current = run_tiles(opt)
+        if opt.save:
+            with open(opt.save, "w", encoding="utf-8") as f:
+                json.dump(current, f, indent=2)
+            print(f"✅ Resultados guardados en {opt.save}")
+        return 0
+    current = run(opt)
+    if opt.save:
+        with open(opt.save, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"✅ Resultados guardados en {opt.save}")
+    if opt.compare:
+        with open(opt.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regs = compare(current, baseline, opt.metric, opt.tolerance, opt.min_delta_ms)
+        if regs:
+            print(f"\n❌ {len(regs)} regresiones")
+            return 1
+        print("\n✅ Sin regresiones")
+    return 0
 
 
 if __name__ == "__main__":
-    opt = parse_opt()
-    main(opt)
+    sys.exit(main(parse_opt()))
@@ -0,0 +1,280 @@
+"""
+Calibración offline de umbrales (conf_th, iou_th, min_box_frac).
+
+Se trabaja en dos pasos:
+
+1) record: pasa una vez el set de imágenes etiquetadas por la NPU y guarda la
+   salida cruda del modelo (memmap .npy) + etiquetas + latencias en un directorio.
+
+       $ python tools/calibrate_thresholds.py record --source tools/convert/dataset.txt --out runs_calib
+
+2) sweep: evalúa una grilla completa de combinaciones sobre lo grabado, sin NPU.
+   Por imagen los candidatos se decodifican y ordenan UNA sola vez; todas las
+   combinaciones de la grilla se evalúan a la vez como máscaras (G, K) en NumPy.
+
+       $ python tools/calibrate_thresholds.py sweep --run runs_calib \\
+             --conf 0.30:0.80:0.05 --iou 0.20,0.30,0.45 --min-box 0.001,0.003,0.006 --min-recall 0.8
+
+Etiquetas: formato YOLO (clase cx cy w h normalizados). Por defecto se buscan en
+la ruta hermana .../labels/<nombre>.txt de cada .../images/<nombre>.jpg.
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]  # raíz del repo
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from app.adapters.dataset_fs import iou_matrix, label_path_for, list_images, load_labels  # noqa: E402
+from app.adapters.rknn_adapter import RknnModel  # noqa: E402
+from app.config import settings  # noqa: E402
+
+
+# ----------------------------------------------------------------- utilidades
+def parse_grid(spec):
+    """'0.3,0.4' o 'inicio:fin:paso' (fin inclusivo)."""
+    if ":" in spec:
+        a, b, step = map(float, spec.split(":"))
+        n = int(round((b - a) / step)) + 1
+        return [round(a + i * step, 6) for i in range(n)]
+    return [float(x) for x in spec.split(",") if x.strip()]
+
+
+# --------------------------------------------------------------------- record
+def record(opt):
+    images = list_images(opt.source)
+    if not images:
+        print(f"❌ No se encontraron imágenes en {opt.source}")
+        return 1
+
+    model = RknnModel(model_path=opt.model, yaml_path=opt.data, img_size=opt.img_size)
+    out_dir = Path(opt.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    outputs_mm = None
+    index = {"model": str(opt.model), "img_size": opt.img_size, "images": []}
+    n = 0
+    for path in images:
+        img = cv2.imread(path)
+        if img is None:
+            print(f"⚠️  No se pudo leer {path}, se omite")
+            continue
+        t0 = time.perf_counter()
+        img_input = model.preprocess(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+        t1 = time.perf_counter()
+        outputs = model.infer(img_input)
+        t2 = time.perf_counter()
+
+        pred = outputs[0][0] if outputs[0].ndim == 3 else outputs[0]
+        if outputs_mm is None:
+            outputs_mm = np.lib.format.open_memmap(
+                out_dir / "outputs.npy", mode="w+",
+                dtype=np.float16 if opt.fp16 else np.float32, shape=(len(images),) + pred.shape)
+        outputs_mm[n] = pred
+        index["images"].append({
+            "path": path,
+            "labels": load_labels(label_path_for(path, opt.labels_dir), opt.img_size),
+            "pre_ms": (t1 - t0) * 1000.0,
+            "infer_ms": (t2 - t1) * 1000.0,
+        })
+        n += 1
+        if n % 50 == 0:
+            print(f"--> {n}/{len(images)}")
+
+    model.release()
+    if outputs_mm is None:
+        print("❌ Ninguna imagen válida")
+        return 1
+    outputs_mm.flush()
+    index["count"] = n
+    with open(out_dir / "index.json", "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    print(f"✅ {n} salidas grabadas en {out_dir}")
+    return 0
+
+
+# ---------------------------------------------------------------------- sweep
+def sweep_image(pred, gts, grid, img_size, nms_topk, match_iou, agnostic, max_cand):
+    """
+    Evalúa todas las combinaciones de la grilla sobre una imagen.
+    grid: dict con arrays (G,) 'conf', 'iou', 'min_area'.
+    Devuelve (tp, n_det) de shape (G,).
+    """
+    G = grid["conf"].shape[0]
+    boxes, areas, scores, cls_ids = RknnModel.decode([pred])
+
+    # candidatos: todo lo que supera el menor conf de la grilla, ordenado una vez
+    cand = np.where(scores >= grid["conf"].min())[0]
+    cand = cand[np.argsort(-scores[cand], kind="stable")][:max_cand]
+    K = cand.size
+    if K == 0:
+        return np.zeros(G, np.int64), np.zeros(G, np.int64)
+
+    boxes = np.clip(boxes[cand], 0, img_size - 1)
+    areas, scores, cls_ids = areas[cand], scores[cand], cls_ids[cand]
+
+    # máscara de candidatos activos por combinación (conf + área + top-k previo a NMS)
+    active = (scores[None, :] >= grid["conf"][:, None]) & (areas[None, :] >= grid["min_area"][:, None])
+    active &= np.cumsum(active, axis=1) <= nms_topk
+
+    ious = iou_matrix(boxes, boxes)
+    gt = np.asarray(gts, np.float32).reshape(-1, 5)
+    gt_iou = iou_matrix(boxes, gt[:, 1:])
+    if not agnostic:
+        gt_iou = np.where(cls_ids[:, None] == gt[None, :, 0].astype(np.int64), gt_iou, 0.0)
+
+    suppressed = np.zeros((G, K), bool)
+    matched = np.zeros((G, gt.shape[0]), bool)
+    tp = np.zeros(G, np.int64)
+    n_det = np.zeros(G, np.int64)
+    for i in range(K):
+        keep_i = active[:, i] & ~suppressed[:, i]
+        if not keep_i.any():
+            continue
+        n_det += keep_i
+        # NMS greedy: i suprime a los siguientes con IoU > iou_th de cada combinación
+        suppressed[:, i + 1:] |= keep_i[:, None] & (ious[i, i + 1:][None, :] > grid["iou"][:, None])
+        # matching greedy por score contra GT aún libres
+        if gt.shape[0]:
+            cand_iou = np.where(matched, -1.0, gt_iou[i][None, :])
+            j = np.argmax(cand_iou, axis=1)
+            hit = keep_i & (cand_iou[np.arange(G), j] >= match_iou)
+            tp += hit
+            matched[hit, j[hit]] = True
+    return tp, n_det
+
+
+def time_postprocess(model, samples, combos, repeats=1):
+    """Mide RknnModel.postprocess real (ms) por combinación sobre unas pocas salidas."""
+    res = []
+    for conf, iou, mbf in combos:
+        model.set_thresholds(conf_th=conf, iou_th=iou, min_box_frac=mbf)
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            for out in samples:
+                model.postprocess(out)
+        res.append((time.perf_counter() - t0) * 1000.0 / (repeats * max(1, len(samples))))
+    return np.asarray(res)
+
+
+def sweep(opt):
+    run = Path(opt.run)
+    with open(run / "index.json", "r", encoding="utf-8") as f:
+        index = json.load(f)
+    img_size = int(index["img_size"])
+    outputs = np.load(run / "outputs.npy", mmap_mode="r")
+    entries = index["images"]
+
+    confs, ious, mbfs = parse_grid(opt.conf), parse_grid(opt.iou), parse_grid(opt.min_box)
+    mesh = np.array(np.meshgrid(confs, ious, mbfs, indexing="ij")).reshape(3, -1)
+    grid = {"conf": mesh[0], "iou": mesh[1], "min_area": mesh[2] * img_size * img_size}
+    G = mesh.shape[1]
+    print(f"--> {len(entries)} imágenes x {G} combinaciones")
+
+    t0 = time.perf_counter()
+    tp = np.zeros(G, np.int64)
+    n_det = np.zeros(G, np.int64)
+    n_gt = 0
+    for k, e in enumerate(entries):
+        gts = e["labels"]
+        n_gt += len(gts)
+        t, d = sweep_image(outputs[k], gts, grid, img_size, opt.nms_topk, opt.match_iou, opt.agnostic,
+                           opt.max_cand)
+        tp += t
+        n_det += d
+    print(f"✅ Grilla evaluada en {time.perf_counter() - t0:.2f}s")
+
+    precision = np.where(n_det > 0, tp / np.maximum(n_det, 1), 1.0)
+    recall = tp / max(n_gt, 1)
+    f1 = np.where(precision + recall > 0, 2 * precision * recall / np.maximum(precision + recall, 1e-9), 0.0)
+
+    pre_infer_ms = float(np.mean([e["pre_ms"] + e["infer_ms"] for e in entries]))
+    post_ms = np.zeros(G)
+    if opt.latency_samples > 0:
+        model = RknnModel(yaml_path=opt.data, img_size=img_size, nms_topk=opt.nms_topk, init_runtime=False)
+        step = max(1, len(entries) // opt.latency_samples)
+        samples = [[np.asarray(outputs[k], np.float32)] for k in range(0, len(entries), step)][:opt.latency_samples]
+        post_ms = time_postprocess(model, samples, mesh.T.tolist())
+
+    rows = []
+    for g in range(G):
+        rows.append({
+            "conf_th": round(float(mesh[0, g]), 4),
+            "iou_th": round(float(mesh[1, g]), 4),
+            "min_box_frac": round(float(mesh[2, g]), 5),
+            "precision": round(float(precision[g]), 4),
+            "recall": round(float(recall[g]), 4),
+            "f1": round(float(f1[g]), 4),
+            "dets_per_img": round(float(n_det[g]) / max(1, len(entries)), 3),
+            "post_ms": round(float(post_ms[g]), 3),
+            "total_ms": round(pre_infer_ms + float(post_ms[g]), 3),
+        })
+
+    ok = [r for r in rows if r["precision"] >= opt.min_precision and r["recall"] >= opt.min_recall]
+    ok.sort(key=lambda r: (r["total_ms"], -r["f1"]))
+    rows.sort(key=lambda r: -r["f1"])
+
+    cols = list(rows[0].keys())
+    print("\n=== Top combinaciones por F1 ===")
+    print("  ".join(f"{c:>12}" for c in cols))
+    for r in rows[:opt.top]:
+        print("  ".join(f"{r[c]:>12}" for c in cols))
+    print(f"\n=== Aceptables (P>={opt.min_precision}, R>={opt.min_recall}), más rápidas primero: {len(ok)} ===")
+    for r in ok[:opt.top]:
+        print("  ".join(f"{r[c]:>12}" for c in cols))
+    if ok:
+        b = ok[0]
+        print(f"\n👉 Sugerido: conf_th={b['conf_th']} iou_th={b['iou_th']} min_box_frac={b['min_box_frac']}")
+
+    if opt.csv:
+        with open(opt.csv, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=cols)
+            w.writeheader()
+            w.writerows(rows)
+        print(f"✅ Tabla completa en {opt.csv}")
+    return 0
+
+
+def parse_opt():
+    ap = argparse.ArgumentParser(description="Calibración offline de umbrales RKNN")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    r = sub.add_parser("record", help="graba salidas crudas de la NPU para un set etiquetado")
+    r.add_argument("--source", required=True, help="directorio de imágenes o .txt con una ruta por línea")
+    r.add_argument("--labels-dir", default=None, help="directorio de etiquetas YOLO (por defecto images->labels)")
+    r.add_argument("--model", default=settings.RKNN_MODEL_PATH)
+    r.add_argument("--data", default=settings.CLASSES_YAML)
+    r.add_argument("--img-size", type=int, default=settings.RKNN_IMG_SIZE)
+    r.add_argument("--out", default="runs_calib")
+    r.add_argument("--fp16", action="store_true", help="guardar salidas en float16 (mitad de disco)")
+
+    s = sub.add_parser("sweep", help="evalúa una grilla de umbrales sobre lo grabado")
+    s.add_argument("--run", default="runs_calib")
+    s.add_argument("--data", default=settings.CLASSES_YAML)
+    s.add_argument("--conf", default="0.25:0.80:0.05")
+    s.add_argument("--iou", default="0.20,0.30,0.45,0.60")
+    s.add_argument("--min-box", default="0.0,0.001,0.003,0.006")
+    s.add_argument("--nms-topk", type=int, default=300)
+    s.add_argument("--max-cand", type=int, default=1000, help="máximo de candidatos por imagen tras el conf mínimo")
+    s.add_argument("--match-iou", type=float, default=0.5, help="IoU mínimo para contar un TP")
+    s.add_argument("--agnostic", action="store_true", help="no exigir coincidencia de clase")
+    s.add_argument("--latency-samples", type=int, default=8, help="salidas usadas para medir postprocess (0=omitir)")
+    s.add_argument("--min-precision", type=float, default=0.0)
+    s.add_argument("--min-recall", type=float, default=0.0)
+    s.add_argument("--top", type=int, default=15)
+    s.add_argument("--csv", default=None)
+    return ap.parse_args()
+
+
+if __name__ == "__main__":
+    opt = parse_opt()
+    sys.exit(record(opt) if opt.cmd == "record" else sweep(opt))
@@ -0,0 +1,282 @@
+"""
+A/B de variantes de modelo: precisión vs latencia (tamaño de entrada, cuantización).
+
+Corre varias variantes (.rknn en NPU u .onnx en CPU, ver app/adapters/onnx_adapter) sobre el mismo
+set de imágenes y reporta, por variante:
+    - latencia pre / inferencia / post / total (p50, p90, p99)
+    - memoria: RSS tras cargar el modelo y pico (VmHWM), medidos en un proceso aparte por variante
+    - concordancia de detecciones contra una variante de referencia (P/R/F1, IoU medio, top-1)
+    - opcional (--labels): precisión/recall contra etiquetas YOLO
+
+Formato de variante:  nombre=ruta[@img_size]   (img_size por defecto: RKNN_IMG_SIZE)
+
+Uso:
+    $ python tools/compare_variants.py --source tools/convert/dataset.txt \\
+          --variant fp640=weights/model_fp.rknn --variant q640=weights/model1.rknn \\
+          --variant q416=weights/model1_416.rknn@416 --reference fp640 --labels --json ab.json
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import queue
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]  # raíz del repo
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from app.adapters.dataset_fs import iou_matrix, label_path_for, list_images, load_labels  # noqa: E402
+from app.adapters.inference_backend import create_backend  # noqa: E402
+from app.adapters.rknn_adapter import RknnModel  # noqa: E402
+from app.config import settings  # noqa: E402
+
+
+def _mem_mb():
+    """(VmRSS, VmHWM) del proceso actual en MB (Linux)."""
+    vals = {}
+    try:
+        with open("/proc/self/status", "r") as f:
+            for ln in f:
+                if ln.startswith(("VmRSS:", "VmHWM:")):
+                    k, v = ln.split(":", 1)
+                    vals[k] = int(v.split()[0]) / 1024.0
+    except OSError:
+        pass
+    return vals.get("VmRSS", 0.0), vals.get("VmHWM", 0.0)
+
+
+def parse_variant(spec):
+    name, _, rest = spec.partition("=")
+    if not rest:
+        name, rest = Path(spec).stem, spec
+    path, _, size = rest.partition("@")
+    return {"name": name, "path": path, "img_size": int(size or settings.RKNN_IMG_SIZE)}
+
+
+def pct(a):
+    a = np.asarray(a, np.float64)
+    if a.size == 0:
+        return {"p50": None, "p90": None, "p99": None}
+    return {k: round(float(np.percentile(a, q)), 3) for k, q in (("p50", 50), ("p90", 90), ("p99", 99))}
+
+
+# ---------------------------------------------------------------- por variante (proceso hijo)
+def run_variant(variant, images, yaml_path, thresholds, warmup, result_q):
+    """Proceso hijo: siempre deja algo en la cola (resultado o error), así el padre no espera en vano."""
+    try:
+        result_q.put(_measure_variant(variant, images, yaml_path, thresholds, warmup))
+    except Exception as e:  # noqa: BLE001 - se reporta en el proceso padre
+        result_q.put({"name": variant["name"], "error": f"{type(e).__name__}: {e}"})
+
+
+def _measure_variant(variant, images, yaml_path, thresholds, warmup):
+    # importar el paquete 'app' no crea la app Flask ni arranca su motor: el único modelo
+    # de este proceso es la variante medida (si no, RSS, pico y latencias incluirían otro)
+    from app.services.engine_service import ENGINE
+    assert ENGINE.state == "idle", f"El motor de la app está activo en el proceso de medición ({ENGINE.state})"
+    rss0, _ = _mem_mb()
+    # el backend (NPU u ONNX CPU) se deduce de la extensión
+    model = RknnModel(model_path=variant["path"], yaml_path=yaml_path, img_size=variant["img_size"],
+                      backend=create_backend(model_path=variant["path"]))
+    model.set_thresholds(**thresholds)
+    rss_load, _ = _mem_mb()
+
+    lat = {"pre": [], "infer": [], "post": [], "total": []}
+    dets_all = []
+    for k, path in enumerate(images):
+        img = cv2.imread(path)
+        if img is None:
+            dets_all.append(None)
+            continue
+        t0 = time.perf_counter()
+        img_input = model.preprocess(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+        t1 = time.perf_counter()
+        outputs = model.infer(img_input)
+        t2 = time.perf_counter()
+        dets = model.postprocess(outputs)
+        t3 = time.perf_counter()
+        if k >= warmup:
+            lat["pre"].append((t1 - t0) * 1000.0)
+            lat["infer"].append((t2 - t1) * 1000.0)
+            lat["post"].append((t3 - t2) * 1000.0)
+            lat["total"].append((t3 - t0) * 1000.0)
+        # coordenadas normalizadas 0..1 para comparar variantes con distinto img_size
+        s = float(variant["img_size"])
+        dets_all.append([[d["class_id"], d["confidence"]] + [v / s for v in d["bbox_xyxy"]] for d in dets])
+
+    _, hwm = _mem_mb()
+    model.release()
+    return {
+        "name": variant["name"],
+        "latency_ms": {k: pct(v) for k, v in lat.items()},
+        "memory_mb": {"rss_model": round(rss_load - rss0, 1), "rss_after_load": round(rss_load, 1),
+                      "peak": round(hwm, 1)},
+        "detections": dets_all,
+    }
+
+
+def wait_result(p, q, timeout=0.0, poll_s=1.0):
+    """
+    Resultado del hijo 'p'. Si muere sin dejarlo (OOM, crash del runtime) o se pasa
+    de 'timeout' segundos (0 = sin límite) devuelve {"error": ...} en vez de colgarse.
+    """
+    t_end = time.monotonic() + timeout if timeout else None
+    while True:
+        try:
+            return q.get(timeout=poll_s)
+        except queue.Empty:
+            pass
+        if not p.is_alive():
+            try:
+                return q.get(timeout=poll_s)  # el resultado pudo llegar justo al salir
+            except queue.Empty:
+                return {"error": f"el proceso terminó sin resultado (exitcode {p.exitcode})"}
+        if t_end is not None and time.monotonic() > t_end:
+            p.terminate()
+            return {"error": f"sin resultado tras {timeout:.0f} s"}
+
+
+# ---------------------------------------------------------------- concordancia
+def match(a, b, iou_th, agnostic=False):
+    """
+    Matching greedy por confianza de 'a' contra 'b' (listas [cls, conf, x1, y1, x2, y2]).
+    Devuelve (n_match, ious de los matches).
+    """
+    if not a or not b:
+        return 0, []
+    A = np.asarray(sorted(a, key=lambda d: -d[1]), np.float32)
+    B = np.asarray(b, np.float32)
+    ious = iou_matrix(A[:, 2:6], B[:, 2:6])
+    if not agnostic:
+        ious = np.where(A[:, None, 0] == B[None, :, 0], ious, 0.0)
+    used = np.zeros(len(B), bool)
+    got = []
+    for i in range(len(A)):
+        cand = np.where(used, -1.0, ious[i])
+        j = int(np.argmax(cand))
+        if cand[j] >= iou_th:
+            used[j] = True
+            got.append(float(cand[j]))
+    return len(got), got
+
+
+def agreement(dets, ref, iou_th):
+    tp = n_var = n_ref = 0
+    ious, top1 = [], []
+    for d, r in zip(dets, ref):
+        if d is None or r is None:
+            continue
+        m, got = match(d, r, iou_th)
+        tp += m
+        n_var += len(d)
+        n_ref += len(r)
+        ious += got
+        top_d = max(d, key=lambda x: x[1])[0] if d else None
+        top_r = max(r, key=lambda x: x[1])[0] if r else None
+        top1.append(top_d == top_r)
+    p = tp / n_var if n_var else 1.0
+    rc = tp / n_ref if n_ref else 1.0
+    return {
+        "precision": round(p, 4),
+        "recall": round(rc, 4),
+        "f1": round(2 * p * rc / (p + rc), 4) if p + rc else 0.0,
+        "mean_iou": round(float(np.mean(ious)), 4) if ious else None,
+        "top1_agree": round(float(np.mean(top1)), 4) if top1 else None,
+    }
+
+
+def gt_for(images):
+    gts = []
+    for path in images:
+        # etiquetas YOLO normalizadas -> mismo formato [cls, conf=1, x1, y1, x2, y2]
+        gts.append([[g[0], 1.0] + g[1:] for g in load_labels(label_path_for(path), 1)])
+    return gts
+
+
+def parse_opt():
+    ap = argparse.ArgumentParser(description="A/B de variantes de modelo (precisión vs latencia)")
+    ap.add_argument("--source", required=True, help="directorio de imágenes o .txt con una ruta por línea")
+    ap.add_argument("--variant", action="append", required=True, help="nombre=ruta[@img_size] (repetible)")
+    ap.add_argument("--reference", default=None, help="variante de referencia (por defecto la primera)")
+    ap.add_argument("--data", default=settings.CLASSES_YAML)
+    ap.add_argument("--limit", type=int, default=0, help="usar solo las primeras N imágenes")
+    ap.add_argument("--warmup", type=int, default=3, help="imágenes iniciales excluidas de la latencia")
+    ap.add_argument("--match-iou", type=float, default=0.5)
+    ap.add_argument("--labels", action="store_true", help="evaluar también contra etiquetas YOLO")
+    ap.add_argument("--conf-th", type=float, default=0.30)
+    ap.add_argument("--iou-th", type=float, default=0.50)
+    ap.add_argument("--min-box-frac", type=float, default=0.003)
+    ap.add_argument("--timeout", type=float, default=0.0, help="segundos máximos por variante (0 = sin límite)")
+    ap.add_argument("--json", default=None, help="guardar resumen JSON")
+    return ap.parse_args()
+
+
+def main(opt):
+    images = list_images(opt.source)
+    if opt.limit:
+        images = images[:opt.limit]
+    variants = [parse_variant(v) for v in opt.variant]
+    ref_name = opt.reference or variants[0]["name"]
+    thresholds = {"conf_th": opt.conf_th, "iou_th": opt.iou_th, "min_box_frac": opt.min_box_frac}
+    print(f"--> {len(images)} imágenes, {len(variants)} variantes, referencia: {ref_name}")
+
+    # cada variante en su propio proceso: runtime y memoria aislados
+    ctx = mp.get_context("spawn")
+    results, failed = {}, []
+    for v in variants:
+        q = ctx.Queue()
+        p = ctx.Process(target=run_variant, args=(v, images, opt.data, thresholds, opt.warmup, q))
+        p.start()
+        res = wait_result(p, q, opt.timeout)
+        p.join()
+        if "error" in res:
+            print(f"❌ {v['name']}: {res['error']}")
+            failed.append(v["name"])
+            continue
+        results[v["name"]] = res
+        print(f"✅ {v['name']}: total p50={res['latency_ms']['total']['p50']} ms")
+
+    if ref_name not in results:
+        print(f"❌ La variante de referencia '{ref_name}' no produjo resultados")
+        return 1
+    variants = [v for v in variants if v["name"] in results]
+    ref = results[ref_name]["detections"]
+    gts = gt_for(images) if opt.labels else None
+    summary = []
+    for v in variants:
+        r = results[v["name"]]
+        row = {"variant": v["name"], "path": v["path"], "img_size": v["img_size"],
+               "latency_ms": r["latency_ms"], "memory_mb": r["memory_mb"],
+               "agreement_vs_ref": agreement(r["detections"], ref, opt.match_iou)}
+        if gts is not None:
+            row["vs_labels"] = agreement(r["detections"], gts, opt.match_iou)
+        summary.append(row)
+
+    print(f"\n{'variante':<12}{'size':>6}{'total p50':>11}{'p90':>9}{'p99':>9}{'infer p50':>11}"
+          f"{'RSS MB':>9}{'F1 ref':>8}{'top1':>7}" + (f"{'P gt':>7}{'R gt':>7}" if gts is not None else ""))
+    for row in summary:
+        lt, ag = row["latency_ms"], row["agreement_vs_ref"]
+        line = (f"{row['variant']:<12}{row['img_size']:>6}{lt['total']['p50']!s:>11}{lt['total']['p90']!s:>9}"
+                f"{lt['total']['p99']!s:>9}{lt['infer']['p50']!s:>11}{row['memory_mb']['rss_model']:>9}"
+                f"{ag['f1']:>8}{ag['top1_agree']!s:>7}")
+        if gts is not None:
+            line += f"{row['vs_labels']['precision']:>7}{row['vs_labels']['recall']:>7}"
+        print(line)
+
+    if opt.json:
+        with open(opt.json, "w", encoding="utf-8") as f:
+            json.dump({"reference": ref_name, "images": len(images), "thresholds": thresholds,
+                       "variants": summary}, f, indent=2)
+        print(f"\n✅ Resumen guardado en {opt.json}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_opt()))
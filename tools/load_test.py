@@ -0,0 +1,159 @@
+"""
+Prueba de carga: latencia de los endpoints "livianos" mientras corren N streams MJPEG.
+
+Con el servidor en Gunicorn + gevent, una llamada bloqueante en el stream (lectura
+de cámara, inferencia, imencode) congela a todos los demás requests del worker.
+Esta herramienta abre N clientes de /video_feed (leyendo frames sin parar) y, en
+paralelo, mide la latencia de /thresholds, /historial, etc. para cada nivel de N.
+Si las llamadas bloqueantes salen del loop (app/services/executor.py), la latencia
+de esos endpoints debe quedar casi plana al subir N.
+
+Uso:
+    $ python tools/load_test.py --url http://127.0.0.1:5000 --streams 0,1,2,4 --duration 15
+    $ python tools/load_test.py --streams 0,3 --endpoints /thresholds,/cameras --predictions --json load.json
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+import numpy as np
+
+
+def pct(samples):
+    a = np.asarray(samples, np.float64)
+    if a.size == 0:
+        return {"n": 0}
+    return {"n": int(a.size), "p50": round(float(np.percentile(a, 50)), 2),
+            "p95": round(float(np.percentile(a, 95)), 2), "p99": round(float(np.percentile(a, 99)), 2),
+            "max": round(float(a.max()), 2)}
+
+
+class StreamClient(threading.Thread):
+    """Lee /video_feed como un navegador: cuenta frames (boundaries) hasta que se le pide parar."""
+    def __init__(self, url):
+        super().__init__(daemon=True)
+        self.url = url
+        self.frames = 0
+        self.error = None
+        self._halt = threading.Event()
+
+    def run(self):
+        try:
+            with urllib.request.urlopen(self.url, timeout=10) as r:
+                while not self._halt.is_set():
+                    chunk = r.read(65536)
+                    if not chunk:
+                        break
+                    self.frames += chunk.count(b"--frame")
+        except Exception as e:  # noqa: BLE001 - se reporta al final
+            self.error = str(e)
+
+    def stop(self):
+        self._halt.set()
+
+
+def probe(url, timeout=10.0):
+    t0 = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=timeout) as r:
+        r.read()
+    return (time.perf_counter() - t0) * 1000.0
+
+
+def post_form(url, data):
+    body = urllib.parse.urlencode(data).encode()
+    with urllib.request.urlopen(urllib.request.Request(url, data=body, method="POST"), timeout=10) as r:
+        r.read()
+
+
+def run_level(opt, n_streams):
+    streams = [StreamClient(opt.url + opt.feed) for _ in range(n_streams)]
+    for s in streams:
+        s.start()
+    time.sleep(opt.warmup if n_streams else 0)
+
+    lat = {ep: [] for ep in opt.endpoints}
+    errors = 0
+    f0 = [s.frames for s in streams]
+    t_end = time.perf_counter() + opt.duration
+    t_start = time.perf_counter()
+    while time.perf_counter() < t_end:
+        for ep in opt.endpoints:
+            try:
+                lat[ep].append(probe(opt.url + ep))
+            except Exception:  # noqa: BLE001
+                errors += 1
+        time.sleep(opt.interval)
+    elapsed = time.perf_counter() - t_start
+    fps = [(s.frames - f) / elapsed for s, f in zip(streams, f0)]
+
+    for s in streams:
+        s.stop()
+    for s in streams:
+        s.join(timeout=2.0)
+
+    return {
+        "streams": n_streams,
+        "stream_fps": [round(x, 2) for x in fps],
+        "stream_errors": [s.error for s in streams if s.error],
+        "probe_errors": errors,
+        "latency_ms": {ep: pct(v) for ep, v in lat.items()},
+    }
+
+
+def parse_opt():
+    ap = argparse.ArgumentParser(description="Latencia de endpoints con N streams MJPEG activos")
+    ap.add_argument("--url", default="http://127.0.0.1:5000")
+    ap.add_argument("--feed", default="/video_feed", help="ruta del stream (p.ej. /video_feed/overview)")
+    ap.add_argument("--streams", default="0,1,2,4", help="niveles de clientes de stream simultáneos")
+    ap.add_argument("--endpoints", default="/thresholds,/historial,/ready",
+                    help="endpoints a medir (GET), separados por coma")
+    ap.add_argument("--duration", type=float, default=10.0, help="segundos de medición por nivel")
+    ap.add_argument("--warmup", type=float, default=2.0, help="segundos tras abrir los streams antes de medir")
+    ap.add_argument("--interval", type=float, default=0.05, help="pausa entre rondas de sondeo")
+    ap.add_argument("--predictions", action="store_true", help="activar la inferencia en el stream durante la prueba")
+    ap.add_argument("--json", default=None, help="guardar resultados JSON")
+    opt = ap.parse_args()
+    opt.url = opt.url.rstrip("/")
+    opt.endpoints = [e.strip() for e in opt.endpoints.split(",") if e.strip()]
+    return opt
+
+
+def main(opt):
+    if opt.predictions:
+        post_form(opt.url + "/toggle_predictions", {"enabled": "true"})
+    results = []
+    try:
+        for n in [int(x) for x in opt.streams.split(",")]:
+            res = run_level(opt, n)
+            results.append(res)
+            cols = "  ".join(f"{ep} p50={v.get('p50')} p99={v.get('p99')}" for ep, v in res["latency_ms"].items())
+            fps = f"fps/stream={np.mean(res['stream_fps']):.1f}" if res["stream_fps"] else "fps/stream=-"
+            print(f"streams={n:<3} {fps:<18} {cols}  errores={res['probe_errors']}")
+    finally:
+        if opt.predictions:
+            post_form(opt.url + "/toggle_predictions", {"enabled": "false"})
+
+    base = results[0]["latency_ms"] if results and results[0]["streams"] == 0 else None
+    if base:
+        print("\n=== p99 relativo a 0 streams ===")
+        for res in results[1:]:
+            for ep, v in res["latency_ms"].items():
+                b = base[ep].get("p99")
+                if b and v.get("p99") is not None:
+                    ok = "✅" if v["p99"] <= max(2.0 * b, b + 20.0) else "❌"
+                    print(f"{ok} streams={res['streams']:<3} {ep:<14} p99 {b:.1f} -> {v['p99']:.1f} ms")
+
+    if opt.json:
+        with open(opt.json, "w", encoding="utf-8") as f:
+            json.dump({"url": opt.url, "feed": opt.feed, "predictions": opt.predictions, "levels": results}, f, indent=2)
+        print(f"\n✅ Resultados guardados en {opt.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_opt()))
@@ -0,0 +1,154 @@
+"""
+Regresión determinista sobre una traza de inferencia grabada (app/adapters/trace_store.py).
+
+La traza se graba en el equipo con TRACE_RECORD_DIR=<dir> (frames + salidas crudas
+de rknn.inference). Esta herramienta corre sin NPU ni cámara:
+    preprocess   -> el CRC de la entrada debe ser idéntico al grabado
+    postprocess  -> detecciones sobre las salidas grabadas; con --golden se comparan
+                    contra un JSON de referencia (--save-golden lo genera)
+    --pipeline   -> además pasa cada frame por InferenceService con el backend
+                    "replay" (colas, métricas, postproceso) a máxima velocidad
+
+Reporta la latencia por etapa en CPU, útil para medir cambios del postproceso
+fuera del equipo.
+
+Uso:
+    $ python tools/replay_check.py --trace traces/sesion1 --save-golden golden.json
+    $ python tools/replay_check.py --trace traces/sesion1 --golden golden.json --pipeline
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]  # raíz del repo
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from app.adapters.rknn_adapter import RknnModel  # noqa: E402
+from app.adapters.trace_store import TraceReader, input_crc  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.services.settings_service import Thresholds  # noqa: E402
+
+
+def summarize(samples_ms):
+    a = np.asarray(samples_ms, np.float64)
+    if a.size == 0:
+        return {"n": 0}
+    return {"n": int(a.size), "mean": round(float(a.mean()), 3), "p50": round(float(np.percentile(a, 50)), 3),
+            "p99": round(float(np.percentile(a, 99)), 3)}
+
+
+def rounded(dets, nd=3):
+    return [{"class_name": d["class_name"], "confidence": round(d["confidence"], nd),
+             "bbox_xyxy": [round(v, nd - 2) for v in d["bbox_xyxy"]]} for d in dets]
+
+
+def run_offline(opt, trace, model):
+    """Preprocesado (CRC) + postprocesado sobre las salidas grabadas, registro por registro."""
+    t_pre, t_post, crc_bad, results = [], [], [], []
+    for i in range(len(trace)):
+        frame = trace.frame(i)
+        t0 = time.perf_counter()
+        x = model.preprocess(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        t1 = time.perf_counter()
+        dets = model.postprocess(trace.outputs(i), opt.conf_th, opt.iou_th, opt.min_box_frac)
+        t2 = time.perf_counter()
+        t_pre.append((t1 - t0) * 1000.0)
+        t_post.append((t2 - t1) * 1000.0)
+        if input_crc(x) != trace.input_crc(i):
+            crc_bad.append(i)
+        results.append(rounded(dets))
+    return results, crc_bad, {"preprocess": summarize(t_pre), "postprocess": summarize(t_post)}
+
+
+def run_pipeline(opt, trace):
+    """Cada frame por InferenceService(backend='replay'): mismo camino que el stream, sin NPU."""
+    from app.services.inference_service import InferenceService
+    svc = InferenceService(model_path=opt.trace, backend="replay", img_size=trace.info["img_size"], cascade=False)
+    thr = Thresholds(conf_th=opt.conf_th, iou_th=opt.iou_th, min_box_frac=opt.min_box_frac)
+    lat, results = [], []
+    t_start = time.perf_counter()
+    for i in range(len(trace)):
+        t0 = time.perf_counter()
+        dets = svc.predict(np.array(trace.frame(i)), thr, priority="interactive")
+        lat.append((time.perf_counter() - t0) * 1000.0)
+        results.append(rounded(dets))
+    elapsed = time.perf_counter() - t_start
+    return results, svc.model.backend.stats(), {"predict": summarize(lat), "fps": round(len(trace) / elapsed, 1)}
+
+
+def diff(results, golden):
+    if len(results) != len(golden):
+        return [f"registros: {len(results)} vs golden {len(golden)}"]
+    return [f"frame {i}: {len(a)} dets vs golden {len(b)}" for i, (a, b) in enumerate(zip(results, golden)) if a != b]
+
+
+def parse_opt():
+    ap = argparse.ArgumentParser(description="Regresión determinista sobre una traza de inferencia")
+    ap.add_argument("--trace", default=settings.REPLAY_TRACE, help="directorio de la traza")
+    ap.add_argument("--data", default=settings.CLASSES_YAML)
+    ap.add_argument("--conf-th", type=float, default=0.30)
+    ap.add_argument("--iou-th", type=float, default=0.50)
+    ap.add_argument("--min-box-frac", type=float, default=0.003)
+    ap.add_argument("--golden", default=None, help="JSON de detecciones de referencia")
+    ap.add_argument("--save-golden", default=None, help="guardar las detecciones actuales como referencia")
+    ap.add_argument("--pipeline", action="store_true", help="reproducir además por InferenceService (backend replay)")
+    ap.add_argument("--json", default=None, help="guardar resultados JSON")
+    return ap.parse_args()
+
+
+def main(opt):
+    trace = TraceReader(opt.trace)
+    if not len(trace):
+        print(f"❌ La traza {opt.trace} no tiene registros")
+        return 1
+    print(f"Traza {opt.trace}: {len(trace)} inferencias, {trace.duration_s():.1f} s, "
+          f"modelo '{trace.info.get('model')}' ({trace.info.get('backend')}, {trace.info['img_size']})")
+    model = RknnModel(yaml_path=opt.data, img_size=trace.info["img_size"], init_runtime=False)
+
+    results, crc_bad, timing = run_offline(opt, trace, model)
+    report = {"trace": opt.trace, "records": len(trace), "crc_mismatches": crc_bad, "timing_ms": timing}
+    for stage, s in timing.items():
+        print(f"  {stage:<12} p50={s['p50']} p99={s['p99']} ms")
+    ok = not crc_bad
+    print(("✅" if ok else "❌") + f" Preprocesado idéntico en {len(trace) - len(crc_bad)}/{len(trace)} frames")
+
+    if opt.pipeline:
+        pipe_results, stats, pipe_timing = run_pipeline(opt, trace)
+        report["pipeline"] = {"backend": stats, "timing": pipe_timing}
+        print(f"  pipeline     p50={pipe_timing['predict']['p50']} ms  {pipe_timing['fps']} fps  "
+              f"(aciertos {stats['hits']}, desalineados {stats['mismatches']})")
+        same = pipe_results == results
+        ok = ok and same and stats["mismatches"] == 0
+        print(("✅" if same else "❌") + " El pipeline reproduce las mismas detecciones que el postproceso directo")
+
+    if opt.save_golden:
+        with open(opt.save_golden, "w", encoding="utf-8") as f:
+            json.dump(results, f)
+        print(f"✅ Referencia guardada en {opt.save_golden}")
+    if opt.golden:
+        with open(opt.golden, "r", encoding="utf-8") as f:
+            golden = json.load(f)
+        diffs = diff(results, golden)
+        report["golden_diffs"] = diffs
+        for d in diffs[:20]:
+            print(f"  {d}")
+        ok = ok and not diffs
+        print(("✅ Sin diferencias" if not diffs else f"❌ {len(diffs)} frames difieren") + f" contra {opt.golden}")
+
+    if opt.json:
+        with open(opt.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Resultados guardados en {opt.json}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_opt()))
@@ -0,0 +1,10 @@
+"""Proceso de visión para VISION_MODE=bus: cámaras + NPU, publica en memoria compartida.
+
+    $ VISION_MODE=bus python vision.py &
+    $ VISION_MODE=bus gunicorn -k gevent -w 4 app:app
+"""
+import sys
+from app.services.vision_service import main
+
+if __name__ == "__main__":
+    sys.exit(main())